@@ -0,0 +1,101 @@
+"""
+Measure upload bytes per page and peak memory per request body for the vision API.
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_api_payload [path/to/document.pdf]
+
+Compares the old fixed JPEG quality 85 encode, serialized with json.dumps on a
+data: URL string, against the byte-budgeted encoder spliced into the body by
+encode_request_body. Peak memory is the tracemalloc high-water mark while the
+body is built from an encoded page.
+
+Rendered PDF pages are clean and cropped small; each is also measured placed
+on a noisy 1024x768 colored frame, which is closer to a photographed card.
+"""
+import base64
+import io
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import replace
+from typing import Tuple
+
+from PIL import Image
+
+from benchmarks.bench_page_pipeline import build_sample_pdf
+from routers.ocr import DocumentImageProcessor, encode_request_body
+from routers.ocr_stages import (
+    API_RENDER_PROFILE, PageSource, count_pages, encode_image, optimize_image, payload_size, render_page
+)
+
+PROFILES = {
+    "budget jpeg": API_RENDER_PROFILE,
+    "budget jpeg/webp": replace(API_RENDER_PROFILE, image_formats=("JPEG", "WEBP")),
+}
+
+
+def legacy_encode(image: Image.Image) -> str:
+    """The previous encoder: RGB JPEG at quality 85 regardless of content"""
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def legacy_body(processor: DocumentImageProcessor, payload: str) -> bytes:
+    """What requests/httpx produced from json=: one str for the data URL, one for the JSON, then bytes"""
+    return json.dumps(processor._build_structured_extraction_request(payload)).encode("utf-8")
+
+
+def photographed(image: Image.Image) -> Image.Image:
+    """Place a rendered page on a 1024x768 desk-colored frame with camera noise, like a phone photo of a card"""
+    frame = Image.linear_gradient("L").resize((1024, 768)).convert("RGB")
+    frame = Image.blend(frame, Image.new("RGB", frame.size, (120, 90, 60)), 0.6)
+    scale = 700 / max(image.size)
+    card = image.convert("RGB").resize((round(image.width * scale), round(image.height * scale)),
+                                       Image.Resampling.LANCZOS)
+    frame.paste(card, ((frame.width - card.width) // 2, (frame.height - card.height) // 2))
+    noise = Image.merge("RGB", [Image.effect_noise(frame.size, 32) for _ in range(3)])
+    return Image.blend(frame, noise, 0.15)
+
+
+def peak_body_memory(build) -> Tuple[int, int]:
+    tracemalloc.start()
+    body = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(body), peak
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            pdf_content = f.read()
+    else:
+        pdf_content = build_sample_pdf()
+
+    processor = DocumentImageProcessor("benchmark-key")
+    images = []
+    for page_number in range(1, count_pages(pdf_content, "pdf") + 1):
+        image = render_page(PageSource(pdf_content, "pdf", page_number), API_RENDER_PROFILE)
+        images.append(optimize_image(image, API_RENDER_PROFILE))
+
+    rows = {"legacy jpeg q85": (legacy_encode, lambda payload: legacy_body(processor, payload))}
+    for label, profile in PROFILES.items():
+        rows[label] = (lambda image, profile=profile: encode_image(image, profile),
+                       lambda payload: encode_request_body(processor._build_structured_extraction_request(payload)))
+
+    for title, pages in (("rendered", images), ("photographed", [photographed(image) for image in images])):
+        print(f"\n{title} ({pages[0].width}x{pages[0].height})")
+        print(f"{'encoder':<20}{'ms/page':>10}{'base64 KB':>11}{'body KB':>10}{'peak KB':>10}")
+        for label, (encode, build_body) in rows.items():
+            start = time.perf_counter()
+            payloads = [encode(image) for image in pages]
+            elapsed = (time.perf_counter() - start) * 1000 / len(pages)
+            encoded = sum(payload_size(payload) for payload in payloads) / len(payloads) / 1e3
+            measured = [peak_body_memory(lambda payload=payload: build_body(payload)) for payload in payloads]
+            body = sum(size for size, _ in measured) / len(measured) / 1e3
+            peak = sum(peak for _, peak in measured) / len(measured) / 1e3
+            print(f"{label:<20}{elapsed:>10.1f}{encoded:>11.1f}{body:>10.1f}{peak:>10.1f}")
@@ -0,0 +1,58 @@
+"""
+Measure first-request latency of a cold worker against one warmed up by the lifespan handler.
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_first_request
+
+Cold: the app is served without running its lifespan, so the first /llm
+requests initialize the LLM themselves (10 concurrent first requests share
+one initialization). Warm: the lifespan runs, /ready is polled until
+warm-up has finished and only then is the first request sent; the
+readiness status is printed too, since a failed OCR engine (e.g. no
+Tesseract) keeps it at 503. The time until ready
+covers every configured engine (OCR workers and the OpenRouter connection
+too when OPENROUTER_API_KEY is set).
+"""
+import asyncio
+import logging
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+ITEM = {"query": "What's the status?", "lead": {"id": "1", "name": "Jane Doe", "email": "jane@example.com",
+                                                 "status": "contacted"}}
+
+
+async def cold_first_requests(app, count: int = 10) -> float:
+    """Slowest of count concurrent first requests, served without the lifespan (ASGITransport skips it)"""
+    async def timed(client: httpx.AsyncClient) -> float:
+        start = time.perf_counter()
+        assert (await client.post("/llm", json=ITEM)).status_code == 200
+        return time.perf_counter() - start
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        return max(await asyncio.gather(*(timed(client) for _ in range(count))))
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    import main  # noqa: E402  (after silencing its startup logging)
+
+    cold_latency = asyncio.run(cold_first_requests(main.app))
+    main.llm.initialized = False
+    main.llm._init_lock = None
+
+    with TestClient(main.app) as warm:
+        start = time.perf_counter()
+        while warm.get("/ready").json()["warm_up_seconds"] is None:
+            time.sleep(0.01)
+        ready_after = time.perf_counter() - start
+        start = time.perf_counter()
+        assert warm.post("/llm", json=ITEM).status_code == 200
+        warm_latency = time.perf_counter() - start
+        ready = warm.get("/ready").json()
+
+    print(f"{'cold first request':<24}{cold_latency * 1000:>10.1f} ms (slowest of 10 concurrent)")
+    print(f"{'warm first request':<24}{warm_latency * 1000:>10.1f} ms")
+    print(f"{'startup until warm':<24}{ready_after * 1000:>10.1f} ms  {ready['status']} {ready['warm_up']}")
@@ -0,0 +1,93 @@
+"""
+Measure intent classification throughput.
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_intent_classifier [queries] [history_length]
+
+Times the original chain of substring scans, the compiled classifier one
+query at a time (with and without a conversation history of the given
+length, default 20 messages) and classify_batch, in queries per second.
+The variants of each table run in turn for several rounds and the best
+round of each is reported, so a noisy machine slows them all alike.
+Agreement with the original is reported for information only: word-start
+matching deliberately drops hits such as "ping" in "shopping". Against the
+same chain with word-start matching the labels must agree exactly.
+"""
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from routers.intent_classifier import INTENT_RULES, IntentClassifier
+
+WORDS = ["please", "can", "you", "send", "the", "lead", "details", "email", "them", "next", "week", "status",
+         "update", "schedule", "a", "meeting", "with", "show", "performance", "report", "shopping", "retail",
+         "thanks", "what", "is", "going", "on", "call", "tomorrow", "overview", "kpi", "progress", "hello"]
+
+
+def legacy_classify_intent(query: str, history: List[str]) -> Dict:
+    """The original classifier: one substring scan per intent over the query glued to the history"""
+    compound_query = query.lower() + " ".join(history).lower()
+    for label, score, terms in INTENT_RULES:
+        if any(term in compound_query for term in terms):
+            return {"label": label, "score": score}
+    return {"label": "general_inquiry", "score": 0.75}
+
+
+def word_start_classify_intent(query: str, history: List[str]) -> Dict:
+    """The original chain with word-start matching, the label order the compiled classifier keeps"""
+    compound_query = query.lower() + " " + " ".join(history).lower()
+    for label, score, terms in INTENT_RULES:
+        if any(re.search(rf"\b{term}", compound_query) for term in terms):
+            return {"label": label, "score": score}
+    return {"label": "general_inquiry", "score": 0.75}
+
+
+def build_queries(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 12))) for _ in range(count)]
+
+
+def rates(count: int, variants: List[Tuple[str, Callable[[], List[Dict]]]], rounds: int = 7) -> List[List[Dict]]:
+    best = [float("inf")] * len(variants)
+    results = [[] for _ in variants]
+    for _ in range(rounds):
+        for index, (_, run) in enumerate(variants):
+            start = time.perf_counter()
+            results[index] = run()
+            best[index] = min(best[index], time.perf_counter() - start)
+    for (label, _), elapsed in zip(variants, best):
+        print(f"{label:<36}{count / elapsed:>14,.0f} queries/s")
+    return results
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    history_length = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    queries = build_queries(count)
+    history = build_queries(history_length, seed=11)
+    classifier = IntentClassifier()
+    history_signals = classifier.history_signals(history)
+
+    legacy, single, batch = rates(count, [
+        ("legacy substring chain", lambda: [legacy_classify_intent(query, []) for query in queries]),
+        ("compiled, one query at a time", lambda: [classifier.classify(query) for query in queries]),
+        ("compiled, classify_batch", lambda: classifier.classify_batch(queries)),
+    ])
+    assert single == batch
+
+    print(f"\nwith a {history_length}-message history")
+    rates(count, [
+        ("legacy substring chain", lambda: [legacy_classify_intent(query, history) for query in queries]),
+        ("compiled, history resent", lambda: [classifier.classify(query, history) for query in queries]),
+        ("compiled, session signals",
+         lambda: [classifier.classify(query, history_signals=history_signals) for query in queries]),
+    ])
+
+    agreement = sum(old["label"] == new["label"] for old, new in zip(legacy, single)) / count
+    print(f"\nlabel agreement with the legacy classifier (no history): {agreement:.1%}")
+    sample = queries[:10_000]
+    word_start = [word_start_classify_intent(query, []) for query in sample]
+    exact = sum(old["label"] == new["label"] for old, new in zip(word_start, single)) / len(sample)
+    print(f"label agreement with the word-start legacy chain (no history): {exact:.1%}")
@@ -0,0 +1,197 @@
+"""
+Check the compiled lead extractor against the original implementation and time both.
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_lead_extraction [lines] [path/to/text.txt ...]
+
+Every given text file and a generated golden corpus of edge cases must
+produce identical leads with both implementations. Timings use a synthetic
+document of the given number of lines (default 10000).
+"""
+import random
+import re
+import sys
+import time
+from dataclasses import asdict
+from typing import List
+
+from routers.ocr import DocumentImageProcessor, Lead
+
+FIRST_NAMES = ["Jane", "John", "Ann", "Joann", "Maria", "Li", "Omar", "Priya", "Lee", "Group"]
+LAST_NAMES = ["Doe", "Smith", "Lee", "Leeds", "Garcia", "Chen", "Haddad", "Patel", "Inc", "Vice"]
+FILLER = [
+    "Meeting notes", "Booth 14", "Please follow up next week", "Vice", "President", "Head", "of",
+    "Coordinator of events", "Acme Group Inc", "Widget Corporation", "Big Corp", "JoAnn Lee",
+    "see https://example.com/team?id=4#bio", "@acme-labs", "linkedin.com/in/jane-doe", "twitter.com/jdoe_",
+    "Senior VP of Sales", "MVP award", "", "   ", "\tTabbed  Name  Here", "Ünïcode Straße GmbH",
+]
+
+
+def legacy_extract_leads_with_regex(processor: DocumentImageProcessor, text: str) -> List[Lead]:
+    """The original line-by-line implementation, kept as the reference for equivalence checks"""
+    leads = []
+
+    emails = processor.email_pattern.findall(text)
+    phones = processor.phone_pattern.findall(text)
+    names = processor.name_pattern.findall(text)
+    linkedin_handles = processor.linkedin_pattern.findall(text)
+    twitter_handles = processor.twitter_pattern.findall(text)
+
+    lines = text.split('\n')
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+
+        line_emails = processor.email_pattern.findall(line)
+        line_phones = processor.phone_pattern.findall(line)
+        line_names = processor.name_pattern.findall(line)
+
+        if line_emails or line_phones or line_names:
+            lead = Lead()
+            context_lines = []
+            for j in range(max(0, i-2), min(len(lines), i+3)):
+                context_lines.append(lines[j].strip())
+            context_text = ' '.join(context_lines)
+
+            if line_emails:
+                lead.email = line_emails[0]
+            if line_phones:
+                lead.phone = f"({line_phones[0][0]}) {line_phones[0][1]}-{line_phones[0][2]}"
+            if line_names:
+                lead.name = line_names[0]
+            elif names:
+                for name in names:
+                    if name in context_text:
+                        lead.name = name
+                        break
+
+            for title in processor.title_keywords:
+                if title.lower() in context_text.lower():
+                    lead.title = title
+                    break
+
+            for indicator in processor.company_indicators:
+                pattern = rf'\b\w+\s+{indicator}\b'
+                company_match = re.search(pattern, context_text, re.IGNORECASE)
+                if company_match:
+                    lead.company = company_match.group()
+                    break
+
+            website_matches = processor.website_pattern.findall(context_text)
+            if website_matches:
+                lead.website = website_matches[0]
+
+            social_media = {}
+            for handle in linkedin_handles:
+                if handle in context_text:
+                    social_media['linkedin'] = handle
+                    break
+            for handle in twitter_handles:
+                if handle in context_text:
+                    social_media['twitter'] = handle
+                    break
+            if social_media:
+                lead.social_media = social_media
+
+            lead.additional_info = context_text[:200] + "..." if len(context_text) > 200 else context_text
+            if lead.email or lead.phone or lead.name:
+                leads.append(lead)
+
+    if not leads:
+        max_items = max(len(emails), len(phones), len(names))
+        for i in range(max_items):
+            lead = Lead()
+            if i < len(emails):
+                lead.email = emails[i]
+            if i < len(phones):
+                lead.phone = f"({phones[i][0]}) {phones[i][1]}-{phones[i][2]}"
+            if i < len(names):
+                lead.name = names[i]
+            if lead.email or lead.phone or lead.name:
+                leads.append(lead)
+
+    return leads
+
+
+def random_line(rng: random.Random) -> str:
+    """One line of a noisy business-card style document"""
+    kind = rng.random()
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    if kind < 0.2:
+        return f"{first}{rng.choice([' ', '  ', chr(9)])}{last}"
+    if kind < 0.35:
+        return f"{first.lower()}.{last.lower()}@{rng.choice(['acme', 'acme-labs', 'example', 'widget_co'])}.com"
+    if kind < 0.5:
+        return rng.choice(["+1 555-010-", "(555) 010-", "555.010.", "Tel: 555 010 "]) + f"{rng.randint(0, 9999):04d}"
+    if kind < 0.6:
+        return f"{rng.choice(['Sales', 'IT', 'Ops'])} {rng.choice(['Director', 'Coordinator', 'Manager', 'Chief'])}"
+    return rng.choice(FILLER)
+
+
+def build_corpus(seed: int = 7, documents: int = 400) -> List[str]:
+    """Handcrafted edge cases plus seeded random documents"""
+    corpus = [
+        "",
+        "no contact details here",
+        "John\nSmith\nJane\nDoe",
+        "Vice\nPresident Jane Doe jane@acme.com",
+        "Coordinator\nann@acme.com",
+        "Acme Group Inc\nann@acme.com",
+        "JoAnn Leeds\nx@acme.com\nAnn Lee",
+        "Ann Lee\n\n\n\nann@acme.com\n@acme",
+        "555-010-1234\n555\n010\n9999",
+        "Big  Corp\n" + "word " * 60 + "\nann@acme.com",
+    ]
+    rng = random.Random(seed)
+    for _ in range(documents):
+        corpus.append("\n".join(random_line(rng) for _ in range(rng.randint(1, 40))))
+    # Attendee lists with many distinct domains and handles
+    for _ in range(5):
+        corpus.append("\n".join(
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}\nuser{i}@co{rng.randint(0, 300)}-x.com\n"
+            f"twitter.com/h_{rng.randint(0, 300)} {random_line(rng)}"
+            for i in range(150)
+        ))
+    return corpus
+
+
+def check_equivalence(processor: DocumentImageProcessor, texts: List[str]) -> int:
+    """Assert both implementations agree on every text, returning the number of leads compared"""
+    compared = 0
+    for index, text in enumerate(texts):
+        expected = [asdict(lead) for lead in legacy_extract_leads_with_regex(processor, text)]
+        actual = [asdict(lead) for lead in processor.extract_leads_with_regex(text)]
+        if expected != actual:
+            raise AssertionError(f"Mismatch on corpus document {index}:\n{text!r}")
+        compared += len(expected)
+    return compared
+
+
+def time_call(func, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    processor = DocumentImageProcessor("benchmark-key")
+
+    corpus = build_corpus()
+    for path in sys.argv[2:]:
+        with open(path, encoding="utf-8") as f:
+            corpus.append(f.read())
+    print(f"golden corpus: {len(corpus)} documents, {check_equivalence(processor, corpus)} leads identical")
+
+    rng = random.Random(42)
+    document = "\n".join(random_line(rng) for _ in range(line_count))
+    check_equivalence(processor, [document])
+
+    legacy = time_call(legacy_extract_leads_with_regex, processor, document)
+    compiled = time_call(processor.extract_leads_with_regex, document)
+    print(f"{line_count} lines: legacy {legacy * 1000:.1f} ms, compiled {compiled * 1000:.1f} ms "
+          f"({legacy / compiled:.1f}x)")
@@ -0,0 +1,58 @@
+"""
+Compare lead triage through individual /llm requests with one /llm/batch request.
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_llm_batch [batch_items] [single_requests]
+
+Both go through the full FastAPI stack in-process (TestClient), so the
+numbers include request parsing, validation and response encoding but no
+network. Defaults: 20000 batch items, 500 individual requests.
+"""
+import json
+import logging
+import random
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+QUERIES = ["What's the next step?", "Send a follow-up", "Show lead details", "Any status update?",
+           "Schedule a meeting", "Performance report please", "Thoughts?"]
+STATUSES = ["new", "contacted", "qualified", "converted", "closed_won", "closed_lost"]
+
+
+def build_items(count: int, seed: int = 3) -> list:
+    rng = random.Random(seed)
+    return [{
+        "query": rng.choice(QUERIES),
+        "lead": {"id": str(index), "name": f"Lead {index}", "email": f"lead{index}@example.com",
+                 "status": rng.choice(STATUSES), "company": "Example Corp"},
+    } for index in range(count)]
+
+
+if __name__ == "__main__":
+    batch_items = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    single_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    logging.disable(logging.INFO)
+    import main  # noqa: E402  (after silencing its startup logging)
+
+    main.llm.initialized = True
+    client = TestClient(main.app)
+
+    items = build_items(single_requests)
+    start = time.perf_counter()
+    for item in items:
+        assert client.post("/llm", json=item).status_code == 200
+    single_rate = single_requests / (time.perf_counter() - start)
+
+    body = json.dumps({"items": build_items(batch_items)})
+    start = time.perf_counter()
+    response = client.post("/llm/batch", content=body, headers={"Content-Type": "application/json"})
+    batch_rate = batch_items / (time.perf_counter() - start)
+    lines = response.text.splitlines()
+    assert response.status_code == 200 and len(lines) == batch_items + 1, response.text[:200]
+
+    print(f"{'individual /llm requests':<28}{single_rate:>12,.0f} leads/s")
+    print(f"{'one /llm/batch request':<28}{batch_rate:>12,.0f} leads/s  ({len(body) / 1e6:.1f} MB request)")
+    print(f"speedup: {batch_rate / single_rate:.0f}x")
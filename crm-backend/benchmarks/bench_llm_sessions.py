@@ -0,0 +1,74 @@
+"""
+Compare per-turn cost of full-history /llm requests with server-side sessions.
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_llm_sessions [turns]
+
+Plays one conversation of the given number of turns (default 2000) both
+ways and reports, at a few points along it, the request body size and the
+time to parse, validate and answer one turn. Legacy requests carry the
+lead and every earlier message; session requests carry only the new query.
+"""
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+
+from models.lead_schema import QueryRequest
+from routers.custom_crm_llm import CustomCRMLLM
+from routers.llm_sessions import ConversationSessionStore
+
+LEAD = {"id": "42", "name": "Jane Doe", "email": "jane@example.com", "phone": "555-0100", "status": "contacted",
+        "company": "Example Corp", "title": "Sales Director"}
+QUERIES = ["How is this lead doing?", "Any news?", "What should I do next?", "Tell me more", "Thanks"]
+
+
+async def legacy_turn(llm: CustomCRMLLM, query: str, history: list) -> int:
+    body = json.dumps({"query": query, "lead": LEAD, "conversationHistory": history})
+    request = QueryRequest.model_validate_json(body)
+    result = await llm.process_query(request.query, request.lead.model_dump(), request.conversationHistory)
+    history.extend([query, result["response"]])
+    return len(body)
+
+
+async def session_turn(llm: CustomCRMLLM, store: ConversationSessionStore, query: str, first: bool) -> int:
+    body = json.dumps({"query": query, "sessionId": "bench", **({"lead": LEAD} if first else {})})
+    request = QueryRequest.model_validate_json(body)
+    session = store.get_or_create(request.sessionId)
+    if request.lead is not None:
+        session.lead = request.lead.model_dump()
+    await llm.process_query(request.query, session.lead, session=session)
+    store.save(session)
+    return len(body)
+
+
+async def main(turns: int):
+    llm = CustomCRMLLM()
+    llm.initialized = True
+    store = ConversationSessionStore()
+    checkpoints = {1, turns // 10, turns // 2, turns}
+    legacy_history: list = []
+
+    print(f"{'turn':>6}{'legacy bytes':>14}{'legacy ms':>11}{'session bytes':>15}{'session ms':>12}")
+    # generate_response prints debug output on every call
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = []
+        for turn in range(1, turns + 1):
+            query = QUERIES[turn % len(QUERIES)]
+            start = time.perf_counter()
+            legacy_bytes = await legacy_turn(llm, query, legacy_history)
+            legacy_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            session_bytes = await session_turn(llm, store, query, turn == 1)
+            session_ms = (time.perf_counter() - start) * 1000
+            if turn in checkpoints:
+                rows.append((turn, legacy_bytes, legacy_ms, session_bytes, session_ms))
+
+    for turn, legacy_bytes, legacy_ms, session_bytes, session_ms in rows:
+        print(f"{turn:>6}{legacy_bytes:>14}{legacy_ms:>11.3f}{session_bytes:>15}{session_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
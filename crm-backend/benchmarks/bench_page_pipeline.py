@@ -0,0 +1,102 @@
+"""
+Compare the legacy tempfile page pipeline with the in-memory one.
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_page_pipeline [path/to/document.pdf]
+
+Without an argument a synthetic 5-page text PDF is generated.
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from routers.ocr import DocumentImageProcessor
+from routers.ocr_stages import (
+    API_RENDER_PROFILE, PageSource, StageReport, count_pages, optimize_image, payload_size, render_page, timed_stage
+)
+
+
+def build_sample_pdf(pages: int = 5) -> bytes:
+    """Create a small text-only PDF resembling a sheet of business cards"""
+    document = fitz.open()
+    for page_number in range(pages):
+        page = document.new_page()
+        for row in range(8):
+            page.insert_text((72, 72 + row * 90), f"Jane Doe {page_number}-{row}\nSales Director, Example Corp\n"
+                                                 f"jane{row}@example.com\n(555) 010-{1000 + row}")
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def legacy_page(processor: DocumentImageProcessor, pdf_content: bytes, page_index: int) -> StageReport:
+    """The pre-refactor path: PNG encode, tempfile, PNG re-save with optimize=True, reopen, JPEG"""
+    report: StageReport = {}
+    written = 0
+
+    start = time.perf_counter()
+    with fitz.open(stream=pdf_content, filetype="pdf") as document:
+        pix = document[page_index].get_pixmap(matrix=fitz.Matrix(3.0, 3.0))
+        image = Image.open(io.BytesIO(pix.tobytes("png")))
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_file:
+            image.save(tmp_file, format="PNG")
+            path = tmp_file.name
+    written += os.path.getsize(path)
+    report["render"] = (time.perf_counter() - start, written)
+
+    start = time.perf_counter()
+    with Image.open(path) as img:
+        optimized_path = path.replace(".png", "_optimized.png")
+        img.convert("RGB").save(optimized_path, format="PNG", optimize=True)
+    os.unlink(path)
+    report["optimize"] = (time.perf_counter() - start, os.path.getsize(optimized_path))
+
+    start = time.perf_counter()
+    payload = processor.compress_image(optimized_path)
+    os.unlink(optimized_path)
+    report["encode"] = (time.perf_counter() - start, payload_size(payload))
+    return report
+
+
+def in_memory_page(processor: DocumentImageProcessor, pdf_content: bytes, page_index: int) -> StageReport:
+    """The current API path: render at payload size, pixmap samples into PIL, one JPEG encode"""
+    report: StageReport = {}
+    source = PageSource(pdf_content, "pdf", page_index + 1)
+    image = timed_stage(report, "render", render_page, source, API_RENDER_PROFILE)
+    image = timed_stage(report, "optimize", optimize_image, image, API_RENDER_PROFILE)
+    timed_stage(report, "encode", processor.encode_image_for_api, image)
+    return report
+
+
+def summarize(label: str, reports) -> float:
+    total = 0.0
+    print(f"\n{label}")
+    for stage in ("render", "optimize", "encode"):
+        seconds = sum(report[stage][0] for report in reports)
+        size = sum(report[stage][1] for report in reports)
+        total += seconds
+        print(f"  {stage:<9} {seconds * 1000 / len(reports):8.1f} ms/page  {size / len(reports) / 1e6:8.2f} MB/page")
+    print(f"  {'total':<9} {total * 1000 / len(reports):8.1f} ms/page")
+    return total
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            pdf_content = f.read()
+    else:
+        pdf_content = build_sample_pdf()
+
+    processor = DocumentImageProcessor("benchmark-key")
+    pages = count_pages(pdf_content, "pdf")
+
+    legacy_total = summarize("legacy (tempfiles, MB = bytes written to disk)",
+                             [legacy_page(processor, pdf_content, i) for i in range(pages)])
+    memory_total = summarize("in-memory (MB = pixel/payload bytes held in memory)",
+                             [in_memory_page(processor, pdf_content, i) for i in range(pages)])
+    print(f"\nspeedup: {legacy_total / memory_total:.1f}x over {pages} page(s)")
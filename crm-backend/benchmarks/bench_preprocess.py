@@ -0,0 +1,51 @@
+"""
+Time the OCR preprocessing stage (crop, deskew, x-height downscale, binarize).
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_preprocess [path/to/document.pdf]
+
+Each page is rendered with the OCR profile's resolution, then preprocessed
+straight and tilted by a few degrees to exercise the deskew path.
+"""
+import sys
+import time
+from dataclasses import replace
+
+from PIL import Image
+
+from benchmarks.bench_page_pipeline import build_sample_pdf
+from routers.ocr_stages import (
+    OCR_RENDER_PROFILE, PageSource, count_pages, optimize_image, payload_size, render_page
+)
+
+
+def measure(label: str, images) -> None:
+    seconds = 0.0
+    megapixels = 0.0
+    input_bytes = output_bytes = 0
+    for image in images:
+        start = time.perf_counter()
+        result = optimize_image(image, OCR_RENDER_PROFILE)
+        seconds += time.perf_counter() - start
+        megapixels += image.width * image.height / 1e6
+        input_bytes += payload_size(image)
+        output_bytes += payload_size(result)
+    print(f"{label:<10} {seconds * 1000 / len(images):7.1f} ms/page  {seconds * 1000 / megapixels:6.1f} ms/MP  "
+          f"{input_bytes / len(images) / 1e6:6.2f} MB -> {output_bytes / len(images) / 1e6:6.2f} MB per page")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            pdf_content = f.read()
+    else:
+        pdf_content = build_sample_pdf()
+
+    # Render without preprocessing so the stage is timed on its own
+    render_profile = replace(OCR_RENDER_PROFILE, crop_borders=False, deskew=False, binarize=False,
+                             target_x_height=None)
+    pages = [render_page(PageSource(pdf_content, "pdf", i + 1), render_profile)
+             for i in range(count_pages(pdf_content, "pdf"))]
+
+    measure("straight", pages)
+    measure("tilted", [page.rotate(3, resample=Image.BILINEAR, expand=True, fillcolor=255) for page in pages])
@@ -0,0 +1,44 @@
+"""
+Measure per-page rasterization cost for each render target.
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_render_targets [path/to/document.pdf]
+
+Compares the old fixed 3x RGB render with the API and Tesseract profiles.
+Memory is the size of the page's pixel buffer.
+"""
+import sys
+import time
+
+from benchmarks.bench_page_pipeline import build_sample_pdf
+from routers.ocr_stages import (
+    API_RENDER_PROFILE, OCR_RENDER_PROFILE, PageSource, RenderProfile, count_pages, payload_size, render_page
+)
+
+PROFILES = {
+    "legacy 3x RGB": RenderProfile(dpi=216),
+    "api 1024px": API_RENDER_PROFILE,
+    "api 1024px clipped": RenderProfile(max_dimension=1024, clip_to_content=True),
+    "tesseract 300dpi gray": OCR_RENDER_PROFILE,
+    "tesseract 300dpi gray clipped": RenderProfile(dpi=300, grayscale=True, clip_to_content=True),
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            pdf_content = f.read()
+    else:
+        pdf_content = build_sample_pdf()
+
+    sources = [PageSource(pdf_content, "pdf", page_number)
+               for page_number in range(1, count_pages(pdf_content, "pdf") + 1)]
+
+    print(f"{'profile':<32}{'ms/page':>10}{'MB/page':>10}{'pixels':>14}")
+    for label, profile in PROFILES.items():
+        start = time.perf_counter()
+        images = [render_page(source, profile) for source in sources]
+        elapsed = (time.perf_counter() - start) * 1000 / len(sources)
+        memory = sum(payload_size(image) for image in images) / len(images) / 1e6
+        size = f"{images[0].width}x{images[0].height}"
+        print(f"{label:<32}{elapsed:>10.1f}{memory:>10.2f}{size:>14}")
@@ -0,0 +1,87 @@
+"""
+Track server cold-start time per subsystem configuration.
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_startup [runs] [--max-import-ms N]
+
+Each configuration runs in fresh interpreters (default 5 runs, median
+reported). The columns are the time to import FastAPI, which every
+configuration pays; the time to import main on top of it; the time from
+there until the lifespan has started and /health answers (warm-up keeps
+running in the background and is not included); and the heavy libraries
+the server process has loaded after importing main. "eager" imports those
+libraries up front, as main.py used to. With --max-import-ms the script
+exits with status 1 when a configuration's median import time exceeds
+the limit, so CI can catch regressions.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["fitz", "numpy", "PIL.Image", "pytesseract", "requests", "httpx"]
+
+# (label, ENABLED_SUBSYSTEMS, modules imported before main)
+CONFIGURATIONS = [
+    ("eager (all, heavy libs preloaded)", "", HEAVY_MODULES),
+    ("all subsystems", "", []),
+    ("api only (llm,email)", "llm,email", []),
+    ("ocr only", "ocr", []),
+]
+
+CHILD = """
+import importlib, json, logging, sys, time
+logging.disable(logging.CRITICAL)
+heavy = json.loads(sys.argv[1])
+start = time.perf_counter()
+import fastapi, fastapi.exceptions, fastapi.middleware.cors, fastapi.responses
+framework = time.perf_counter()
+for name in json.loads(sys.argv[2]):
+    importlib.import_module(name)
+import main
+imported = time.perf_counter()
+from routers.lazy_imports import is_loaded
+loaded = [name for name in heavy if is_loaded(name)]
+from fastapi.testclient import TestClient
+start_client = time.perf_counter()
+with TestClient(main.app) as client:
+    assert client.get("/health").status_code == 200
+    started = time.perf_counter()
+print("RESULT " + json.dumps({"framework": framework - start, "import": imported - framework, "startup": started - start_client, "loaded": loaded}), flush=True)
+"""
+
+
+def measure(subsystems: str, preload: list) -> dict:
+    env = {**os.environ, "ENABLED_SUBSYSTEMS": subsystems, "OCR_CPU_WORKERS": "1"}
+    env.setdefault("OPENROUTER_API_KEY", "bench-placeholder-key")  # so the OCR stack is built
+    output = subprocess.run([sys.executable, "-c", CHILD, json.dumps(HEAVY_MODULES), json.dumps(preload)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    # The server prints its own start-up and shutdown messages around the result line
+    result = next(line for line in output.splitlines() if line.startswith("RESULT "))
+    return json.loads(result[len("RESULT "):])
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    max_import_ms = None
+    if "--max-import-ms" in args:
+        index = args.index("--max-import-ms")
+        max_import_ms = float(args[index + 1])
+        del args[index:index + 2]
+    runs = int(args[0]) if args else 5
+
+    print(f"{'configuration':<36}{'fastapi ms':>11}{'import ms':>10}{'startup ms':>12}  heavy libraries loaded")
+    failed = False
+    for label, subsystems, preload in CONFIGURATIONS:
+        samples = [measure(subsystems, preload) for _ in range(runs)]
+        framework_ms = statistics.median(sample["framework"] for sample in samples) * 1000
+        import_ms = statistics.median(sample["import"] for sample in samples) * 1000
+        startup_ms = statistics.median(sample["startup"] for sample in samples) * 1000
+        print(f"{label:<36}{framework_ms:>11.0f}{import_ms:>10.0f}{startup_ms:>12.0f}  {', '.join(samples[-1]['loaded']) or '-'}")
+        if max_import_ms is not None and not preload and import_ms > max_import_ms:
+            failed = True
+
+    if failed:
+        print(f"\nimport time regression: a configuration took over {max_import_ms:.0f} ms")
+        sys.exit(1)
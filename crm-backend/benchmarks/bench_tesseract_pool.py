@@ -0,0 +1,56 @@
+"""
+Compare a pytesseract subprocess per page with the persistent Tesseract pool.
+
+Usage (from crm-backend/):
+    python -m benchmarks.bench_tesseract_pool [pages] [path/to/document.pdf]
+
+Pages are rendered once with the OCR render profile, then recognized
+sequentially and through process_multiple_images-style parallelism.
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytesseract
+
+from benchmarks.bench_page_pipeline import build_sample_pdf
+from routers.ocr_stages import OCR_RENDER_PROFILE, PageSource, count_pages, render_page
+from routers.tesseract_pool import TesseractPool
+
+if __name__ == "__main__":
+    page_limit = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "rb") as f:
+            pdf_content = f.read()
+    else:
+        pdf_content = build_sample_pdf(page_limit)
+
+    pages = min(page_limit, count_pages(pdf_content, "pdf"))
+    images = [render_page(PageSource(pdf_content, "pdf", i + 1), OCR_RENDER_PROFILE) for i in range(pages)]
+
+    pool = TesseractPool.from_env()
+    print(f"backend: {pool.backend}, pool size {pool.size}, languages {pool.languages}, psm {pool.psm}")
+
+    start = time.perf_counter()
+    pool.warm_up()
+    print(f"warm-up: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    for image in images:
+        pytesseract.image_to_string(image)
+    subprocess_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for image in images:
+        pool.image_to_string(image)
+    pooled_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        list(executor.map(pool.image_to_string, images))
+    parallel_seconds = time.perf_counter() - start
+
+    print(f"subprocess per page: {subprocess_seconds * 1000 / pages:8.1f} ms/page")
+    print(f"pooled sequential:   {pooled_seconds * 1000 / pages:8.1f} ms/page")
+    print(f"pooled x{pool.size} threads:  {parallel_seconds * 1000 / pages:8.1f} ms/page")
+    pool.close()
@@ -1,19 +1,26 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile
+from fastapi import FastAPI, HTTPException, File, Query, Request, UploadFile
+from typing import List
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from models.lead_schema import QueryRequest
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from models.lead_schema import BatchQueryRequest, QueryRequest
+from pydantic import ValidationError
 from routers.custom_crm_llm import CustomCRMLLM
-from routers import email_sender
-from routers.ocr import DocumentImageProcessor
+from routers.llm_sessions import ConversationSessionStore
+from routers.ocr import DocumentImageProcessor, Lead
+from routers.circuit_breaker import CircuitBreaker
+from routers.ocr_engine import OCRExecutionEngine, EngineSaturatedError
+from routers.ocr_jobs import OCRJobQueue, JobNotFoundError, QueueFullError
+from routers.ocr_bulk import BulkIngestor, BulkUploadError
+from routers.rate_limiter import api_scope
 from dotenv import load_dotenv
+from contextlib import AsyncExitStack, asynccontextmanager
+import asyncio
+import json
 import logging
-import tempfile
 import os
 import time
-from PIL import Image
-import fitz  # PyMuPDF
-import numpy as np
-import io
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,33 +28,185 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+SUBSYSTEMS = ("llm", "ocr", "email")
+
+def enabled_subsystems_from_env() -> set:
+    """Subsystems this process serves, from ENABLED_SUBSYSTEMS (comma-separated, default all)"""
+    value = os.getenv("ENABLED_SUBSYSTEMS", "").strip()
+    if not value:
+        return set(SUBSYSTEMS)
+    enabled = {name.strip().lower() for name in value.split(",") if name.strip()}
+    unknown = enabled - set(SUBSYSTEMS)
+    if unknown:
+        raise ValueError(f"Unknown ENABLED_SUBSYSTEMS {sorted(unknown)}, expected some of {list(SUBSYSTEMS)}")
+    return enabled
+
+# Separate worker pools (e.g. OCR-only and API-only) can each enable just what they serve;
+# disabled subsystems are never built and their endpoints answer 503
+enabled_subsystems = enabled_subsystems_from_env()
+logger.info(f"Enabled subsystems: {sorted(enabled_subsystems)}")
+
+# Initialize LLM (with error handling); the OCR stack is built at startup by build_ocr_subsystem
+llm = None
+if "llm" in enabled_subsystems:
+    try:
+        llm = CustomCRMLLM()
+        logger.info("CustomCRMLLM initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize CustomCRMLLM: {e}")
+
+# Largest /llm/batch request accepted
+llm_batch_max_items = int(os.getenv("LLM_BATCH_MAX_ITEMS", "50000"))
+llm_batch_max_bytes = int(os.getenv("LLM_BATCH_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Server-side conversation state, so /llm clients only send the new message
+llm_sessions = None
+if llm is not None:
+    try:
+        llm_sessions = ConversationSessionStore.from_env()
+        logger.info(f"LLM session store initialized: {llm_sessions.stats()}")
+    except Exception as e:
+        logger.error(f"Failed to initialize LLM session store: {e}")
+
+ocr_processor = None
+ocr_engine = None
+ocr_jobs = None
+ocr_bulk = None
+
+def build_ocr_subsystem():
+    """
+    Build the OCR processor, execution engine, job queue and bulk ingestor
+    
+    Runs from the lifespan handler rather than at import, so importing this module stays
+    cheap and each server worker builds its own process pool and clients after forking.
+    Heavy imaging and HTTP libraries still load on first use (see routers.lazy_imports).
+    """
+    global ocr_processor, ocr_engine, ocr_jobs, ocr_bulk
+    try:
+        # Initialize OCR processor with your OpenRouter API key
+        openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+        if not openrouter_api_key:
+            logger.warning("OPENROUTER_API_KEY not found in environment variables")
+            ocr_processor = None
+        else:
+            ocr_processor = DocumentImageProcessor(
+                openrouter_api_key,
+                connect_timeout=float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "5")),
+                max_connections=int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20")),
+                extraction_mode=os.getenv("OCR_EXTRACTION_MODE", "structured"),
+                circuit_breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv("OPENROUTER_BREAKER_FAILURES", "5")),
+                    window=float(os.getenv("OPENROUTER_BREAKER_WINDOW", "30")),
+                    reset_timeout=float(os.getenv("OPENROUTER_BREAKER_RESET", "30")),
+                    slow_call_threshold=float(os.getenv("OPENROUTER_BREAKER_SLOW_CALL", "10")) or None
+                )
+            )
+            logger.info("OCR processor initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize OCR processor: {e}")
+        ocr_processor = None
+
+    # OCR execution engine keeps rasterizing, Tesseract and API calls off the event loop
+    ocr_engine = None
+    if ocr_processor is not None:
+        try:
+            ocr_engine = OCRExecutionEngine.from_env(ocr_processor)
+            logger.info(f"OCR execution engine initialized: {ocr_engine.stats()}")
+        except Exception as e:
+            logger.error(f"Failed to initialize OCR execution engine: {e}")
+            ocr_processor = None
+
+    # Persistent background queue for long-running uploads (workers start with the app)
+    ocr_jobs = None
+    if ocr_engine is not None:
+        try:
+            ocr_jobs = OCRJobQueue.from_env(ocr_engine)
+            logger.info(f"OCR job queue initialized at {ocr_jobs.db_path}")
+        except Exception as e:
+            logger.error(f"Failed to initialize OCR job queue: {e}")
+
+    # Bulk ingest fans ZIP/multipart batches of cards out across API and Tesseract capacity
+    ocr_bulk = BulkIngestor.from_env(ocr_engine) if ocr_engine is not None else None
+
+# Warm-up state reported by /ready; the worker only takes traffic once every engine is warm
+readiness = {"ready": False, "warm_up": {}, "warm_up_seconds": None, "failed": []}
+# Warm-up steps whose failure leaves the worker ready: a cold OpenRouter connection only costs the first call its
+# latency, while a missing LLM or broken OCR workers (e.g. no Tesseract) would fail real requests
+WARM_UP_OPTIONAL = {name.strip() for name in os.getenv("WARM_UP_OPTIONAL", "openrouter_connection").split(",")
+                    if name.strip()}
+
+def warm_up_failed(name: str, result) -> bool:
+    """Whether a warm-up step's result means its engine cannot serve requests"""
+    if isinstance(result, dict) and "error" in result:
+        return True
+    if name == "ocr_workers":
+        return not result["workers"] or bool(result["errors"])
+    return result is False
+
+async def warm_up_engines():
+    """Initialize and warm every engine once, concurrently, then mark this worker ready unless a required step failed"""
+    start_time = time.time()
+    steps = {}
+    if llm is not None:
+        steps["llm"] = llm.ensure_initialized()
+    if ocr_engine is not None:
+        steps["ocr_workers"] = ocr_engine.warm_up()
+    if ocr_processor is not None:
+        steps["openrouter_connection"] = ocr_processor.warm_up_connection_async()
+    
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Warm-up of {name} failed: {result}")
+            result = {"error": str(result)}
+        readiness["warm_up"][name] = result
+        if warm_up_failed(name, result) and name not in WARM_UP_OPTIONAL:
+            readiness["failed"].append(name)
+    readiness["warm_up_seconds"] = round(time.time() - start_time, 3)
+    readiness["ready"] = not readiness["failed"]
+    if readiness["failed"]:
+        logger.error(f"Warm-up failed for {readiness['failed']}, worker stays not ready: {readiness['warm_up']}")
+    else:
+        logger.info(f"Warm-up finished in {readiness['warm_up_seconds']}s: {readiness['warm_up']}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers and warm-up on startup; stop and close everything on shutdown"""
+    logger.info("Mini-CRM Backend starting up...")
+    logger.info("Health check available at: /health (readiness at /ready)")
+    logger.info("API documentation available at: /docs")
+    if "ocr" in enabled_subsystems:
+        build_ocr_subsystem()
+    if ocr_jobs is not None:
+        ocr_jobs.start()
+        logger.info("OCR job workers started")
+    # Warm up in the background so /health answers at once while /ready reports 503
+    warm_up_task = asyncio.create_task(warm_up_engines())
+    
+    yield
+    
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+        await asyncio.gather(warm_up_task, return_exceptions=True)
+    if ocr_jobs is not None:
+        await ocr_jobs.stop()
+        logger.info("OCR job workers stopped")
+    if ocr_engine is not None:
+        ocr_engine.shutdown()
+        logger.info("OCR execution engine stopped")
+    if ocr_processor is not None:
+        await ocr_processor.aclose()
+        logger.info("OpenRouter HTTP clients closed")
+    if llm_sessions is not None:
+        llm_sessions.close()
+
 app = FastAPI(
     title="Mini-CRM Backend",
     description="A FastAPI backend for Mini-CRM with LLM integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Initialize LLM and OCR processor (with error handling)
-try:
-    llm = CustomCRMLLM()
-    logger.info("CustomCRMLLM initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize CustomCRMLLM: {e}")
-    llm = None
-
-try:
-    # Initialize OCR processor with your OpenRouter API key
-    openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
-    if not openrouter_api_key:
-        logger.warning("OPENROUTER_API_KEY not found in environment variables")
-        ocr_processor = None
-    else:
-        ocr_processor = DocumentImageProcessor(openrouter_api_key)
-        logger.info("OCR processor initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize OCR processor: {e}")
-    ocr_processor = None
-
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -64,12 +223,39 @@ async def health_check():
     health_status = {
         "status": "healthy",
         "service": "Mini-CRM Backend",
+        "ready": readiness["ready"],
+        "subsystems": sorted(enabled_subsystems),
         "llm_available": llm is not None,
+        "llm_sessions": llm_sessions.stats() if llm_sessions is not None else None,
         "ocr_available": ocr_processor is not None,
+        "ocr_engine": ocr_engine.stats() if ocr_engine is not None else None,
+        "openrouter_circuit": ocr_processor.circuit_breaker.stats() if ocr_processor is not None else None,
+        "openrouter_rate_limit": ocr_processor.rate_limiter.stats() if ocr_processor is not None else None,
+        "ocr_cache": ocr_engine.cache.stats() if ocr_engine is not None and ocr_engine.cache is not None else None,
+        "ocr_jobs": ocr_jobs.stats() if ocr_jobs is not None else None,
         "timestamp": time.time()
     }
     return JSONResponse(content=health_status)
 
+# Readiness probe: unlike /health, fails until warm-up is done so load balancers skip cold workers
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 once every engine is initialized and warm, 503 before or if a required engine failed"""
+    if readiness["ready"]:
+        status = "ready"
+    else:
+        status = "failed" if readiness["failed"] else "warming_up"
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content={
+            "status": status,
+            "failed": readiness["failed"],
+            "warm_up": readiness["warm_up"],
+            "warm_up_seconds": readiness["warm_up_seconds"],
+            "timestamp": time.time()
+        }
+    )
+
 # Favicon endpoint (returns 204 No Content)
 @app.get("/favicon.ico")
 async def favicon():
@@ -85,8 +271,14 @@ async def read_root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "llm": "/llm (POST)",
+            "llm_batch": "/llm/batch (POST, NDJSON)",
+            "llm_sessions": "/llm/sessions/{session_id} (DELETE)",
             "ocr": "/ocr (POST)",
+            "ocr_stream": "/ocr/stream (POST, NDJSON or SSE)",
+            "ocr_jobs": "/ocr/jobs (POST), /ocr/jobs/{job_id} (GET, DELETE), /ocr/jobs/{job_id}/result (GET)",
+            "ocr_bulk": "/ocr/bulk (POST, ZIP or multipart batch, NDJSON or SSE)",
             "docs": "/docs"
         }
     }
@@ -109,12 +301,19 @@ async def handle_llm_query(request: QueryRequest):
                 detail="Query cannot be empty"
             )
         
-        # Process the query
-        result = await llm.process_query(
-            query=request.query,
-            lead_data=request.lead.model_dump(),
-            history=request.conversationHistory
-        )
+        if request.sessionId is None:
+            if request.lead is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Lead is required without a sessionId"
+                )
+            result = await llm.process_query(
+                query=request.query,
+                lead_data=request.lead.model_dump(),
+                history=request.conversationHistory
+            )
+        else:
+            result = await process_session_query(request)
         
         logger.info(f"Successfully processed query: {request.query[:50]}...")
         return result
@@ -128,6 +327,145 @@ async def handle_llm_query(request: QueryRequest):
             detail="Internal server error while processing query"
         )
 
+async def process_session_query(request: QueryRequest) -> dict:
+    """Answer one turn of a server-side conversation, updating its stored state"""
+    if llm_sessions is None:
+        raise HTTPException(
+            status_code=503,
+            detail="LLM session store is not available"
+        )
+    
+    # With a SQLite tier every store call blocks on the database, so they run in the default executor
+    loop = asyncio.get_running_loop()
+    session = await loop.run_in_executor(None, llm_sessions.get_or_create, request.sessionId)
+    if request.lead is not None:
+        session.lead = request.lead.model_dump()
+    if session.lead is None:
+        # New or expired session: the client resends the lead to (re)start it
+        raise HTTPException(
+            status_code=409,
+            detail="Unknown or expired session, resend the lead to start it"
+        )
+    # A client moving over from full-history requests seeds the new session once
+    if not session.history and request.conversationHistory:
+        for message in request.conversationHistory:
+            session.history.append(message)
+            llm.observe(session.intent_signals, message)
+    
+    result = await llm.process_query(
+        query=request.query,
+        lead_data=session.lead,
+        session=session
+    )
+    await loop.run_in_executor(None, llm_sessions.save, session)
+    result["sessionId"] = session.session_id
+    return result
+
+@app.delete("/llm/sessions/{session_id}")
+async def end_llm_session(session_id: str):
+    """Forget a conversation's server-side state"""
+    if llm_sessions is None:
+        raise HTTPException(
+            status_code=503,
+            detail="LLM session store is not available"
+        )
+    if not await asyncio.get_running_loop().run_in_executor(None, llm_sessions.delete, session_id):
+        raise HTTPException(
+            status_code=404,
+            detail=f"LLM session not found: {session_id}"
+        )
+    return {"success": True, "sessionId": session_id}
+
+# Items answered between yields of the /llm/batch stream, so the event loop is never held for long
+LLM_BATCH_CHUNK = 1000
+
+# Batch LLM endpoint: triage many leads in one request instead of one /llm call each
+@app.post("/llm/batch")
+async def handle_llm_batch(request: Request):
+    """
+    Answer {"items": [{"query", "lead"}, ...]} in one request, streaming one NDJSON line per item
+    
+    Bodies over LLM_BATCH_MAX_BYTES are rejected with 413 before they are read in full; the rest
+    is parsed and validated in a single pass in the executor. Each "result" line carries the item's
+    index and the /llm fields (intent, confidence, intents, response, actions); items with an
+    empty query get an "error" instead. A final "summary" line reports the item count and timing.
+    """
+    if llm is None:
+        raise HTTPException(
+            status_code=503,
+            detail="LLM service is not available"
+        )
+    
+    body = await read_limited_body(request, llm_batch_max_bytes)
+    try:
+        # Validating tens of thousands of items takes a while; keep other requests flowing meanwhile
+        batch = await asyncio.get_running_loop().run_in_executor(None, BatchQueryRequest.model_validate_json, body)
+    except ValidationError as e:
+        # Same 422 body as FastAPI's own validation, without echoing the (possibly huge) input
+        raise RequestValidationError(e.errors(include_url=False, include_input=False))
+    if len(batch.items) > llm_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has more than {llm_batch_max_items} items"
+        )
+    await llm.ensure_initialized()
+    
+    return StreamingResponse(
+        stream_llm_batch(batch),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def read_limited_body(request: Request, max_bytes: int) -> bytes:
+    """Read a request body, answering 413 as soon as it (or its declared length) exceeds max_bytes"""
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Request body is larger than {max_bytes} bytes"
+    )
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        raise too_large
+    # The declared length may be missing (chunked uploads) or wrong, so count what actually arrives
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    return bytes(body)
+
+async def stream_llm_batch(batch: BatchQueryRequest):
+    """Yield NDJSON result lines for a validated batch, one chunk of items at a time"""
+    start_time = time.time()
+    failed = 0
+    for chunk_start in range(0, len(batch.items), LLM_BATCH_CHUNK):
+        chunk = list(enumerate(batch.items[chunk_start:chunk_start + LLM_BATCH_CHUNK], chunk_start))
+        valid = [(index, item) for index, item in chunk if item.query.strip()]
+        results = llm.process_batch([(item.query, item.lead.model_dump()) for _, item in valid])
+        
+        lines = []
+        answered = {index: result for (index, _), result in zip(valid, results)}
+        for index, item in chunk:
+            result = answered.get(index)
+            if result is None:
+                failed += 1
+                line = {"event": "result", "index": index, "leadId": item.lead.id, "error": "Query cannot be empty"}
+            else:
+                line = {"event": "result", "index": index, "leadId": item.lead.id, **result}
+            lines.append(json.dumps(line))
+        yield "\n".join(lines) + "\n"
+        await asyncio.sleep(0)
+    
+    processing_time = time.time() - start_time
+    logger.info(f"Answered LLM batch of {len(batch.items)} item(s) in {processing_time:.2f}s")
+    yield json.dumps({
+        "event": "summary",
+        "success": True,
+        "items_total": len(batch.items),
+        "items_failed": failed,
+        "processing_time": processing_time,
+        "items_per_second": len(batch.items) / processing_time if processing_time > 0 else 0.0
+    }) + "\n"
+
 # OCR endpoint for image processing
 @app.post("/ocr")
 async def process_ocr(file: UploadFile = File(...)):
@@ -135,96 +473,18 @@ async def process_ocr(file: UploadFile = File(...)):
     start_time = time.time()
     
     try:
-        # Check if OCR processor is available
-        if ocr_processor is None:
-            raise HTTPException(
-                status_code=503,
-                detail="OCR service is not available. Please check OPENROUTER_API_KEY configuration."
-            )
+        content = await read_ocr_upload(file)
         
-        # Read file content
-        content = await file.read()
-        
-        # Validate file size (max 10MB)
-        if len(content) > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(
-                status_code=400,
-                detail="File size must be less than 10MB"
-            )
-        
-        # Check file type and handle accordingly
-        if file.content_type == 'application/pdf':
-            # Convert PDF to images
-            image_paths = await convert_pdf_to_images(content)
-        elif file.content_type.startswith('image/'):
-            # Handle regular image files
-            image_paths = await save_image_file(content)
-        else:
+        try:
+            async with ocr_engine.admit():
+                return await run_ocr_job(file, content, start_time)
+        except EngineSaturatedError as e:
+            logger.warning(f"Rejecting OCR upload {file.filename}: {e}")
             raise HTTPException(
-                status_code=400,
-                detail="File must be an image (JPG, PNG, GIF, BMP) or PDF"
+                status_code=503,
+                detail="OCR service is busy, please retry shortly",
+                headers={"Retry-After": "5"}
             )
-        
-        # Process all images for OCR
-        all_leads = []
-        optimized_image_paths = []
-        
-        try:
-            for image_path in image_paths:
-                # Optimize image for better OCR results
-                optimized_path = optimize_image_for_ocr(image_path)
-                optimized_image_paths.append(optimized_path)
-                
-                logger.info(f"Processing OCR for optimized image: {optimized_path}")
-                leads = ocr_processor.process_image(optimized_path)
-                all_leads.extend(leads)
-            
-            # Process leads and add confidence scores
-            leads_data = []
-            for lead in all_leads:
-                # Calculate confidence based on available fields
-                confidence = calculate_lead_confidence(lead)
-                
-                lead_dict = {
-                    'name': lead.name,
-                    'company': lead.company,
-                    'title': lead.title,
-                    'email': lead.email,
-                    'phone': lead.phone,
-                    'address': lead.address,
-                    'industry': lead.industry,
-                    'website': lead.website,
-                    'social_media': lead.social_media,
-                    'additional_info': lead.additional_info,
-                    'confidence': confidence
-                }
-                leads_data.append(lead_dict)
-            
-            processing_time = time.time() - start_time
-            
-            logger.info(f"Successfully processed OCR, found {len(leads_data)} leads in {processing_time:.2f}s")
-            
-            # Return standardized response format
-            return {
-                "success": True,
-                "filename": file.filename,
-                "file_type": "PDF" if file.content_type == 'application/pdf' else "Image",
-                "pages_processed": len(image_paths),
-                "leads_count": len(leads_data),
-                "leads": leads_data,
-                "processing_time": processing_time,
-                "message": f"Successfully extracted {len(leads_data)} lead(s) from {file.filename}"
-            }
-            
-        finally:
-            # Clean up temporary files (both original and optimized)
-            all_paths_to_cleanup = image_paths + optimized_image_paths
-            for image_path in set(all_paths_to_cleanup):  # Use set to avoid duplicates
-                try:
-                    if os.path.exists(image_path):
-                        os.unlink(image_path)
-                except Exception as e:
-                    logger.warning(f"Failed to clean up temporary file {image_path}: {e}")
                 
     except HTTPException:
         raise
@@ -235,82 +495,359 @@ async def process_ocr(file: UploadFile = File(...)):
             detail=f"Internal server error while processing file: {str(e)}"
         )
 
-async def convert_pdf_to_images(pdf_content: bytes) -> list:
-    """Convert PDF content to image files using PyMuPDF (no external dependencies)"""
+# Streaming OCR endpoint: one event per finished page instead of a single response at the end
+@app.post("/ocr/stream")
+async def stream_ocr(request: Request, file: UploadFile = File(...)):
+    """
+    Process uploaded image or PDF page by page, streaming each page's leads as soon as it finishes
+    
+    Responds with NDJSON, or Server-Sent Events when the client accepts text/event-stream.
+    Events: "started", one "page" per page (in completion order), then "summary" or "error".
+    """
+    start_time = time.time()
+    content = await read_ocr_upload(file)
+    
+    # The queue slot is held until the stream ends, not just until this handler returns
+    slot = AsyncExitStack()
     try:
-        # Open PDF from bytes
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-        
-        image_paths = []
-        
-        # Process each page
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            
-            # Render page to image with high DPI for better OCR
-            mat = fitz.Matrix(3.0, 3.0)  # 3x zoom = ~300 DPI
-            pix = page.get_pixmap(matrix=mat)
-            
-            # Convert to PIL Image
-            img_data = pix.tobytes("png")
-            image = Image.open(io.BytesIO(img_data))
-            
-            # Save as temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'_page_{page_num+1}.png') as tmp_file:
-                image.save(tmp_file, format='PNG')
-                image_paths.append(tmp_file.name)
+        await slot.enter_async_context(ocr_engine.admit())
+    except EngineSaturatedError as e:
+        logger.warning(f"Rejecting OCR upload {file.filename}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="OCR service is busy, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    
+    try:
+        sources = await load_page_sources(content, file.content_type)
+    except BaseException:
+        await slot.aclose()
+        raise
+    
+    use_sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        stream_ocr_events(file, sources, start_time, slot, use_sse),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(slot.aclose)
+    )
+
+async def stream_ocr_events(file: UploadFile, sources: list, start_time: float, slot: AsyncExitStack, use_sse: bool):
+    """Yield encoded OCR events while the engine works through the pages of one upload"""
+    file_type = "PDF" if file.content_type == 'application/pdf' else "Image"
+    encode = lambda event: encode_stream_event(event, use_sse)
+    
+    try:
+        yield encode({
+            "event": "started",
+            "filename": file.filename,
+            "file_type": file_type,
+            "pages_total": len(sources)
+        })
         
-        pdf_document.close()
-        logger.info(f"Successfully converted PDF to {len(image_paths)} image(s) using PyMuPDF")
-        return image_paths
+        page_timings = {}
+        leads_count = 0
+        # Page tasks start on the first iteration, so the scope has to cover the loop
+        with api_scope():
+            async for page in ocr_engine.iter_pages(sources):
+                leads_data = [lead_to_response(lead) for lead in page.leads]
+                leads_count += len(leads_data)
+                page_timings[page.page_number] = page.processing_time
+                yield encode({
+                    "event": "page",
+                    "page_number": page.page_number,
+                    "leads": leads_data,
+                    "leads_count": len(leads_data),
+                    "processing_time": page.processing_time,
+                    "pages_completed": len(page_timings),
+                    "pages_total": len(sources)
+                })
         
+        processing_time = time.time() - start_time
+        logger.info(f"Successfully streamed OCR, found {leads_count} leads in {processing_time:.2f}s")
+        yield encode({
+            "event": "summary",
+            "success": True,
+            "filename": file.filename,
+            "file_type": file_type,
+            "pages_processed": len(sources),
+            "leads_count": leads_count,
+            "processing_time": processing_time,
+            "page_timings": [page_timings[source.page_number] for source in sources],
+            "message": f"Successfully extracted {leads_count} lead(s) from {file.filename}"
+        })
     except Exception as e:
-        logger.error(f"Error converting PDF to images with PyMuPDF: {e}")
+        # Headers are already sent, so failures are reported in-band
+        logger.error(f"Error streaming OCR: {e}")
+        yield encode({
+            "event": "error",
+            "success": False,
+            "detail": f"Internal server error while processing file: {str(e)}"
+        })
+    finally:
+        await slot.aclose()
+
+def encode_stream_event(event: dict, use_sse: bool) -> str:
+    """Encode one streaming event as an NDJSON line or a Server-Sent Event"""
+    if use_sse:
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+# Bulk OCR endpoint: a ZIP of cards or a multipart batch, deduplicated leads streamed as cards finish
+@app.post("/ocr/bulk")
+async def bulk_ocr(request: Request, files: List[UploadFile] = File(...)):
+    """
+    Process a batch of business cards, streaming deduplicated leads as each card finishes
+    
+    Accepts any mix of ZIP archives, images and PDFs; archive members are read one at a
+    time and never extracted to disk. Cards go to the vision API while API slots are free
+    and to Tesseract otherwise. Responds with NDJSON, or Server-Sent Events when the client
+    accepts text/event-stream. Events: "started", one "entry" per card (in completion
+    order, with running cards_per_minute), then "summary" or "error".
+    """
+    if ocr_bulk is None:
         raise HTTPException(
-            status_code=500,
-            detail=f"Failed to convert PDF to images: {str(e)}"
+            status_code=503,
+            detail="OCR service is not available. Please check your OpenRouter API key configuration."
         )
+    
+    start_time = time.time()
+    try:
+        # Reading ZIP central directories blocks on the spooled uploads, so list the cards off the event loop
+        uploads = [(file.filename or "upload", file.content_type, file.file) for file in files]
+        entries = await asyncio.get_running_loop().run_in_executor(None, ocr_bulk.collect, uploads)
+    except BulkUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # One queue slot covers the whole batch; per-card concurrency is the ingestor's job
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(ocr_engine.admit())
+    except EngineSaturatedError as e:
+        logger.warning(f"Rejecting bulk OCR upload of {len(entries)} card(s): {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="OCR service is busy, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    
+    use_sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        stream_bulk_events(entries, start_time, slot, use_sse),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(slot.aclose)
+    )
 
-async def save_image_file(image_content: bytes) -> list:
-    """Save image content to temporary file and return list with single file path"""
+async def stream_bulk_events(entries: list, start_time: float, slot: AsyncExitStack, use_sse: bool):
+    """Yield encoded bulk OCR events while the ingestor works through a batch"""
     try:
-        # Create temporary file to save uploaded image
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
-            tmp_file.write(image_content)
-            return [tmp_file.name]
-            
+        yield encode_stream_event({
+            "event": "started",
+            "entries_total": len(entries),
+            "concurrency": ocr_bulk.concurrency,
+            "api_concurrency": ocr_bulk.api_concurrency
+        }, use_sse)
+        
+        async for event in ocr_bulk.run(entries):
+            if event["event"] == "entry":
+                event["leads"] = [lead_to_response(lead) for lead in event["leads"]]
+            else:
+                logger.info(f"Bulk OCR processed {event['cards_processed']} card(s), {event['leads_count']} unique "
+                            f"lead(s) in {time.time() - start_time:.2f}s ({event['cards_per_minute']:.1f} cards/min)")
+            yield encode_stream_event(event, use_sse)
     except Exception as e:
-        logger.error(f"Error saving image file: {e}")
+        logger.error(f"Error streaming bulk OCR: {e}")
+        yield encode_stream_event({
+            "event": "error",
+            "success": False,
+            "detail": f"Internal server error while processing batch: {str(e)}"
+        }, use_sse)
+    finally:
+        await slot.aclose()
+
+# OCR job endpoints: submit returns immediately, then poll for status and fetch the result
+@app.post("/ocr/jobs", status_code=202)
+async def submit_ocr_job(file: UploadFile = File(...), priority: int = Query(0, description="Higher values run first")):
+    """Queue an uploaded image or PDF for background OCR and return its job id"""
+    content = await read_ocr_upload(file)
+    if ocr_jobs is None:
         raise HTTPException(
-            status_code=500,
-            detail=f"Failed to save image file: {str(e)}"
+            status_code=503,
+            detail="OCR job queue is not available"
         )
-def optimize_image_for_ocr(image_path: str) -> str:
-    """Optimize image for better OCR results"""
+    
+    # Storing the upload is a blocking SQLite write of up to the upload limit; keep it off the event loop
     try:
-        with Image.open(image_path) as img:
-            # Convert to RGB if necessary
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Enhance image quality for OCR
-            # You can add more image processing here like:
-            # - Increase contrast
-            # - Remove noise
-            # - Adjust brightness
-            # - Resize if too small
-            
-            # Save optimized image
-            optimized_path = image_path.replace('.png', '_optimized.png')
-            img.save(optimized_path, format='PNG', optimize=True)
-            
-            # Remove original and return optimized path
-            os.unlink(image_path)
-            return optimized_path
-            
+        job_id = await asyncio.get_running_loop().run_in_executor(
+            None, ocr_jobs.submit, content, file.content_type, file.filename, priority
+        )
+    except QueueFullError as e:
+        logger.warning(f"Rejecting OCR job for {file.filename}: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="OCR job queue is full, please retry shortly",
+            headers={"Retry-After": "30"}
+        )
+    logger.info(f"Queued OCR job {job_id} for {file.filename} (priority {priority})")
+    return {
+        "job_id": job_id,
+        "status": OCRJobQueue.QUEUED,
+        "status_url": f"/ocr/jobs/{job_id}",
+        "result_url": f"/ocr/jobs/{job_id}/result"
+    }
+
+@app.get("/ocr/jobs/{job_id}")
+async def get_ocr_job(job_id: str):
+    """Return the status and page progress of an OCR job"""
+    return await get_job_status(job_id)
+
+@app.get("/ocr/jobs/{job_id}/result")
+async def get_ocr_job_result(job_id: str):
+    """Return a completed OCR job in the same format as /ocr"""
+    status = await get_job_status(job_id)
+    # Decoding a large result blocks as much as reading it, so both happen in the executor
+    result = await asyncio.get_running_loop().run_in_executor(None, ocr_jobs.result, job_id)
+    if result is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"OCR job is {status['status']}, no result available"
+        )
+    
+    leads_data = [lead_to_response(Lead(**lead)) for page in result["pages"] for lead in page["leads"]]
+    return {
+        "success": True,
+        "job_id": job_id,
+        "filename": status["filename"],
+        "file_type": "PDF" if status["content_type"] == 'application/pdf' else "Image",
+        "pages_processed": len(result["pages"]),
+        "leads_count": len(leads_data),
+        "leads": leads_data,
+        "processing_time": status["finished_at"] - status["started_at"],
+        "page_timings": [page["processing_time"] for page in result["pages"]],
+        "message": f"Successfully extracted {len(leads_data)} lead(s) from {status['filename']}"
+    }
+
+@app.delete("/ocr/jobs/{job_id}")
+async def cancel_ocr_job(job_id: str):
+    """Cancel a queued or running OCR job"""
+    await get_job_status(job_id)
+    if not await ocr_jobs.cancel(job_id):
+        raise HTTPException(
+            status_code=409,
+            detail="OCR job has already finished"
+        )
+    return await get_job_status(job_id)
+
+async def get_job_status(job_id: str) -> dict:
+    """Look up an OCR job, translating unknown ids into 404s"""
+    if ocr_jobs is None:
+        raise HTTPException(
+            status_code=503,
+            detail="OCR job queue is not available"
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, ocr_jobs.status, job_id)
+    except JobNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"OCR job not found: {job_id}"
+        )
+
+async def read_ocr_upload(file: UploadFile) -> bytes:
+    """Check that OCR is available and the upload is an acceptable image or PDF, returning its content"""
+    # Check if OCR processor is available
+    if ocr_processor is None or ocr_engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail="OCR service is not available. Please check OPENROUTER_API_KEY configuration."
+        )
+    
+    # Read file content
+    content = await file.read()
+    
+    # Validate file size (max 10MB)
+    if len(content) > 10 * 1024 * 1024:  # 10MB limit
+        raise HTTPException(
+            status_code=400,
+            detail="File size must be less than 10MB"
+        )
+    
+    # Check file type before taking a slot in the OCR queue
+    if file.content_type != 'application/pdf' and not file.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=400,
+            detail="File must be an image (JPG, PNG, GIF, BMP) or PDF"
+        )
+    
+    return content
+
+async def run_ocr_job(file: UploadFile, content: bytes, start_time: float) -> dict:
+    """Run one admitted OCR upload through the execution engine and build the response"""
+    # Split the upload into in-memory pages; nothing is written to disk
+    sources = await load_page_sources(content, file.content_type)
+    
+    # Optimize and process all pages concurrently; results come back in page order
+    logger.info(f"Processing OCR for {len(sources)} page(s)")
+    with api_scope():  # this upload's API calls take turns fairly with other uploads
+        page_results = await ocr_engine.process_pages(sources)
+    all_leads = [lead for page in page_results for lead in page.leads]
+    
+    # Process leads and add confidence scores
+    leads_data = [lead_to_response(lead) for lead in all_leads]
+    
+    processing_time = time.time() - start_time
+    
+    logger.info(f"Successfully processed OCR, found {len(leads_data)} leads in {processing_time:.2f}s")
+    
+    # Return standardized response format
+    return {
+        "success": True,
+        "filename": file.filename,
+        "file_type": "PDF" if file.content_type == 'application/pdf' else "Image",
+        "pages_processed": len(sources),
+        "leads_count": len(leads_data),
+        "leads": leads_data,
+        "processing_time": processing_time,
+        "page_timings": [page.processing_time for page in page_results],
+        "message": f"Successfully extracted {len(leads_data)} lead(s) from {file.filename}"
+    }
+
+async def load_page_sources(content: bytes, content_type: str) -> list:
+    """Split uploaded image or PDF content into in-memory page sources"""
+    kind = "pdf" if content_type == 'application/pdf' else "image"
+    try:
+        sources = await ocr_engine.load_pages(content, kind)
+        text_pages = sum(1 for source in sources if source.text is not None)
+        logger.info(f"Loaded {kind} upload with {len(sources)} page(s), {text_pages} with a usable text layer")
+        return sources
+        
     except Exception as e:
-        logger.warning(f"Failed to optimize image {image_path}: {e}")
-        return image_path 
+        logger.error(f"Error reading {kind} upload: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to read uploaded {kind}: {str(e)}"
+        )
+
+def lead_to_response(lead) -> dict:
+    """Serialize a lead for API responses, adding its confidence score"""
+    return {
+        'name': lead.name,
+        'company': lead.company,
+        'title': lead.title,
+        'email': lead.email,
+        'phone': lead.phone,
+        'address': lead.address,
+        'industry': lead.industry,
+        'website': lead.website,
+        'social_media': lead.social_media,
+        'additional_info': lead.additional_info,
+        # Calculate confidence based on available fields
+        'confidence': calculate_lead_confidence(lead)
+    }
+
 def calculate_lead_confidence(lead):
     """Calculate confidence score based on available lead information"""
     score = 0
@@ -348,29 +885,27 @@ def calculate_lead_confidence(lead):
 # Error handler for 404s
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    """Custom 404 handler"""
+    """Custom 404 handler for unknown routes; 404s raised by endpoints keep their own detail"""
+    detail = getattr(exc, "detail", None)
+    if detail and detail != "Not Found":
+        # e.g. an unknown job or session id: the route exists, so say what was not found
+        return JSONResponse(status_code=404, content={"detail": detail}, headers=getattr(exc, "headers", None))
     return JSONResponse(
         status_code=404,
         content={
             "detail": f"Endpoint not found: {request.url.path}",
-            "available_endpoints": ["/", "/health", "/llm", "/ocr", "/docs"]
+            "available_endpoints": ["/", "/health", "/ready", "/llm", "/llm/batch", "/llm/sessions/{session_id}", "/ocr", "/ocr/stream", "/ocr/jobs", "/ocr/bulk", "/docs"]
         }
     )
 
 # Include email sender router
-try:
-    app.include_router(email_sender.router)
-    logger.info("Email sender router included successfully")
-except Exception as e:
-    logger.error(f"Failed to include email sender router: {e}")
-
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    """Startup event handler"""
-    logger.info("Mini-CRM Backend starting up...")
-    logger.info("Health check available at: /health")
-    logger.info("API documentation available at: /docs")
+if "email" in enabled_subsystems:
+    try:
+        from routers import email_sender
+        app.include_router(email_sender.router)
+        logger.info("Email sender router included successfully")
+    except Exception as e:
+        logger.error(f"Failed to include email sender router: {e}")
 
 if __name__ == "__main__":
     import uvicorn
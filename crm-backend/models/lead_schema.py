@@ -18,5 +18,15 @@ class Lead(BaseModel):
     
 class QueryRequest(BaseModel):
     query: str
-    lead: Lead
+    # Optional once a session already holds the lead
+    lead: Optional[Lead] = None
+    # Legacy clients send the whole conversation; session clients send only the new query
     conversationHistory: Optional[List[str]] = []
+    sessionId: Optional[str] = None
+
+class TriageItem(BaseModel):
+    query: str
+    lead: Lead
+
+class BatchQueryRequest(BaseModel):
+    items: List[TriageItem]
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from routers.circuit_breaker import CircuitOpenError
+from routers.ocr import Lead
+from routers.ocr_stages import EncodedImage, payload_size
+from routers.rate_limiter import RateLimitedError
+
+logger = logging.getLogger(__name__)
+
+_Item = Tuple[EncodedImage, "asyncio.Future[List[Lead]]"]
+
+
+class APIBatcher:
+    """
+    Packs pages waiting for the vision API into multi-image requests.
+
+    Pages are collected for up to linger seconds, or until max_images pages or
+    max_bytes of base64 payload are pending, and then sent as one request whose
+    response attributes leads to each image. A batch that fails (malformed or
+    incomplete attribution, a rejected or oversized request, a timeout) is
+    split in half and each half retried, down to single pages, which use the
+    regular one-image path. Open circuits and rate-limit rejections fail the
+    whole batch at once, since smaller requests would not fare better.
+    """
+
+    def __init__(self, extract_batch: Callable[[List[EncodedImage]], Awaitable[List[List[Lead]]]],
+                 extract_single: Callable[[EncodedImage], Awaitable[List[Lead]]], max_images: int = 4,
+                 max_bytes: int = 4 * 1024 * 1024, linger: float = 0.05):
+        """
+        Initialize the batcher
+
+        Args:
+            extract_batch: Sends several base64 images in one request, returning leads per image
+            extract_single: Extracts the leads of one base64 image
+            max_images: Most pages sent in one request
+            max_bytes: Most base64 payload bytes sent in one request
+            linger: Seconds the first pending page waits for others to join its batch
+        """
+        self.extract_batch = extract_batch
+        self.extract_single = extract_single
+        self.max_images = max_images
+        self.max_bytes = max_bytes
+        self.linger = linger
+
+        self._pending: List[_Item] = []
+        self._pending_bytes = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: Set[asyncio.Task] = set()
+        self._stats = {"pages": 0, "requests": 0, "batches": 0, "splits": 0}
+
+    async def extract(self, base64_image: EncodedImage) -> List[Lead]:
+        """
+        Extract the leads of one page, sharing a request with other pending pages
+
+        Args:
+            base64_image: Base64 encoded page image
+
+        Returns:
+            List of Lead objects for this page only
+        """
+        loop = asyncio.get_running_loop()
+        if self._pending and self._pending_bytes + payload_size(base64_image) > self.max_bytes:
+            self._flush()
+
+        future = loop.create_future()
+        self._pending.append((base64_image, future))
+        self._pending_bytes += payload_size(base64_image)
+        self._stats["pages"] += 1
+
+        if len(self._pending) >= self.max_images or self._pending_bytes >= self.max_bytes:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_bytes = self._pending, [], 0
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: List[_Item]):
+        # Pages whose caller gave up (e.g. a hedged request that lost) are dropped before sending
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+        try:
+            if len(batch) == 1:
+                self._stats["requests"] += 1
+                results = [await self.extract_single(batch[0][0])]
+            else:
+                self._stats["requests"] += 1
+                self._stats["batches"] += 1
+                results = await self.extract_batch([image for image, _ in batch])
+        except (CircuitOpenError, RateLimitedError) as e:
+            self._fail(batch, e)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch, e)
+                return
+            logger.warning(f"Batch of {len(batch)} pages failed: {e}. Splitting and retrying")
+            self._stats["splits"] += 1
+            middle = len(batch) // 2
+            await asyncio.gather(self._send(batch[:middle]), self._send(batch[middle:]))
+            return
+        except BaseException:
+            for _, future in batch:
+                future.cancel()
+            raise
+
+        for (_, future), leads in zip(batch, results):
+            if not future.done():
+                future.set_result(leads)
+
+    @staticmethod
+    def _fail(batch: List[_Item], error: Exception):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batching settings and how many requests the pages needed"""
+        return {
+            "max_images": self.max_images,
+            "max_bytes": self.max_bytes,
+            "linger": self.linger,
+            **self._stats,
+        }
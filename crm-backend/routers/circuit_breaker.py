@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Failure-counting circuit breaker for a remote backend.
+
+    The circuit opens after failure_threshold failures within window seconds.
+    While open, callers should skip the backend entirely. After reset_timeout
+    the circuit becomes half-open and lets exactly one probe request through;
+    the probe's outcome closes the circuit again or re-opens it.
+    Requests abandoned by the caller after hanging for slow_call_threshold
+    seconds (e.g. a hedged call that lost to Tesseract) count as timeouts,
+    so a backend that hangs instead of failing still opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, window: float = 30.0, reset_timeout: float = 30.0,
+                 probe_timeout: Optional[float] = None, slow_call_threshold: Optional[float] = 10.0):
+        """
+        Initialize the breaker
+
+        Args:
+            failure_threshold: Failures within the window that open the circuit
+            window: Sliding window for counting failures, in seconds
+            reset_timeout: Seconds the circuit stays open before probing
+            probe_timeout: Seconds after which an unanswered probe is abandoned (defaults to reset_timeout)
+            slow_call_threshold: Seconds after which an abandoned request counts as a timeout (None never counts)
+        """
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout if probe_timeout is not None else reset_timeout
+        self.slow_call_threshold = slow_call_threshold
+
+        self._lock = threading.Lock()
+        self._failures = deque()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+        self._stats = {"opened": 0, "rejected": 0, "failures": 0, "successes": 0, "slow_abandoned": 0}
+
+    def _current_state(self, now: float) -> str:
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_started_at = None
+        return self._state
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half_open"""
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def is_open(self) -> bool:
+        """True while requests should be routed away from the backend without probing"""
+        return self.state == self.OPEN
+
+    def allow_request(self) -> bool:
+        """
+        Decide whether a request may go to the backend, reserving the probe slot when half-open
+
+        Returns:
+            True if the caller should make the request
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN:
+                probe_expired = (self._probe_started_at is not None
+                                 and now - self._probe_started_at >= self.probe_timeout)
+                if self._probe_started_at is None or probe_expired:
+                    self._probe_started_at = now
+                    return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        """Record a healthy response, closing a half-open circuit"""
+        with self._lock:
+            self._stats["successes"] += 1
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._failures.clear()
+                self._probe_started_at = None
+
+    def record_failure(self):
+        """Record a failed or timed out request, opening the circuit when the threshold is reached"""
+        with self._lock:
+            now = time.monotonic()
+            self._stats["failures"] += 1
+            if self._current_state(now) == self.HALF_OPEN:
+                self._open(now)
+                return
+
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window:
+                self._failures.popleft()
+            if self._state == self.CLOSED and len(self._failures) >= self.failure_threshold:
+                self._open(now)
+
+    def release_probe(self):
+        """Give back the half-open probe slot when a request was abandoned without an outcome"""
+        with self._lock:
+            self._probe_started_at = None
+
+    def record_abandoned(self, elapsed: float):
+        """
+        Record a request the caller gave up on after it had been in flight for elapsed seconds
+
+        Past slow_call_threshold it is a timeout failure; sooner there is no verdict on
+        the backend's health and only the half-open probe slot is given back.
+        """
+        if self.slow_call_threshold is not None and elapsed >= self.slow_call_threshold:
+            with self._lock:
+                self._stats["slow_abandoned"] += 1
+            self.record_failure()
+        else:
+            self.release_probe()
+
+    def _open(self, now: float):
+        self._state = self.OPEN
+        self._opened_at = now
+        self._probe_started_at = None
+        self._failures.clear()
+        self._stats["opened"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the state and counters for health reporting"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            return {
+                **self._stats,
+                "state": state,
+                "recent_failures": len(self._failures),
+                "retry_in": max(0.0, self.reset_timeout - (now - self._opened_at)) if state == self.OPEN else 0.0,
+            }
@@ -1,12 +1,46 @@
 import asyncio
 import random
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence, Tuple
+
+from routers.intent_classifier import IntentClassifier
+from routers.llm_sessions import ConversationSession
+
+# Lookup tables of the templated replies, built once instead of on every call (batches answer tens of thousands)
+STATUS_PIPELINE = {
+    "new": ("contacted", "qualified", "not_interested"),
+    "contacted": ("qualified", "converted", "follow_up"),
+    "qualified": ("converted", "demo_scheduled", "proposal_sent"),
+    "converted": ("negotiation", "closed_won", "closed_lost"),
+    "closed_won": ("onboarding",),
+    "closed_lost": ("reopen", "nurture")
+}
+
+MEETING_TYPES = {
+    "new": "Introductory Call",
+    "contacted": "Qualification Meeting",
+    "qualified": "Solution Demo",
+    "converted": "Proposal Review",
+    "closed_won": "Handoff Meeting"
+}
+
+MEETING_TIMES = ("Monday 11:00 AM", "Tuesday 2:30 PM", "Wednesday 4:00 PM", "Thursday 10:00 AM", "Friday 9:30 AM")
+
+RECOMMENDED_ACTIONS = {
+    "new": "Initiate contact with an introductory email",
+    "contacted": "Qualify their needs through conversation",
+    "qualified": "Send demo or pitch deck",
+    "converted": "Arrange proposal meeting",
+    "closed_won": "Initiate onboarding process"
+}
 
 
 class CustomCRMLLM:
     def __init__(self):
         self.initialized = False
+        self.intent_classifier = IntentClassifier()
+        # Created on first use so it binds to the running event loop
+        self._init_lock: Optional[asyncio.Lock] = None
 
     async def initialize(self):
         print("Bootstrapping Advanced CRM LLM engine...")
@@ -14,18 +48,36 @@ class CustomCRMLLM:
         self.initialized = True
         print("Advanced CRM LLM is live with enhanced reasoning and task inference!")
 
-    async def process_query(self, query: str, lead_data: Dict, history: Optional[List[str]] = None) -> Dict:
+    async def ensure_initialized(self) -> bool:
+        # Concurrent first callers wait for one initialize() instead of each running their own
         if not self.initialized:
-            await self.initialize()
-
-        history = history or []
-        intent = self.classify_intent(query, history)
+            if self._init_lock is None:
+                self._init_lock = asyncio.Lock()
+            async with self._init_lock:
+                if not self.initialized:
+                    await self.initialize()
+        return self.initialized
+
+    async def process_query(self, query: str, lead_data: Dict, history: Optional[List[str]] = None,
+                            session: Optional[ConversationSession] = None) -> Dict:
+        await self.ensure_initialized()
+
+        # A session carries the conversation's intent signals, so its history is never rescanned
+        if session is not None:
+            history = session.history
+            intent = self.classify_intent(query, history, session.intent_signals)
+        else:
+            history = history or []
+            intent = self.classify_intent(query, history)
         response = self.generate_response(intent, query, lead_data, history)
         actions = self.extract_actions(intent, lead_data)
+        if session is not None:
+            self.record_turn(session, query, response)
 
         return {
             "intent": intent["label"],
             "confidence": intent["score"],
+            "intents": intent["intents"],
             "response": response,
             "actions": actions,
             "metadata": {
@@ -35,28 +87,36 @@ class CustomCRMLLM:
             }
         }
 
-    def classify_intent(self, query: str, history: List[str]) -> Dict:
-        q = query.lower()
-        compound_query = q + " ".join(history).lower()
+    def process_batch(self, items: Sequence[Tuple[str, Dict]]) -> List[Dict]:
+        # Standalone triage of many leads: one classifier call for the whole batch, no history or sessions
+        intents = self.classify_intents([query for query, _ in items])
+        results = []
+        for (query, lead_data), intent in zip(items, intents):
+            results.append({
+                "intent": intent["label"],
+                "confidence": intent["score"],
+                "intents": intent["intents"],
+                "response": self.generate_response(intent, query, lead_data, []),
+                "actions": self.extract_actions(intent, lead_data),
+            })
+        return results
+
+    def classify_intent(self, query: str, history: List[str], history_signals: Optional[Dict[str, float]] = None) -> Dict:
+        return self.intent_classifier.classify(query, history, history_signals)
+
+    def classify_intents(self, queries: List[str]) -> List[Dict]:
+        return self.intent_classifier.classify_batch(queries)
 
-        if any(term in compound_query for term in ["follow", "remind", "ping", "email"]):
-            return {"label": "follow_up_request", "score": 0.97}
-        if any(term in compound_query for term in ["detail", "info", "overview", "profile"]):
-            return {"label": "lead_details_request", "score": 0.93}
-        if any(term in compound_query for term in ["status", "update", "progress"]):
-            return {"label": "status_update", "score": 0.89}
-        if any(term in compound_query for term in ["schedule", "meeting", "appointment"]):
-            return {"label": "schedule_meeting", "score": 0.91}
-        if any(term in compound_query for term in ["analytics", "performance", "report", "kpi"]):
-            return {"label": "analytics_request", "score": 0.88}
+    def observe(self, signals: Dict[str, float], message: str):
+        self.intent_classifier.observe(signals, message)
 
-        return {"label": "general_inquiry", "score": 0.75}
+    def record_turn(self, session: ConversationSession, query: str, response: str):
+        # Responses stay in the history for context, but only the user's words are evidence of intent:
+        # the templated replies mention "follow-up", "details" and so on and would steer later turns
+        session.history.extend((query, response))
+        self.observe(session.intent_signals, query)
 
     def generate_response(self, intent: Dict, query: str, lead: Dict, history: List[str]) -> str:
-        # DEBUG: Print the lead data to see what's being received
-        print(f"DEBUG - Lead data received: {lead}")
-        print(f"DEBUG - Lead data keys: {list(lead.keys())}")
-        
         name = lead.get("name", "the lead")
         status = lead.get("status", "Unknown")
         email = lead.get("email", "N/A")
@@ -67,9 +127,6 @@ class CustomCRMLLM:
         title = lead.get("title", "Not Available")
         industry = lead.get("industry", "Not Available")
         website = lead.get("website", "Not Available")
-        
-        # DEBUG: Print the final processed values
-        print(f"DEBUG - Final values: name={name}, status={status}, email={email}, phone={phone}, company={company}, address={address}, source={source}, title={title}, industry={industry}, website={website}")
 
         if intent["label"] == "follow_up_request":
             return f"Compose a follow-up email for {name} at {email} based on their current status ({status}). Ensure empathy and personalized value proposition."
@@ -143,41 +200,13 @@ class CustomCRMLLM:
         return actions
 
     def get_status_suggestions(self, current_status: str) -> List[str]:
-        pipeline = {
-            "new": ["contacted", "qualified", "not_interested"],
-            "contacted": ["qualified", "converted", "follow_up"],
-            "qualified": ["converted", "demo_scheduled", "proposal_sent"],
-            "converted": ["negotiation", "closed_won", "closed_lost"],
-            "closed_won": ["onboarding"],
-            "closed_lost": ["reopen", "nurture"]
-        }
-        return pipeline.get(current_status, ["contacted", "qualified"])
+        return list(STATUS_PIPELINE.get(current_status, ("contacted", "qualified")))
 
     def suggest_meeting_type(self, status: str) -> str:
-        mapping = {
-            "new": "Introductory Call",
-            "contacted": "Qualification Meeting",
-            "qualified": "Solution Demo",
-            "converted": "Proposal Review",
-            "closed_won": "Handoff Meeting"
-        }
-        return mapping.get(status, "Consultation")
+        return MEETING_TYPES.get(status, "Consultation")
 
     def suggest_optimal_time(self) -> str:
-        return random.choice([
-            "Monday 11:00 AM",
-            "Tuesday 2:30 PM",
-            "Wednesday 4:00 PM",
-            "Thursday 10:00 AM",
-            "Friday 9:30 AM"
-        ])
+        return random.choice(MEETING_TIMES)
 
     def get_recommended_action(self, status: str) -> str:
-        strategy = {
-            "new": "Initiate contact with an introductory email",
-            "contacted": "Qualify their needs through conversation",
-            "qualified": "Send demo or pitch deck",
-            "converted": "Arrange proposal meeting",
-            "closed_won": "Initiate onboarding process"
-        }
-        return strategy.get(status, "Evaluate lead status and plan follow-up")
\ No newline at end of file
+        return RECOMMENDED_ACTIONS.get(status, "Evaluate lead status and plan follow-up")
\ No newline at end of file
@@ -0,0 +1,212 @@
+import re
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+# Intents in priority order, with the confidence reported for a clear match and their vocabulary.
+# Terms match at the start of a word and may carry a suffix ("detail" matches "details", not "retail").
+INTENT_RULES: List[Tuple[str, float, List[str]]] = [
+    ("follow_up_request", 0.97, ["follow", "remind", "ping", "email"]),
+    ("lead_details_request", 0.93, ["detail", "info", "overview", "profile"]),
+    ("status_update", 0.89, ["status", "update", "progress"]),
+    ("schedule_meeting", 0.91, ["schedule", "meeting", "appointment"]),
+    ("analytics_request", 0.88, ["analytics", "performance", "report", "kpi"]),
+]
+
+GENERAL_INTENT = {"label": "general_inquiry", "score": 0.75}
+
+# Distinct term combinations whose standalone results are memoized
+STANDALONE_CACHE_SIZE = 4096
+
+# Conversation histories whose signals are memoized for stateless requests
+HISTORY_CACHE_SIZE = 1024
+
+
+def trie_pattern(terms: Iterable[str]) -> str:
+    """
+    Compile literal terms into a regex shaped like a trie
+
+    Shared prefixes are factored out, so the engine rejects a position after
+    looking at one character instead of trying every term in turn.
+    """
+    trie: Dict[str, Dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict[str, Dict]) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return render(trie)
+
+
+class IntentClassifier:
+    """
+    Scores CRM intents for a query and its conversation in one regex pass.
+
+    All vocabularies are compiled into a single trie-shaped regex, so a text
+    is scanned once however many intents and terms there are. Intents the
+    query itself mentions always outrank intents only found in the history,
+    which only decides follow-ups like "and what about next week?". Within
+    each group the label is the first intent in rule order, as with the
+    original chain of checks; every matching intent is reported with its
+    score in "intents".
+    History evidence for an intent is history_weight times a recency-weighted
+    count of its hits in earlier messages, each message counting decay times
+    less than the one after it; intents only found in the history score in
+    proportion to it. Standalone results are memoized by the terms found, and
+    the signals of a resent history extend those of its cached prefix.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, float, List[str]]] = INTENT_RULES, decay: float = 0.8,
+                 history_weight: float = 0.5, min_evidence: float = 0.2):
+        """
+        Initialize the classifier
+
+        Args:
+            rules: (label, confidence, terms) in priority order
+            decay: Weight of a history message relative to the message after it
+            history_weight: Weight of the most recent history message relative to the query
+            min_evidence: History evidence below this is ignored, so stale context fades out
+        """
+        self.rules = list(rules)
+        self.decay = decay
+        self.history_weight = history_weight
+        self.min_evidence = min_evidence
+        self._ordered = [(label, confidence) for label, confidence, _ in self.rules]
+        # Entries for intents at full confidence are shared by every result that lists them
+        self._history_rules = [(label, confidence, {"label": label, "score": confidence})
+                               for label, confidence in self._ordered]
+        self._term_labels = {term.lower(): label for label, _, terms in self.rules for term in terms}
+        self._standalone_results: Dict[FrozenSet[str], Dict] = {}
+        self._history_results: "OrderedDict[Tuple[str, ...], Tuple[Dict[str, float], Tuple[Dict, ...]]]" = OrderedDict()
+
+        # The lookahead lets the engine skip positions whose letter starts no term before trying the trie
+        first_chars = "".join(re.escape(char) for char in sorted({term[0] for term in self._term_labels}))
+        self._pattern = re.compile(rf"(?<!\w)(?=[{first_chars}]){trie_pattern(self._term_labels)}")
+        self._findall = self._pattern.findall
+
+    def signals(self, text: str) -> Dict[str, float]:
+        """Count the hits of each intent in one message"""
+        hits: Dict[str, float] = {}
+        for term in self._findall(text.lower()):
+            label = self._term_labels[term]
+            hits[label] = hits.get(label, 0.0) + 1.0
+        return hits
+
+    def observe(self, history_signals: Dict[str, float], message: str):
+        """
+        Fold the next conversation message into recency-weighted history signals, in place
+
+        The result equals history_signals() over the whole history, so a
+        session can carry the signals between turns instead of its messages.
+        """
+        for label in history_signals:
+            history_signals[label] *= self.decay
+        for label, hits in self.signals(message).items():
+            history_signals[label] = history_signals.get(label, 0.0) + hits
+
+    def history_signals(self, history: Sequence[str]) -> Dict[str, float]:
+        """Recency-weighted signals for a whole history, oldest message first"""
+        return dict(self._cached_history(tuple(history))[0])
+
+    def _cached_history(self, history: Tuple[str, ...]) -> Tuple[Dict[str, float], Tuple[Dict, ...]]:
+        # Stateless clients resend the conversation one turn (query and reply) longer each time,
+        # so only the messages added since a cached prefix are scanned
+        cache = self._history_results
+        entry = cache.get(history)
+        if entry is not None:
+            cache.move_to_end(history)
+            return entry
+
+        signals, known = {}, 0
+        for added in (1, 2):
+            prefix = cache.get(history[:-added])
+            if prefix is not None:
+                signals, known = dict(prefix[0]), len(history) - added
+                break
+        for message in history[known:]:
+            self.observe(signals, message)
+
+        entry = cache[history] = (signals, self._history_intents(signals))
+        if len(cache) > HISTORY_CACHE_SIZE:
+            cache.popitem(last=False)
+        return entry
+
+    def classify(self, query: str, history: Sequence[str] = (),
+                 history_signals: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Classify a query in the context of its conversation
+
+        Args:
+            query: New message
+            history: Earlier messages, oldest first (ignored when history_signals is given)
+            history_signals: Signals kept up to date with observe() instead of a history
+
+        Returns:
+            {"label", "score", "intents"} where intents is a tuple of every matching
+            intent with its score, query matches first and each group in rule order;
+            label and score are the first entry's
+        """
+        key = frozenset(self._findall(query.lower()))
+        result = self._standalone_results.get(key) or self._remember_standalone(key)
+        if history_signals is not None:
+            history_intents = self._history_intents(history_signals) if history_signals else ()
+        else:
+            history_intents = self._cached_history(tuple(history))[1] if history else ()
+        if not history_intents:
+            return result.copy()
+        if not result["intents"]:
+            intents = history_intents
+        else:
+            # Intents the query mentions keep their place and score; the history adds the others after them
+            mentioned = {intent["label"] for intent in result["intents"]}
+            intents = result["intents"] + tuple(intent for intent in history_intents
+                                                if intent["label"] not in mentioned)
+        return {"label": intents[0]["label"], "score": intents[0]["score"], "intents": intents}
+
+    def classify_batch(self, queries: Sequence[str]) -> List[Dict]:
+        """
+        Classify many standalone queries at once
+
+        Args:
+            queries: Queries without conversation context
+
+        Returns:
+            One classify() result per query, in order
+        """
+        results = self._standalone_results
+        keys = map(frozenset, map(self._findall, map(str.lower, queries)))
+        return [(results.get(key) or self._remember_standalone(key)).copy() for key in keys]
+
+    def _remember_standalone(self, terms: FrozenSet[str]) -> Dict:
+        # A standalone result depends only on which terms were found, which takes few distinct values.
+        # Callers get copies of the stored dict; intents is a tuple and its entries must not be modified
+        if len(self._standalone_results) >= STANDALONE_CACHE_SIZE:
+            self._standalone_results.clear()
+        labels = {self._term_labels[term] for term in terms}
+        # A query match is clear evidence whatever else was said, so it scores the intent's full confidence
+        intents = tuple({"label": label, "score": confidence} for label, confidence in self._ordered if label in labels)
+        if intents:
+            result = {"label": intents[0]["label"], "score": intents[0]["score"], "intents": intents}
+        else:
+            result = {**GENERAL_INTENT, "intents": ()}
+        self._standalone_results[terms] = result
+        return result
+
+    def _history_intents(self, history_signals: Dict[str, float]) -> Tuple[Dict, ...]:
+        """Intents with enough history evidence, in rule order, scored in proportion to the evidence"""
+        intents = []
+        weight, floor = self.history_weight, self.min_evidence
+        for label, confidence, clear in self._history_rules:
+            evidence = weight * history_signals.get(label, 0.0)
+            if evidence >= 1.0:
+                intents.append(clear)
+            elif evidence >= floor:
+                intents.append({"label": label, "score": round(confidence * evidence, 4)})
+        return tuple(intents)
@@ -0,0 +1,60 @@
+import importlib.machinery
+import importlib.util
+import sys
+from types import ModuleType
+from typing import Dict
+
+# Specs of the modules lazy_import made pending, by module name
+_lazy_specs: Dict[str, importlib.machinery.ModuleSpec] = {}
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Import a module whose code only runs on its first attribute access
+
+    Heavy libraries (PyMuPDF, numpy, Pillow, HTTP clients) cost tens to
+    hundreds of milliseconds to import; bound this way at module level they
+    are only paid for by processes that actually use them. Any later
+    "import name" gets the same module.
+
+    Args:
+        name: Absolute module name, e.g. "numpy" or "PIL.Image"
+
+    Returns:
+        The module, loaded or pending
+
+    Raises:
+        ModuleNotFoundError: If the module is not installed (checked now, not on first use)
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    _lazy_specs[name] = spec
+    return module
+
+
+def load_modules(*modules: ModuleType):
+    """Run lazily imported modules now, e.g. during warm-up, so no request pays for them"""
+    for module in modules:
+        vars(module)
+
+
+def is_loaded(name: str) -> bool:
+    """Whether a module has been imported and its code has run"""
+    module = sys.modules.get(name)
+    if module is None:
+        return False
+    spec = _lazy_specs.get(name)
+    if spec is None:
+        return True  # imported normally
+    # LazyLoader keeps the module's original class in the spec's loader_state and restores it once the code has run.
+    # The spec is read from our own map and type() is used because any attribute access would load the module
+    return type(module) is spec.loader_state["__class__"]
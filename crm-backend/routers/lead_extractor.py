@@ -0,0 +1,270 @@
+import re
+from typing import Dict, List, Optional, Pattern, Sequence
+
+
+# Above this many distinct handles a trie walk beats a regex alternation of all of them
+MAX_HANDLE_ALTERNATION = 64
+
+
+def _build_trie(words: Sequence[str]) -> Dict:
+    """Build a character trie mapping each distinct word to its first index in words"""
+    root: Dict = {}
+    for index, word in enumerate(words):
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node.setdefault(None, index)
+    return root
+
+
+def _first_word_in(trie: Dict, runs: List[str]) -> Optional[int]:
+    """Return the lowest trie index of any word occurring as a substring of the given runs"""
+    best = None
+    for run in runs:
+        for start in range(len(run)):
+            node = trie
+            for position in range(start, len(run)):
+                node = node.get(run[position])
+                if node is None:
+                    break
+                index = node.get(None)
+                if index is not None and (best is None or index < best):
+                    best = index
+    return best
+
+
+class _HandleMatcher:
+    """Finds the first handle (in discovery order) that occurs as a substring of a line"""
+
+    def __init__(self, handles: List[str], runs: Pattern):
+        self.first_index: Dict[str, int] = {}
+        for index, handle in enumerate(handles):
+            self.first_index.setdefault(handle, index)
+
+        self.runs = runs
+        self.trie = None
+        self.alternation = None
+        if len(self.first_index) > MAX_HANDLE_ALTERNATION:
+            self.trie = _build_trie(handles)
+        else:
+            # Dicts keep insertion order, so alternatives are tried lowest index first
+            self.alternation = re.compile("(?=(" + "|".join(map(re.escape, self.first_index)) + "))")
+
+    def first_in(self, line: str) -> Optional[int]:
+        if self.trie is not None:
+            return _first_word_in(self.trie, self.runs.findall(line))
+
+        best = None
+        for match in self.alternation.finditer(line):
+            index = self.first_index[match.group(1)]
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return best
+
+
+class LeadExtractor:
+    """
+    Single-pass regex lead extractor used by DocumentImageProcessor.extract_leads_with_regex.
+
+    The text is split into lines once; titles and companies are found with
+    one precompiled alternation each, run over a 5-line sliding window, and
+    names and social handles seen elsewhere in the text are matched with
+    lookup tables instead of a substring scan per candidate. The output is
+    identical to the original line-by-line implementation.
+    """
+
+    def __init__(self, email_pattern: Pattern, phone_pattern: Pattern, website_pattern: Pattern,
+                 linkedin_pattern: Pattern, twitter_pattern: Pattern, name_pattern: Pattern,
+                 title_keywords: Sequence[str], company_indicators: Sequence[str]):
+        """
+        Compile the combined matchers
+
+        Args:
+            email_pattern: Pattern for email addresses
+            phone_pattern: Pattern for phone numbers with three groups (area, prefix, line)
+            website_pattern: Pattern for website URLs
+            linkedin_pattern: Pattern whose first group is a LinkedIn handle
+            twitter_pattern: Pattern whose first group is a Twitter handle
+            name_pattern: Pattern for "First Last" names
+            title_keywords: Job titles in priority order
+            company_indicators: Company suffixes in priority order
+        """
+        self.email_pattern = email_pattern
+        self.phone_pattern = phone_pattern
+        self.website_pattern = website_pattern
+        self.linkedin_pattern = linkedin_pattern
+        self.twitter_pattern = twitter_pattern
+        self.name_pattern = name_pattern
+        self.title_keywords = list(title_keywords)
+        self.company_indicators = list(company_indicators)
+
+        # Lookaheads report every start position, and alternation order picks the
+        # highest-priority keyword at each position, so the minimum index found is
+        # the first keyword in list order that occurs anywhere in the window
+        self.title_matcher = re.compile(
+            "(?=(" + "|".join(re.escape(title.lower()) for title in self.title_keywords) + "))"
+        )
+        self.title_index: Dict[str, int] = {}
+        for index, title in enumerate(self.title_keywords):
+            self.title_index.setdefault(title.lower(), index)
+        self.company_matcher = re.compile(
+            r"(?=\b(\w+\s+)(?:" + "|".join(f"({indicator})" for indicator in self.company_indicators) + r")\b)",
+            re.IGNORECASE
+        )
+
+        # Any "Name Surname" substring starts with a capitalized word followed by whitespace
+        self.name_candidates = re.compile(r"(?=([A-Z][a-z]+\s+)([A-Z][a-z]+))")
+
+        # Handles never contain the spaces used to join context lines, so they can be found per line
+        self.linkedin_runs = re.compile(r"[a-zA-Z0-9-]+")
+        self.twitter_runs = re.compile(r"[a-zA-Z0-9_]+")
+
+    def _first_title(self, lowered_context: str) -> Optional[str]:
+        best = None
+        for match in self.title_matcher.finditer(lowered_context):
+            index = self.title_index[match.group(1)]
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return self.title_keywords[best] if best is not None else None
+
+    def _first_company(self, context: str) -> Optional[str]:
+        best = None
+        best_text = None
+        for match in self.company_matcher.finditer(context):
+            index = match.lastindex - 2
+            if best is None or index < best:
+                best = index
+                best_text = match.group(1) + match.group(match.lastindex)
+                if best == 0:
+                    break
+        return best_text
+
+    def _closest_name(self, context: str, name_index: Dict[str, int], names: List[str]) -> Optional[str]:
+        best = None
+        for match in self.name_candidates.finditer(context):
+            prefix, surname = match.group(1), match.group(2)
+            for end in range(2, len(surname) + 1):
+                index = name_index.get(prefix + surname[:end])
+                if index is not None and (best is None or index < best):
+                    best = index
+        return names[best] if best is not None else None
+
+    def extract(self, text: str) -> List[Dict]:
+        """
+        Extract lead fields from text
+
+        Args:
+            text: The text to extract leads from
+
+        Returns:
+            List of dicts with Lead field values, in the order leads were found
+        """
+        leads = []
+
+        # Extract all matches
+        emails = self.email_pattern.findall(text)
+        phones = self.phone_pattern.findall(text)
+        names = self.name_pattern.findall(text)
+
+        # Extract social media
+        linkedin_handles = self.linkedin_pattern.findall(text)
+        twitter_handles = self.twitter_pattern.findall(text)
+
+        # Tokenize once: stripped and lowercased lines, reused by every window they appear in
+        lines = [line.strip() for line in text.split('\n')]
+        lowered_lines = [line.lower() for line in lines]
+
+        # Lookup tables replacing the per-line "candidate in context" scans
+        name_index: Dict[str, int] = {}
+        for index, name in enumerate(names):
+            name_index.setdefault(name, index)
+        linkedin_matcher = _HandleMatcher(linkedin_handles, self.linkedin_runs) if linkedin_handles else None
+        twitter_matcher = _HandleMatcher(twitter_handles, self.twitter_runs) if twitter_handles else None
+        linkedin_by_line: Dict[int, Optional[int]] = {}
+        twitter_by_line: Dict[int, Optional[int]] = {}
+
+        def first_handle(matcher: _HandleMatcher, cache: Dict[int, Optional[int]],
+                         start: int, end: int) -> Optional[int]:
+            best = None
+            for j in range(start, end):
+                if j not in cache:
+                    cache[j] = matcher.first_in(lines[j]) if lines[j] else None
+                if cache[j] is not None and (best is None or cache[j] < best):
+                    best = cache[j]
+            return best
+
+        # Try to associate information together
+        for i, line in enumerate(lines):
+            if not line:
+                continue
+
+            # Check if this line contains contact information
+            line_emails = self.email_pattern.findall(line)
+            line_phones = self.phone_pattern.findall(line)
+            line_names = self.name_pattern.findall(line)
+
+            if not (line_emails or line_phones or line_names):
+                continue
+
+            lead = {}
+
+            # Sliding 5-line context window around the current line
+            start, end = max(0, i - 2), min(len(lines), i + 3)
+            context_text = ' '.join(lines[start:end])
+
+            if line_emails:
+                lead['email'] = line_emails[0]
+
+            if line_phones:
+                lead['phone'] = f"({line_phones[0][0]}) {line_phones[0][1]}-{line_phones[0][2]}"
+
+            if line_names:
+                lead['name'] = line_names[0]
+            elif names:
+                lead['name'] = self._closest_name(context_text, name_index, names)
+
+            lead['title'] = self._first_title(' '.join(lowered_lines[start:end]))
+            lead['company'] = self._first_company(context_text)
+
+            website_match = self.website_pattern.search(context_text)
+            if website_match:
+                lead['website'] = website_match.group()
+
+            social_media = {}
+            if linkedin_matcher is not None:
+                index = first_handle(linkedin_matcher, linkedin_by_line, start, end)
+                if index is not None:
+                    social_media['linkedin'] = linkedin_handles[index]
+            if twitter_matcher is not None:
+                index = first_handle(twitter_matcher, twitter_by_line, start, end)
+                if index is not None:
+                    social_media['twitter'] = twitter_handles[index]
+            if social_media:
+                lead['social_media'] = social_media
+
+            lead['additional_info'] = context_text[:200] + "..." if len(context_text) > 200 else context_text
+
+            # Only add if we have meaningful information
+            if lead.get('email') or lead.get('phone') or lead.get('name'):
+                leads.append(lead)
+
+        # If no structured leads found, create basic leads from extracted data
+        if not leads:
+            max_items = max(len(emails), len(phones), len(names))
+            for i in range(max_items):
+                lead = {}
+                if i < len(emails):
+                    lead['email'] = emails[i]
+                if i < len(phones):
+                    lead['phone'] = f"({phones[i][0]}) {phones[i][1]}-{phones[i][2]}"
+                if i < len(names):
+                    lead['name'] = names[i]
+
+                if lead.get('email') or lead.get('phone') or lead.get('name'):
+                    leads.append(lead)
+
+        return leads
@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConversationSession:
+    """One /llm conversation: the lead it is about, recent messages and derived intent state"""
+    session_id: str
+    lead: Optional[Dict[str, Any]] = None
+    history: List[str] = field(default_factory=list)
+    # Recency-weighted intent signals of every user message so far, by intent label (see IntentClassifier.observe)
+    intent_signals: Dict[str, float] = field(default_factory=dict)
+    updated_at: float = 0.0
+    # updated_at of the SQLite row this copy was read from or written to, None if it was never stored
+    stored_at: Optional[float] = field(default=None, repr=False)
+
+
+class ConversationSessionStore:
+    """
+    Server-side state for /llm conversations, keyed by session id.
+
+    Sessions live in a bounded in-memory LRU tier and, when db_path is given,
+    in a SQLite tier that survives restarts and is shared by workers on the
+    same host. With a SQLite tier the row stays authoritative: a memory hit
+    is checked against the row's updated_at, so a turn saved (or a session
+    ended) by another worker is never overwritten by a stale in-memory copy.
+    Sessions idle for longer than ttl seconds are dropped. Only
+    the last max_history messages are kept; the intent signals summarize the
+    whole conversation, so trimming history never changes classification and
+    the per-turn cost stays flat however long a conversation gets.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 3600, max_history: int = 50,
+                 db_path: Optional[str] = None):
+        """
+        Initialize the store
+
+        Args:
+            max_sessions: Size of the in-memory LRU tier
+            ttl: Seconds of inactivity after which a session expires
+            max_history: Messages kept per session
+            db_path: Optional SQLite file for the persistent tier
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_history = max_history
+        self.db_path = db_path
+
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "created": 0, "expired": 0, "evictions": 0,
+                       "stale_reloads": 0}
+        self._writes = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_sessions ("
+                "session_id TEXT PRIMARY KEY, lead TEXT, history TEXT NOT NULL, "
+                "intent_signals TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "ConversationSessionStore":
+        """Build a store from LLM_SESSION_MAX, LLM_SESSION_TTL, LLM_SESSION_HISTORY and LLM_SESSION_PATH"""
+        return cls(
+            max_sessions=int(os.getenv("LLM_SESSION_MAX", "1000")),
+            ttl=float(os.getenv("LLM_SESSION_TTL", "3600")),
+            max_history=int(os.getenv("LLM_SESSION_HISTORY", "50")),
+            db_path=os.getenv("LLM_SESSION_PATH") or None,
+        )
+
+    def _expired(self, session: ConversationSession, now: float) -> bool:
+        return now - session.updated_at > self.ttl
+
+    def _load(self, session_id: str) -> Optional[ConversationSession]:
+        row = self._db.execute(
+            "SELECT lead, history, intent_signals, updated_at FROM llm_sessions WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return ConversationSession(session_id, json.loads(row[0]) if row[0] else None,
+                                   json.loads(row[1]), json.loads(row[2]), row[3], stored_at=row[3])
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        """
+        Look up a live session, promoting disk hits into memory
+
+        Blocks on SQLite when the store has a persistent tier, so async callers should run it in an executor.
+
+        Args:
+            session_id: Conversation id chosen by the client
+
+        Returns:
+            The session, or None if it is unknown or expired
+        """
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            source = "memory_hits"
+            if self._db is not None and (session is None or session.stored_at is not None):
+                stored = self._load(session_id)
+                if session is None:
+                    session, source = stored, "disk_hits"
+                elif stored is None or stored.updated_at != session.stored_at:
+                    # Another worker saved a newer turn or ended the session since this copy was stored
+                    del self._sessions[session_id]
+                    self._stats["stale_reloads"] += 1
+                    session, source = stored, "disk_hits"
+
+            if session is not None:
+                if not self._expired(session, now):
+                    self._remember(session)
+                    self._stats[source] += 1
+                    return session
+                self._sessions.pop(session_id, None)
+                self._stats["expired"] += 1
+
+            self._stats["misses"] += 1
+            return None
+
+    def get_or_create(self, session_id: str) -> ConversationSession:
+        """Return the live session with this id, starting a new one if there is none"""
+        session = self.get(session_id)
+        if session is None:
+            session = ConversationSession(session_id, updated_at=time.time())
+            with self._lock:
+                self._remember(session)
+                self._stats["created"] += 1
+        return session
+
+    def save(self, session: ConversationSession):
+        """
+        Record a session after a turn, trimming its history and refreshing its TTL
+
+        Blocks on SQLite when the store has a persistent tier, so async callers should run it in an executor.
+
+        Args:
+            session: Session updated by the caller
+        """
+        if len(session.history) > self.max_history:
+            del session.history[:-self.max_history]
+        session.updated_at = time.time()
+        with self._lock:
+            self._remember(session)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_sessions (session_id, lead, history, intent_signals, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (session.session_id, json.dumps(session.lead, ensure_ascii=False) if session.lead else None,
+                     json.dumps(session.history, ensure_ascii=False), json.dumps(session.intent_signals),
+                     session.updated_at)
+                )
+                session.stored_at = session.updated_at
+                self._writes += 1
+                # Sweep expired rows now and then instead of on every turn
+                if self._writes % 100 == 0:
+                    self._db.execute("DELETE FROM llm_sessions WHERE updated_at < ?", (session.updated_at - self.ttl,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to persist LLM session {session.session_id}: {e}")
+
+    def delete(self, session_id: str) -> bool:
+        """
+        End a conversation
+
+        Blocks on SQLite when the store has a persistent tier, so async callers should run it in an executor.
+
+        Returns:
+            True if a live session was removed
+        """
+        existed = self.get(session_id) is not None
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM llm_sessions WHERE session_id = ?", (session_id,))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to delete LLM session {session_id}: {e}")
+        return existed
+
+    def _remember(self, session: ConversationSession):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return lookup counters and tier sizes for sizing the store"""
+        with self._lock:
+            return {
+                **self._stats,
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl": self.ttl,
+                "max_history": self.max_history,
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        """Close the SQLite tier"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
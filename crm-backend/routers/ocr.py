@@ -1,16 +1,32 @@
-import requests
+from __future__ import annotations
+
+import asyncio
 import base64
 import json
 import re
 import time
 from typing import Dict, List, Optional, Union
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
 import os
-from PIL import Image
-import io
-import pytesseract
-from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from routers.circuit_breaker import CircuitBreaker, CircuitOpenError
+from routers.lazy_imports import lazy_import
+from routers.lead_extractor import LeadExtractor
+from routers.ocr_stages import API_RENDER_PROFILE, EncodedImage, encode_image
+from routers.rate_limiter import APIRateLimiter, RateLimitedError, estimate_tokens, parse_retry_after
+from routers.tesseract_pool import TesseractPool
+
+# HTTP clients and Pillow load on first use, so importing this module stays cheap
+requests = lazy_import("requests")
+httpx = lazy_import("httpx")
+Image = lazy_import("PIL.Image")
+
+try:
+    lazy_import("h2")  # enables HTTP/2 in httpx when installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 @dataclass
 class Lead:
@@ -26,11 +42,116 @@ class Lead:
     social_media: Optional[Dict[str, str]] = None
     additional_info: Optional[str] = None
 
+# JSON schema for the single-round-trip structured extraction mode
+LEADS_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "leads": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    **{
+                        field_name: {"type": ["string", "null"]}
+                        for field_name in ("name", "company", "title", "email", "phone", "address",
+                                           "industry", "website", "additional_info")
+                    },
+                    "social_media": {
+                        "type": ["object", "null"],
+                        "additionalProperties": {"type": "string"}
+                    }
+                },
+                "required": ["name", "company", "title", "email", "phone", "address",
+                             "industry", "website", "social_media", "additional_info"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["leads"],
+    "additionalProperties": False
+}
+
+# Several images per request: one entry of leads per numbered image
+BATCH_LEADS_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "images": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "image": {"type": "integer"},
+                    "leads": LEADS_JSON_SCHEMA["properties"]["leads"]
+                },
+                "required": ["image", "leads"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["images"],
+    "additionalProperties": False
+}
+
+# Images are JSON-encoded as "\u0000image:<index>" placeholders and spliced in by encode_request_body
+_IMAGE_PLACEHOLDER = re.compile(r'"\\u0000image:(\d+)"')
+
+def encode_request_body(data: Dict) -> bytes:
+    """
+    Serialize a chat completion request to UTF-8 JSON bytes
+    
+    EncodedImage values (used as image URLs) are written straight from their
+    base64 bytes into the final body, so a multi-MB page is not copied through
+    str, data: URL and JSON string forms on the way.
+    
+    Args:
+        data: Request body, possibly containing EncodedImage values
+        
+    Returns:
+        The request body
+    """
+    images: List[EncodedImage] = []
+    
+    def placeholder(value):
+        if isinstance(value, EncodedImage):
+            images.append(value)
+            return f"\0image:{len(images) - 1}"
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    
+    text = json.dumps(data, default=placeholder)
+    if not images:
+        return text.encode("utf-8")
+    
+    parts = []
+    position = 0
+    for match in _IMAGE_PLACEHOLDER.finditer(text):
+        image = images[int(match.group(1))]
+        parts.append(text[position:match.start()].encode("utf-8"))
+        parts.append(f'"data:{image.mime_type};base64,'.encode("ascii"))
+        parts.append(image.base64_data)
+        parts.append(b'"')
+        position = match.end()
+    parts.append(text[position:].encode("utf-8"))
+    # One allocation for the whole body
+    return b"".join(parts)
+
+class StructuredOutputError(Exception):
+    """Raised when the structured extraction mode gets a rejected request or malformed JSON"""
+
+class APIStatusError(Exception):
+    """Raised when OpenRouter answers with an HTTP error status"""
+    
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"API returned HTTP {status_code}: {body[:200]}")
+        self.status_code = status_code
+
 class DocumentImageProcessor:
     """Main class for processing documents and images to extract leads"""
     
     def __init__(self, openrouter_api_key: str, model_name: str = "mistralai/mistral-small-3.2-24b-instruct:free", 
-                 api_timeout: int = 30, max_documents_for_api: int = 5):
+                 api_timeout: int = 30, max_documents_for_api: int = 5, connect_timeout: float = 5.0,
+                 max_connections: int = 20, max_keepalive_connections: int = 10,
+                 extraction_mode: str = "structured", circuit_breaker: Optional[CircuitBreaker] = None,
+                 tesseract_pool: Optional[TesseractPool] = None, rate_limiter: Optional[APIRateLimiter] = None):
         """
         Initialize the processor with OpenRouter API key
         
@@ -39,23 +160,78 @@ class DocumentImageProcessor:
             model_name: The image-to-text model to use
             api_timeout: Timeout for API calls in seconds
             max_documents_for_api: Maximum number of documents to process via API before switching to OCR
+            connect_timeout: Timeout for establishing a connection in seconds
+            max_connections: Maximum concurrent connections in the async client pool
+            max_keepalive_connections: Idle connections kept open for reuse
+            extraction_mode: "structured" for one schema-constrained call per image (falling back
+                to two calls on malformed output) or "two_step" for text extraction then lead generation
+            circuit_breaker: Breaker guarding the OpenRouter API (a default one is created if omitted)
+            tesseract_pool: Long-lived Tesseract engines for OCR (built from OCR_TESSERACT_* if omitted)
+            rate_limiter: Scheduler every OpenRouter call goes through (built from OPENROUTER_* if omitted)
         """
         self.api_key = openrouter_api_key
         self.model_name = model_name
         self.base_url = "https://openrouter.ai/api/v1/chat/completions"
         self.api_timeout = api_timeout
         self.max_documents_for_api = max_documents_for_api
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.extraction_mode = extraction_mode
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.tesseract_pool = tesseract_pool or TesseractPool.from_env()
+        self.rate_limiter = rate_limiter or APIRateLimiter.from_env()
         
         # Validate API key
         if not self.api_key or self.api_key == "OPENROUTER_API_KEY":
             raise ValueError("Please provide a valid OpenRouter API key")
         
+        # Headers are built once and shared by every request
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://your-app.com",
+            "X-Title": "Lead Extraction App"
+        }
+        
+        # Keep-alive session for synchronous callers and the async client are both created on first use
+        self._session: Optional[requests.Session] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        
         # Setup regex patterns for lead extraction
         self._setup_regex_patterns()
         
         print(f"Initialized with model: {self.model_name}")
         print(f"API timeout: {self.api_timeout} seconds")
         print(f"Max documents for API: {self.max_documents_for_api}")
+        print(f"HTTP/2 enabled: {HTTP2_AVAILABLE}")
+        print(f"Extraction mode: {self.extraction_mode}")
+        print(f"Tesseract backend: {self.tesseract_pool.backend} (pool size {self.tesseract_pool.size})")
+        print(f"API rate limit: {self.rate_limiter.requests_per_minute:g} requests/min, "
+              f"{self.rate_limiter.tokens_per_minute:g} tokens/min")
+    
+    @property
+    def session(self) -> requests.Session:
+        """Shared keep-alive HTTP session for synchronous callers"""
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+        return self._session
+    
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Shared pooled async HTTP client (HTTP/2 when the h2 package is installed)"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                headers=self.headers,
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(self.api_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections
+                )
+            )
+        return self._async_client
     
     def _setup_regex_patterns(self):
         """Setup regex patterns for extracting lead information"""
@@ -88,20 +264,30 @@ class DocumentImageProcessor:
             'Inc', 'LLC', 'Corp', 'Corporation', 'Company', 'Ltd', 'Limited',
             'Technologies', 'Solutions', 'Services', 'Group', 'Associates'
         ]
+        
+        # Compiled single-pass engine built from the patterns above
+        self.lead_extractor = LeadExtractor(
+            self.email_pattern, self.phone_pattern, self.website_pattern,
+            self.linkedin_pattern, self.twitter_pattern, self.name_pattern,
+            self.title_keywords, self.company_indicators
+        )
     
-    def extract_text_with_tesseract(self, image_path: str) -> str:
+    def extract_text_with_tesseract(self, image: Union[str, Image.Image]) -> str:
         """
         Extract text from image using Tesseract OCR
         
         Args:
-            image_path: Path to the image file
+            image: Path to the image file or an in-memory PIL image
             
         Returns:
             Extracted text from the image
         """
         try:
-            # Use Tesseract to extract text
-            text = pytesseract.image_to_string(Image.open(image_path))
+            if isinstance(image, str):
+                image = Image.open(image)
+            
+            # Recognize in memory on a pooled engine
+            text = self.tesseract_pool.image_to_string(image)
             return text
         except Exception as e:
             raise Exception(f"Error extracting text with Tesseract: {str(e)}")
@@ -116,117 +302,7 @@ class DocumentImageProcessor:
         Returns:
             List of Lead objects
         """
-        leads = []
-        
-        # Extract all matches
-        emails = self.email_pattern.findall(text)
-        phones = self.phone_pattern.findall(text)
-        websites = self.website_pattern.findall(text)
-        names = self.name_pattern.findall(text)
-        
-        # Extract social media
-        linkedin_handles = self.linkedin_pattern.findall(text)
-        twitter_handles = self.twitter_pattern.findall(text)
-        
-        # Group related information
-        lines = text.split('\n')
-        
-        # Try to associate information together
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Check if this line contains contact information
-            line_emails = self.email_pattern.findall(line)
-            line_phones = self.phone_pattern.findall(line)
-            line_names = self.name_pattern.findall(line)
-            
-            if line_emails or line_phones or line_names:
-                lead = Lead()
-                
-                # Extract information from current line and surrounding lines
-                context_lines = []
-                for j in range(max(0, i-2), min(len(lines), i+3)):
-                    context_lines.append(lines[j].strip())
-                
-                context_text = ' '.join(context_lines)
-                
-                # Extract email
-                if line_emails:
-                    lead.email = line_emails[0]
-                
-                # Extract phone
-                if line_phones:
-                    lead.phone = f"({line_phones[0][0]}) {line_phones[0][1]}-{line_phones[0][2]}"
-                
-                # Extract name
-                if line_names:
-                    lead.name = line_names[0]
-                elif names:
-                    # Find closest name
-                    for name in names:
-                        if name in context_text:
-                            lead.name = name
-                            break
-                
-                # Extract title
-                for title in self.title_keywords:
-                    if title.lower() in context_text.lower():
-                        lead.title = title
-                        break
-                
-                # Extract company
-                for indicator in self.company_indicators:
-                    pattern = rf'\b\w+\s+{indicator}\b'
-                    company_match = re.search(pattern, context_text, re.IGNORECASE)
-                    if company_match:
-                        lead.company = company_match.group()
-                        break
-                
-                # Extract website
-                website_matches = self.website_pattern.findall(context_text)
-                if website_matches:
-                    lead.website = website_matches[0]
-                
-                # Extract social media
-                social_media = {}
-                for handle in linkedin_handles:
-                    if handle in context_text:
-                        social_media['linkedin'] = handle
-                        break
-                
-                for handle in twitter_handles:
-                    if handle in context_text:
-                        social_media['twitter'] = handle
-                        break
-                
-                if social_media:
-                    lead.social_media = social_media
-                
-                # Add additional info
-                lead.additional_info = context_text[:200] + "..." if len(context_text) > 200 else context_text
-                
-                # Only add if we have meaningful information
-                if lead.email or lead.phone or lead.name:
-                    leads.append(lead)
-        
-        # If no structured leads found, create basic leads from extracted data
-        if not leads:
-            max_items = max(len(emails), len(phones), len(names))
-            for i in range(max_items):
-                lead = Lead()
-                if i < len(emails):
-                    lead.email = emails[i]
-                if i < len(phones):
-                    lead.phone = f"({phones[i][0]}) {phones[i][1]}-{phones[i][2]}"
-                if i < len(names):
-                    lead.name = names[i]
-                
-                if lead.email or lead.phone or lead.name:
-                    leads.append(lead)
-        
-        return leads
+        return [Lead(**fields) for fields in self.lead_extractor.extract(text)]
     
     def encode_image(self, image_path: str) -> str:
         """
@@ -244,7 +320,7 @@ class DocumentImageProcessor:
         except Exception as e:
             raise Exception(f"Error encoding image: {str(e)}")
     
-    def compress_image(self, image_path: str, max_size: int = 1024) -> str:
+    def compress_image(self, image_path: str, max_size: int = 1024) -> EncodedImage:
         """
         Compress image if it's too large while maintaining aspect ratio
         
@@ -253,34 +329,28 @@ class DocumentImageProcessor:
             max_size: Maximum dimension size in pixels
             
         Returns:
-            Base64 encoded string of the compressed image
+            Base64 encoded compressed image
         """
         try:
             with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode in ('RGBA', 'LA'):
-                    img = img.convert('RGB')
-                
-                # Calculate new size maintaining aspect ratio
-                width, height = img.size
-                if width > max_size or height > max_size:
-                    if width > height:
-                        new_width = max_size
-                        new_height = int((height * max_size) / width)
-                    else:
-                        new_height = max_size
-                        new_width = int((width * max_size) / height)
-                    
-                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                # Convert to base64
-                buffer = io.BytesIO()
-                img.save(buffer, format='JPEG', quality=85)
-                return base64.b64encode(buffer.getvalue()).decode('utf-8')
+                return self.encode_image_for_api(img, max_size)
                 
         except Exception as e:
             raise Exception(f"Error compressing image: {str(e)}")
     
+    def encode_image_for_api(self, img: Image.Image, max_size: int = 1024) -> EncodedImage:
+        """
+        Downscale an in-memory image and encode it within the API byte budget
+        
+        Args:
+            img: PIL image
+            max_size: Maximum dimension size in pixels
+            
+        Returns:
+            Base64 encoded compressed image (see ocr_stages.encode_image)
+        """
+        return encode_image(img, replace(API_RENDER_PROFILE, max_dimension=max_size))
+    
     def extract_text_from_image(self, image_path: str) -> str:
         """
         Extract text from image using OpenRouter API with timeout handling
@@ -291,12 +361,23 @@ class DocumentImageProcessor:
         Returns:
             Extracted text from the image
         """
+        # Encode and compress image
         try:
-            # Encode and compress image
             base64_image = self.compress_image(image_path)
-            
-            # Prepare the prompt for text extraction
-            prompt = """
+        except Exception as e:
+            raise Exception(f"Error extracting text from image: {str(e)}")
+        
+        return self.extract_text_from_base64(base64_image)
+    
+    @staticmethod
+    def _image_url(image: Union[str, EncodedImage]) -> Union[str, EncodedImage]:
+        """Image URL for a request part; EncodedImage is kept as is for encode_request_body"""
+        return image if isinstance(image, EncodedImage) else f"data:image/jpeg;base64,{image}"
+    
+    def _build_text_extraction_request(self, base64_image: Union[str, EncodedImage]) -> Dict:
+        """Build the chat completion request that asks the vision model to transcribe an image"""
+        # Prepare the prompt for text extraction
+        prompt = """
             Please extract all text content from this image. Focus on:
             - Names of people and organizations
             - Contact information (emails, phone numbers, addresses)
@@ -307,66 +388,31 @@ class DocumentImageProcessor:
             
             Please provide the extracted text in a structured format.
             """
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://your-app.com",
-                "X-Title": "Lead Extraction App"
-            }
-            
-            data = {
-                "model": self.model_name,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
+        
+        return {
+            "model": self.model_name,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": prompt
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": self._image_url(base64_image)
                             }
-                        ]
-                    }
-                ]
-            }
-            
-            response = requests.post(self.base_url, headers=headers, json=data, timeout=self.api_timeout)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            # Check if the response has the expected structure
-            if 'choices' not in result:
-                raise Exception(f"Unexpected API response structure: {result}")
-            
-            if not result['choices']:
-                raise Exception("No choices returned from API")
-            
-            return result['choices'][0]['message']['content']
-            
-        except requests.exceptions.Timeout:
-            raise TimeoutError(f"API request timed out after {self.api_timeout} seconds")
-        except Exception as e:
-            raise Exception(f"Error extracting text from image: {str(e)}")
+                        }
+                    ]
+                }
+            ]
+        }
     
-    def generate_leads_from_text(self, text: str) -> List[Lead]:
-        """
-        Generate lead information from extracted text using OpenRouter API with timeout handling
-        
-        Args:
-            text: The extracted text content
-            
-        Returns:
-            List of Lead objects
-        """
-        try:
-            prompt = f"""
+    def _build_lead_generation_request(self, text: str) -> Dict:
+        """Build the chat completion request that turns extracted text into lead JSON"""
+        prompt = f"""
             Based on the following text, extract and structure lead information. 
             Please identify all potential leads (people/companies) and return them in JSON format.
             
@@ -402,74 +448,459 @@ class DocumentImageProcessor:
                 }}
             ]
             """
+        
+        return {
+            "model": self.model_name,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+    
+    def _completion_content(self, result: Dict) -> str:
+        """Return the message content of a chat completion response"""
+        # Check if the response has the expected structure
+        if 'choices' not in result:
+            raise Exception(f"Unexpected API response structure: {result}")
+        
+        if not result['choices']:
+            raise Exception("No choices returned from API")
+        
+        return result['choices'][0]['message']['content']
+    
+    def _lead_from_dict(self, lead_data: Dict) -> Lead:
+        """Build a Lead from one JSON lead object returned by the model"""
+        return Lead(
+            name=lead_data.get('name'),
+            company=lead_data.get('company'),
+            title=lead_data.get('title'),
+            email=lead_data.get('email'),
+            phone=lead_data.get('phone'),
+            address=lead_data.get('address'),
+            industry=lead_data.get('industry'),
+            website=lead_data.get('website'),
+            social_media=lead_data.get('social_media'),
+            additional_info=lead_data.get('additional_info')
+        )
+    
+    def _parse_leads(self, content: str) -> List[Lead]:
+        """Parse the JSON array of leads out of a lead generation response"""
+        try:
+            # Find JSON content within the response
+            start = content.find('[')
+            end = content.rfind(']') + 1
+            if start != -1 and end != 0:
+                json_str = content[start:end]
+                leads_data = json.loads(json_str)
+            else:
+                leads_data = json.loads(content)
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://your-app.com",
-                "X-Title": "Lead Extraction App"
-            }
+            # Convert to Lead objects
+            return [self._lead_from_dict(lead_data) for lead_data in leads_data]
             
-            data = {
-                "model": self.model_name,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            }
+        except json.JSONDecodeError:
+            print(f"Warning: Could not parse JSON from response: {content}")
+            return []
+    
+    def _build_structured_extraction_request(self, base64_image: Union[str, EncodedImage]) -> Dict:
+        """Build a single request that asks the vision model for schema-conforming lead JSON"""
+        prompt = """
+            Extract every lead (person or company) visible in this image, such as
+            business cards, signatures, brochures or attendee lists.
             
-            response = requests.post(self.base_url, headers=headers, json=data, timeout=self.api_timeout)
-            response.raise_for_status()
+            Respond with a single JSON object of the form {"leads": [...]} that matches
+            the provided schema. Use null for any field that is not present in the image
+            and do not add commentary outside the JSON. If there are no leads, return
+            {"leads": []}.
+            """
+        
+        return {
+            "model": self.model_name,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": prompt
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": self._image_url(base64_image)
+                            }
+                        }
+                    ]
+                }
+            ],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "leads",
+                    "strict": True,
+                    "schema": LEADS_JSON_SCHEMA
+                }
+            }
+        }
+    
+    def _build_batch_extraction_request(self, base64_images: List[Union[str, EncodedImage]]) -> Dict:
+        """Build a single request that asks the vision model for the leads of several numbered images"""
+        prompt = f"""
+            The {len(base64_images)} images below are numbered 1 to {len(base64_images)}, each
+            preceded by its label. Extract every lead (person or company) visible in each
+            image, such as business cards, signatures, brochures or attendee lists.
             
-            result = response.json()
+            Respond with a single JSON object of the form
+            {{"images": [{{"image": 1, "leads": [...]}}, ...]}} that matches the provided schema,
+            with exactly one entry per image. Keep each lead under the image it appears in,
+            use null for any field that is not present and do not add commentary outside the
+            JSON. Use "leads": [] for an image without leads.
+            """
+        
+        content = [{"type": "text", "text": prompt}]
+        for index, base64_image in enumerate(base64_images, 1):
+            content.append({"type": "text", "text": f"Image {index}:"})
+            content.append({"type": "image_url", "image_url": {"url": self._image_url(base64_image)}})
+        
+        return {
+            "model": self.model_name,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": content
+                }
+            ],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "image_leads",
+                    "strict": True,
+                    "schema": BATCH_LEADS_JSON_SCHEMA
+                }
+            }
+        }
+    
+    def _load_structured_json(self, content: str):
+        """Decode a structured response, tolerating a markdown code fence around the JSON"""
+        text = content.strip()
+        
+        # Some models still wrap JSON in a markdown code fence
+        if text.startswith("```"):
+            text = text.strip("`")
+            if text.startswith("json"):
+                text = text[len("json"):]
+        
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            raise StructuredOutputError(f"Structured response is not valid JSON: {e}")
+    
+    def _parse_structured_leads(self, content: str) -> List[Lead]:
+        """
+        Strictly parse a structured extraction response
+        
+        Raises:
+            StructuredOutputError: If the content is not a {"leads": [...]} object
+        """
+        data = self._load_structured_json(content)
+        if not isinstance(data, dict) or not isinstance(data.get("leads"), list):
+            raise StructuredOutputError("Structured response does not contain a 'leads' array")
+        if not all(isinstance(lead_data, dict) for lead_data in data["leads"]):
+            raise StructuredOutputError("Structured response contains non-object leads")
+        
+        return [self._lead_from_dict(lead_data) for lead_data in data["leads"]]
+    
+    def _parse_batch_leads(self, content: str, image_count: int) -> List[List[Lead]]:
+        """
+        Strictly parse a batch extraction response into one lead list per image
+        
+        Raises:
+            StructuredOutputError: If the content is malformed or does not account for every image exactly once
+        """
+        data = self._load_structured_json(content)
+        if not isinstance(data, dict) or not isinstance(data.get("images"), list):
+            raise StructuredOutputError("Batch response does not contain an 'images' array")
+        
+        leads_by_image: Dict[int, List[Lead]] = {}
+        for entry in data["images"]:
+            if not isinstance(entry, dict) or not isinstance(entry.get("leads"), list):
+                raise StructuredOutputError("Batch response contains a malformed image entry")
+            index = entry.get("image")
+            if not isinstance(index, int) or not 1 <= index <= image_count or index in leads_by_image:
+                raise StructuredOutputError(f"Batch response has an invalid or repeated image number: {index}")
+            if not all(isinstance(lead_data, dict) for lead_data in entry["leads"]):
+                raise StructuredOutputError("Batch response contains non-object leads")
+            leads_by_image[index] = [self._lead_from_dict(lead_data) for lead_data in entry["leads"]]
+        
+        # A missing image is indistinguishable from a dropped one, so it fails the batch
+        if len(leads_by_image) != image_count:
+            raise StructuredOutputError(f"Batch response covers {len(leads_by_image)} of {image_count} images")
+        return [leads_by_image[index] for index in range(1, image_count + 1)]
+    
+    def _record_api_status(self, status_code: int):
+        """Feed an HTTP status into the circuit breaker; only rate limits and server errors count as failures"""
+        if status_code == 429 or status_code >= 500:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+    
+    def _rate_limited_retry(self, response_status: int, retry_after: Optional[str], attempt: int) -> bool:
+        """Pause the rate limiter after a 429 and decide whether the call should be retried once"""
+        if response_status != 429:
+            return False
+        pause = self.rate_limiter.penalize(parse_retry_after(retry_after))
+        return attempt == 0 and pause <= self.rate_limiter.max_wait
+    
+    def _settle_usage(self, estimated_tokens: int, result: Dict):
+        """Report a response's real token usage to the rate limiter"""
+        usage = result.get("usage") if isinstance(result, dict) else None
+        self.rate_limiter.settle(estimated_tokens, usage.get("total_tokens") if isinstance(usage, dict) else None)
+    
+    def _post_completion(self, data: Dict) -> Dict:
+        """
+        POST a chat completion request through the circuit breaker and rate limiter
+        
+        A 429 pauses the rate limiter for the Retry-After period; the call is
+        retried once when that pause fits within the queue deadline.
+        
+        Args:
+            data: Request body
             
-            # Check if the response has the expected structure
-            if 'choices' not in result:
-                raise Exception(f"Unexpected API response structure: {result}")
+        Returns:
+            Decoded JSON response
             
-            if not result['choices']:
-                raise Exception("No choices returned from API")
+        Raises:
+            CircuitOpenError: If the OpenRouter circuit is open
+            RateLimitedError: If the call would wait in the rate-limit queue past its deadline
+            TimeoutError: If the request timed out
+            APIStatusError: If the API answered with an error status
+        """
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError("OpenRouter circuit is open, skipping API call")
+        
+        estimated_tokens = estimate_tokens(data)
+        body = encode_request_body(data)
+        for attempt in range(2):
+            try:
+                self.rate_limiter.acquire(estimated_tokens)
+            except BaseException:
+                # Never sent: no verdict on API health
+                self.circuit_breaker.release_probe()
+                raise
             
-            content = result['choices'][0]['message']['content']
+            try:
+                response = self.session.post(self.base_url, data=body, timeout=self.api_timeout)
+            except requests.exceptions.Timeout:
+                self.circuit_breaker.record_failure()
+                raise TimeoutError(f"API request timed out after {self.api_timeout} seconds")
+            except requests.exceptions.RequestException:
+                self.circuit_breaker.record_failure()
+                raise
             
-            # Extract JSON from the response
+            if not self._rate_limited_retry(response.status_code, response.headers.get("Retry-After"), attempt):
+                break
+        
+        self._record_api_status(response.status_code)
+        if response.status_code >= 400:
+            raise APIStatusError(response.status_code, response.text)
+        result = response.json()
+        self._settle_usage(estimated_tokens, result)
+        return result
+    
+    async def _post_completion_async(self, data: Dict) -> Dict:
+        """Async variant of _post_completion using the pooled HTTP client"""
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError("OpenRouter circuit is open, skipping API call")
+        
+        estimated_tokens = estimate_tokens(data)
+        body = encode_request_body(data)
+        for attempt in range(2):
+            sent_at = None
             try:
-                # Find JSON content within the response
-                start = content.find('[')
-                end = content.rfind(']') + 1
-                if start != -1 and end != 0:
-                    json_str = content[start:end]
-                    leads_data = json.loads(json_str)
+                await self.rate_limiter.acquire_async(estimated_tokens)
+                sent_at = time.monotonic()
+                response = await self.async_client.post(self.base_url, content=body)
+            except httpx.TimeoutException:
+                self.circuit_breaker.record_failure()
+                raise TimeoutError(f"API request timed out after {self.api_timeout} seconds")
+            except httpx.HTTPError:
+                self.circuit_breaker.record_failure()
+                raise
+            except asyncio.CancelledError:
+                # A hedged request that lost the race: a timeout if it had been hanging, otherwise no verdict
+                if sent_at is None:
+                    self.circuit_breaker.release_probe()
                 else:
-                    leads_data = json.loads(content)
-                
-                # Convert to Lead objects
-                leads = []
-                for lead_data in leads_data:
-                    lead = Lead(
-                        name=lead_data.get('name'),
-                        company=lead_data.get('company'),
-                        title=lead_data.get('title'),
-                        email=lead_data.get('email'),
-                        phone=lead_data.get('phone'),
-                        address=lead_data.get('address'),
-                        industry=lead_data.get('industry'),
-                        website=lead_data.get('website'),
-                        social_media=lead_data.get('social_media'),
-                        additional_info=lead_data.get('additional_info')
-                    )
-                    leads.append(lead)
-                
-                return leads
+                    self.circuit_breaker.record_abandoned(time.monotonic() - sent_at)
+                raise
+            except BaseException:
+                # Rate limited before sending: no verdict on API health
+                self.circuit_breaker.release_probe()
+                raise
+            
+            if not self._rate_limited_retry(response.status_code, response.headers.get("Retry-After"), attempt):
+                break
+        
+        self._record_api_status(response.status_code)
+        if response.status_code >= 400:
+            raise APIStatusError(response.status_code, response.text)
+        result = response.json()
+        self._settle_usage(estimated_tokens, result)
+        return result
+    
+    def extract_leads_from_base64(self, base64_image: Union[str, EncodedImage]) -> List[Lead]:
+        """
+        Extract leads from a compressed, base64 encoded JPEG in a single API round trip
+        
+        Args:
+            base64_image: Base64 encoded image as returned by compress_image
+            
+        Returns:
+            List of Lead objects
+            
+        Raises:
+            StructuredOutputError: If the model rejected the schema or returned malformed JSON
+        """
+        try:
+            result = self._post_completion(self._build_structured_extraction_request(base64_image))
+            return self._parse_structured_leads(self._completion_content(result))
+            
+        except APIStatusError as e:
+            if e.status_code == 400:
+                raise StructuredOutputError(f"Model rejected structured request: {str(e)}")
+            raise Exception(f"Error extracting leads from image: {str(e)}")
+        except (StructuredOutputError, TimeoutError, CircuitOpenError, RateLimitedError):
+            raise
+        except Exception as e:
+            raise Exception(f"Error extracting leads from image: {str(e)}")
+    
+    async def extract_leads_from_base64_async(self, base64_image: Union[str, EncodedImage]) -> List[Lead]:
+        """
+        Async variant of extract_leads_from_base64 using the pooled HTTP client
+        
+        Args:
+            base64_image: Base64 encoded image as returned by compress_image
+            
+        Returns:
+            List of Lead objects
+            
+        Raises:
+            StructuredOutputError: If the model rejected the schema or returned malformed JSON
+        """
+        try:
+            result = await self._post_completion_async(self._build_structured_extraction_request(base64_image))
+            return self._parse_structured_leads(self._completion_content(result))
+            
+        except APIStatusError as e:
+            if e.status_code == 400:
+                raise StructuredOutputError(f"Model rejected structured request: {str(e)}")
+            raise Exception(f"Error extracting leads from image: {str(e)}")
+        except (StructuredOutputError, TimeoutError, CircuitOpenError, RateLimitedError):
+            raise
+        except Exception as e:
+            raise Exception(f"Error extracting leads from image: {str(e)}")
+    
+    async def extract_leads_from_base64_batch_async(self, base64_images: List[Union[str, EncodedImage]]) -> List[List[Lead]]:
+        """
+        Extract the leads of several images in one structured request
+        
+        Args:
+            base64_images: Base64 encoded images as returned by compress_image
+            
+        Returns:
+            One list of Lead objects per image, in input order
+            
+        Raises:
+            StructuredOutputError: If the model rejected the request or did not attribute leads to every image
+        """
+        try:
+            result = await self._post_completion_async(self._build_batch_extraction_request(base64_images))
+            return self._parse_batch_leads(self._completion_content(result), len(base64_images))
+            
+        except APIStatusError as e:
+            if e.status_code in (400, 413):
+                raise StructuredOutputError(f"Model rejected batch request: {str(e)}")
+            raise Exception(f"Error extracting leads from images: {str(e)}")
+        except (StructuredOutputError, TimeoutError, CircuitOpenError, RateLimitedError):
+            raise
+        except Exception as e:
+            raise Exception(f"Error extracting leads from images: {str(e)}")
+    
+    def extract_text_from_base64(self, base64_image: Union[str, EncodedImage]) -> str:
+        """
+        Extract text from an already compressed, base64 encoded JPEG using OpenRouter API
+        
+        Args:
+            base64_image: Base64 encoded image as returned by compress_image
+            
+        Returns:
+            Extracted text from the image
+        """
+        try:
+            result = self._post_completion(self._build_text_extraction_request(base64_image))
+            return self._completion_content(result)
+            
+        except (TimeoutError, CircuitOpenError, RateLimitedError):
+            raise
+        except Exception as e:
+            raise Exception(f"Error extracting text from image: {str(e)}")
+    
+    async def extract_text_from_base64_async(self, base64_image: Union[str, EncodedImage]) -> str:
+        """
+        Async variant of extract_text_from_base64 using the pooled HTTP client
+        
+        Args:
+            base64_image: Base64 encoded image as returned by compress_image
+            
+        Returns:
+            Extracted text from the image
+        """
+        try:
+            result = await self._post_completion_async(self._build_text_extraction_request(base64_image))
+            return self._completion_content(result)
+            
+        except (TimeoutError, CircuitOpenError, RateLimitedError):
+            raise
+        except Exception as e:
+            raise Exception(f"Error extracting text from image: {str(e)}")
+    
+    def generate_leads_from_text(self, text: str) -> List[Lead]:
+        """
+        Generate lead information from extracted text using OpenRouter API with timeout handling
+        
+        Args:
+            text: The extracted text content
+            
+        Returns:
+            List of Lead objects
+        """
+        try:
+            result = self._post_completion(self._build_lead_generation_request(text))
+            return self._parse_leads(self._completion_content(result))
                 
-            except json.JSONDecodeError:
-                print(f"Warning: Could not parse JSON from response: {content}")
-                return []
+        except (TimeoutError, CircuitOpenError, RateLimitedError):
+            raise
+        except Exception as e:
+            raise Exception(f"Error generating leads from text: {str(e)}")
+    
+    async def generate_leads_from_text_async(self, text: str) -> List[Lead]:
+        """
+        Async variant of generate_leads_from_text using the pooled HTTP client
+        
+        Args:
+            text: The extracted text content
+            
+        Returns:
+            List of Lead objects
+        """
+        try:
+            result = await self._post_completion_async(self._build_lead_generation_request(text))
+            return self._parse_leads(self._completion_content(result))
                 
-        except requests.exceptions.Timeout:
-            raise TimeoutError(f"API request timed out after {self.api_timeout} seconds")
+        except (TimeoutError, CircuitOpenError, RateLimitedError):
+            raise
         except Exception as e:
             raise Exception(f"Error generating leads from text: {str(e)}")
     
@@ -484,10 +915,22 @@ class DocumentImageProcessor:
             List of Lead objects
         """
         print(f"Processing image with API: {image_path}")
+        base64_image = self.compress_image(image_path)
+        
+        # Single round trip: ask for lead JSON directly, keeping two steps as the fallback
+        if self.extraction_mode == "structured":
+            try:
+                print("Extracting leads from image in a single request...")
+                leads = self.extract_leads_from_base64(base64_image)
+                print(f"Generated {len(leads)} leads")
+                return leads
+            except StructuredOutputError as e:
+                print(f"Structured extraction failed: {str(e)}")
+                print("Falling back to two-step extraction...")
         
         # Step 1: Extract text from image
         print("Extracting text from image...")
-        extracted_text = self.extract_text_from_image(image_path)
+        extracted_text = self.extract_text_from_base64(base64_image)
         print(f"Extracted text: {extracted_text[:200]}...")
         
         # Step 2: Generate leads from text
@@ -497,21 +940,21 @@ class DocumentImageProcessor:
         
         return leads
     
-    def process_image_with_ocr(self, image_path: str) -> List[Lead]:
+    def process_image_with_ocr(self, image: Union[str, Image.Image]) -> List[Lead]:
         """
         Process image using Tesseract OCR and regex
         
         Args:
-            image_path: Path to the image file
+            image: Path to the image file or an in-memory PIL image
             
         Returns:
             List of Lead objects
         """
-        print(f"Processing image with OCR: {image_path}")
+        print(f"Processing image with OCR: {image if isinstance(image, str) else 'in-memory image'}")
         
         # Step 1: Extract text using Tesseract
         print("Extracting text with Tesseract...")
-        extracted_text = self.extract_text_with_tesseract(image_path)
+        extracted_text = self.extract_text_with_tesseract(image)
         print(f"Extracted text: {extracted_text[:200]}...")
         
         # Step 2: Extract leads using regex
@@ -535,6 +978,11 @@ class DocumentImageProcessor:
         if use_ocr:
             return self.process_image_with_ocr(image_path)
         
+        # Skip straight to OCR while the API circuit is open
+        if self.circuit_breaker.is_open():
+            print("API circuit is open, processing with OCR...")
+            return self.process_image_with_ocr(image_path)
+        
         # Try API first, fallback to OCR on failure or timeout
         try:
             return self.process_image_with_api(image_path)
@@ -564,27 +1012,17 @@ class DocumentImageProcessor:
         else:
             print(f"Processing {len(image_paths)} documents with API")
         
-        # Process images with parallel execution for OCR
-        if use_ocr:
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                future_to_path = {executor.submit(self.process_image_with_ocr, path): path for path in image_paths}
-                
-                for future in as_completed(future_to_path):
-                    path = future_to_path[future]
-                    try:
-                        leads = future.result()
-                        all_leads.extend(leads)
-                    except Exception as e:
-                        print(f"Error processing {path}: {str(e)}")
-                        continue
-        else:
-            # Process sequentially with API, fallback to OCR on failures
-            for image_path in image_paths:
+        # Process images in parallel on both paths; results are merged back in input order
+        process = self.process_image_with_ocr if use_ocr else self.process_image
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(process, path) for path in image_paths]
+            
+            for path, future in zip(image_paths, futures):
                 try:
-                    leads = self.process_image(image_path, use_ocr=False)
+                    leads = future.result()
                     all_leads.extend(leads)
                 except Exception as e:
-                    print(f"Error processing {image_path}: {str(e)}")
+                    print(f"Error processing {path}: {str(e)}")
                     continue
         
         return all_leads
@@ -642,45 +1080,43 @@ class DocumentImageProcessor:
             print(f"Social Media: {lead.social_media or 'N/A'}")
             print(f"Additional Info: {lead.additional_info or 'N/A'}")
     
+    def _build_connection_test_request(self) -> Dict:
+        """Build the minimal chat completion request used to check API connectivity"""
+        return {
+            "model": self.model_name,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": "Hello, can you respond with 'API connection successful'?"
+                }
+            ]
+        }
+    
+    def _report_connection_test(self, status_code: int, body: str, result: Optional[Dict]) -> bool:
+        """Print and evaluate the outcome of a connection test"""
+        print(f"Status Code: {status_code}")
+        
+        if status_code != 200:
+            print(f"Error Response: {body}")
+            return False
+        
+        if result and 'choices' in result and result['choices']:
+            print("✅ API connection successful!")
+            return True
+        else:
+            print("❌ API connection failed - unexpected response structure")
+            return False
+    
     def test_api_connection(self):
         """
         Test the API connection with a simple text request
         """
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://your-app.com",
-                "X-Title": "Lead Extraction App"
-            }
-            
-            data = {
-                "model": self.model_name,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": "Hello, can you respond with 'API connection successful'?"
-                    }
-                ]
-            }
-            
             print("Testing API connection...")
-            response = requests.post(self.base_url, headers=headers, json=data, timeout=self.api_timeout)
-            
-            print(f"Status Code: {response.status_code}")
-            
-            if response.status_code != 200:
-                print(f"Error Response: {response.text}")
-                return False
-            
-            result = response.json()
-            
-            if 'choices' in result and result['choices']:
-                print("✅ API connection successful!")
-                return True
-            else:
-                print("❌ API connection failed - unexpected response structure")
-                return False
+            response = self.session.post(self.base_url, json=self._build_connection_test_request(),
+                                         timeout=self.api_timeout)
+            result = response.json() if response.status_code == 200 else None
+            return self._report_connection_test(response.status_code, response.text, result)
                 
         except requests.exceptions.Timeout:
             print(f"❌ API connection test timed out after {self.api_timeout} seconds")
@@ -688,6 +1124,55 @@ class DocumentImageProcessor:
         except Exception as e:
             print(f"❌ API connection test failed: {str(e)}")
             return False
+    
+    async def test_api_connection_async(self):
+        """
+        Async variant of test_api_connection that also opens a pooled connection
+        """
+        try:
+            print("Testing API connection...")
+            response = await self.async_client.post(self.base_url, json=self._build_connection_test_request())
+            result = response.json() if response.status_code == 200 else None
+            return self._report_connection_test(response.status_code, response.text, result)
+                
+        except httpx.TimeoutException:
+            print(f"❌ API connection test timed out after {self.api_timeout} seconds")
+            return False
+        except Exception as e:
+            print(f"❌ API connection test failed: {str(e)}")
+            return False
+    
+    async def warm_up_connection_async(self) -> bool:
+        """
+        Build the async client and open a pooled connection to OpenRouter without running a completion
+
+        Sends a bare HEAD to the completions URL, skipping the rate limiter and the
+        circuit breaker; any HTTP status counts as success since only DNS, TCP and
+        TLS set-up matter. The connection stays pooled for httpx's keep-alive expiry.
+
+        Returns:
+            True if the connection was established
+        """
+        try:
+            await self.async_client.head(self.base_url, timeout=self.connect_timeout)
+            return True
+        except httpx.HTTPError as e:
+            print(f"Warning: OpenRouter connection warm-up failed: {e}")
+            return False
+    
+    def close(self):
+        """Close the synchronous HTTP session and release the Tesseract engines"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        self.tesseract_pool.close()
+    
+    async def aclose(self):
+        """Close both HTTP clients and the Tesseract engines; call this on application shutdown"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.close()
 
 # Usage example
 if __name__ == "__main__":
@@ -706,4 +1191,6 @@ if __name__ == "__main__":
     # leads = processor.process_multiple_images(image_paths)
     
     # processor.print_leads(leads)
-    # processor.save_leads_to_json(leads, "extracted_leads.json")
\ No newline at end of file
+    # processor.save_leads_to_json(leads, "extracted_leads.json")
+    
+    # For large batches use the resumable CLI: python -m routers.ocr_batch <dir> --output leads.ndjson
\ No newline at end of file
@@ -0,0 +1,359 @@
+"""
+Offline bulk OCR: extract leads from a directory tree or manifest of images and PDFs.
+
+Usage (from crm-backend/):
+    python -m routers.ocr_batch scans/ --output leads.ndjson
+    python -m routers.ocr_batch --manifest files.txt --workers 8 --api
+
+Files are processed on a process pool. Leads are appended to the output as
+NDJSON (one lead per line, tagged with its source file and page) as each
+file finishes, and every finished file is recorded in a checkpoint next to
+the output. Re-running the same command resumes an interrupted run: finished
+files are skipped and any leads written after the last checkpoint are
+truncated away, so nothing is duplicated. Throughput and per-stage timings
+are printed at the end.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from routers import ocr_engine
+from routers.ocr_bulk import entry_kind
+from routers.ocr_engine import _extract_leads_from_text, _prepare_api_payload, _process_page_with_ocr, \
+    render_profiles_from_env
+from routers.ocr_stages import PageSource, RenderProfile, StageReport, extract_text_layers, timed_stage
+from routers.rate_limiter import APIRateLimiter
+from routers.tesseract_pool import TesseractPool
+
+logger = logging.getLogger(__name__)
+
+
+def _init_batch_worker(processor_kwargs: Dict[str, Any], quiet: bool):
+    """Build the worker's processor, silencing its per-image progress prints unless verbose"""
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    ocr_engine._init_cpu_worker(processor_kwargs)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _process_file(path: str, use_api: bool, text_layer_min_chars: int, api_profile: RenderProfile,
+                  ocr_profile: RenderProfile) -> Tuple[List[Dict[str, Any]], int, List[StageReport]]:
+    """
+    Extract the leads of every page of one file inside a worker process
+
+    Pages with a usable text layer skip rasterization; the rest go to the vision
+    API when use_api is set (falling back to Tesseract on failure) or straight
+    to Tesseract.
+
+    Returns:
+        (lead records tagged with source and page_number, page count, stage reports)
+    """
+    report: StageReport = {}
+    content = timed_stage(report, "read", _read_file, path)
+    kind = entry_kind(path)
+    texts = timed_stage(report, "text_layer", extract_text_layers, content, kind, text_layer_min_chars)
+    reports = [report]
+
+    records = []
+    for page_number, text in enumerate(texts, 1):
+        source = PageSource(content, kind, page_number, text)
+        if text is not None:
+            leads, page_report = _extract_leads_from_text(text)
+        elif use_api:
+            try:
+                payload, page_report = _prepare_api_payload(source, api_profile)
+                leads = timed_stage(page_report, "api", ocr_engine._worker_processor.extract_leads_from_base64,
+                                    payload)
+            except Exception as e:
+                logger.warning(f"API failed for {path} page {page_number}: {e}. Falling back to OCR")
+                leads, page_report = _process_page_with_ocr(source, ocr_profile)
+        else:
+            leads, page_report = _process_page_with_ocr(source, ocr_profile)
+        reports.append(page_report)
+        records.extend({"source": path, "page_number": page_number, **asdict(lead)} for lead in leads)
+    return records, len(texts), reports
+
+
+def iter_input_files(paths: Iterable[str], manifest: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield the absolute path of every image or PDF to process, lazily and in a stable order
+
+    Args:
+        paths: Files and directories (walked recursively, hidden entries skipped)
+        manifest: Optional text file listing one path per line ("#" starts a comment)
+    """
+    def expand(path: str) -> Iterator[str]:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "__MACOSX")
+                for name in sorted(files):
+                    if not name.startswith(".") and entry_kind(name) is not None:
+                        yield os.path.abspath(os.path.join(root, name))
+        elif entry_kind(path) is not None:
+            yield os.path.abspath(path)
+        else:
+            logger.warning(f"Skipping unsupported input: {path}")
+
+    for path in paths:
+        yield from expand(path)
+    if manifest:
+        with open(manifest, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield from expand(line)
+
+
+class Checkpoint:
+    """
+    Append-only record of finished files for one output file.
+
+    Each line is {"path", "status", "pages", "leads", "offset", "error"} where
+    offset is the output size once the file's leads were written. Loading
+    truncates the output back to the last recorded offset, dropping leads of a
+    file that was interrupted mid-write.
+    """
+
+    def __init__(self, path: str, output_path: str, restart: bool = False):
+        self.path = path
+        self.output_path = output_path
+        self.done: Set[str] = set()
+        self.failed: Set[str] = set()
+
+        offset = 0
+        if restart:
+            for stale in (path, output_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        elif os.path.exists(path):
+            valid = 0
+            with open(path, "r+b") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn final line from an interrupted write
+                    (self.done if entry["status"] == "done" else self.failed).add(entry["path"])
+                    offset = entry["offset"]
+                    valid += len(line)
+                f.truncate(valid)
+        elif os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            raise ValueError(f"{output_path} exists without a checkpoint; use --restart to overwrite it")
+
+        if os.path.exists(output_path) and os.path.getsize(output_path) > offset:
+            with open(output_path, "r+b") as f:
+                f.truncate(offset)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, path: str, status: str, offset: int, pages: int = 0, leads: int = 0,
+               error: Optional[str] = None):
+        entry = {"path": path, "status": status, "pages": pages, "leads": leads, "offset": offset, "error": error}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        (self.done if status == "done" else self.failed).add(path)
+
+    def close(self):
+        self._file.close()
+
+
+class BatchStats:
+    """Counters for one run: files, pages, leads and time spent per stage across all workers"""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.files = 0
+        self.failed = 0
+        self.skipped = 0
+        self.pages = 0
+        self.leads = 0
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def record_stages(self, report: StageReport):
+        for stage, (seconds, size) in report.items():
+            counters = self.stages.setdefault(stage, {"calls": 0, "seconds": 0.0, "bytes": 0})
+            counters["calls"] += 1
+            counters["seconds"] += seconds
+            counters["bytes"] += size
+
+    def per_minute(self, count: int) -> float:
+        elapsed = time.time() - self.start_time
+        return count * 60 / elapsed if elapsed > 0 else 0.0
+
+    def print_summary(self, workers: int):
+        elapsed = time.time() - self.start_time
+        print(f"\nFiles: {self.files} processed, {self.failed} failed, {self.skipped} already done")
+        print(f"Pages: {self.pages}  Leads: {self.leads}  Time: {elapsed:.1f}s with {workers} worker(s)")
+        print(f"Throughput: {self.per_minute(self.files):.1f} files/min, {self.per_minute(self.pages):.1f} pages/min")
+
+        total = sum(counters["seconds"] for counters in self.stages.values()) or 1.0
+        print(f"\n{'stage':<12} {'calls':>8} {'total s':>10} {'avg ms':>9} {'share':>7}")
+        for stage, counters in sorted(self.stages.items(), key=lambda item: -item[1]["seconds"]):
+            print(f"{stage:<12} {counters['calls']:>8} {counters['seconds']:>10.1f} "
+                  f"{counters['seconds'] * 1000 / counters['calls']:>9.1f} {counters['seconds'] / total:>7.1%}")
+
+
+def _split_rate_limiter(limiter: APIRateLimiter, workers: int) -> APIRateLimiter:
+    return APIRateLimiter(limiter.requests_per_minute / workers, limiter.tokens_per_minute / workers,
+                          burst=max(1, limiter.burst // workers), max_wait=limiter.max_wait)
+
+
+def run_batch(inputs: Iterable[str], output_path: str, checkpoint_path: str, workers: int, use_api: bool = False,
+              restart: bool = False, retry_failed: bool = False, verbose: bool = False,
+              progress_interval: float = 10.0) -> BatchStats:
+    """
+    Process every input file across a process pool, appending leads to output_path
+
+    Args:
+        inputs: Absolute paths of the images and PDFs to process
+        output_path: NDJSON file leads are appended to
+        checkpoint_path: File recording finished files, used to resume
+        workers: Size of the process pool
+        use_api: Send pages without a text layer to the vision API instead of Tesseract
+        restart: Discard an existing output and checkpoint instead of resuming
+        retry_failed: Process files that failed in a previous run again
+        verbose: Keep the workers' per-image output
+        progress_interval: Seconds between progress log lines
+
+    Returns:
+        Counters for the run
+
+    Raises:
+        ValueError: If --api is requested without OPENROUTER_API_KEY, or output_path
+            exists without a checkpoint
+    """
+    api_profile, ocr_profile = render_profiles_from_env()
+    text_layer_min_chars = int(os.getenv("OCR_TEXT_LAYER_MIN_CHARS", "32"))
+    # Only the API path needs a real key; Tesseract-only runs work offline
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if use_api and not api_key:
+        raise ValueError("OPENROUTER_API_KEY is required with --api")
+    processor_kwargs = {
+        "openrouter_api_key": api_key or "offline",
+        "extraction_mode": os.getenv("OCR_EXTRACTION_MODE", "structured"),
+        # Each worker process has its own limiter, so the configured rate is split between them
+        "rate_limiter": _split_rate_limiter(APIRateLimiter.from_env(), workers),
+        # One engine per worker: files, not pages, are the unit of parallelism here
+        "tesseract_pool": TesseractPool(size=1, languages=os.getenv("OCR_TESSERACT_LANG", "eng"),
+                                        psm=int(os.getenv("OCR_TESSERACT_PSM", "3")),
+                                        tessdata_path=os.getenv("TESSDATA_PREFIX")),
+    }
+
+    checkpoint = Checkpoint(checkpoint_path, output_path, restart=restart)
+    stats = BatchStats()
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_batch_worker, initargs=(processor_kwargs, not verbose))
+    pending: Dict[Future, str] = {}
+    pending_paths: Set[str] = set()
+    inputs = iter(inputs)
+
+    def submit_next() -> bool:
+        for path in inputs:
+            if path in checkpoint.done or (path in checkpoint.failed and not retry_failed) or path in pending_paths:
+                stats.skipped += 1
+                continue
+            pending[pool.submit(_process_file, path, use_api, text_layer_min_chars, api_profile, ocr_profile)] = path
+            pending_paths.add(path)
+            return True
+        return False
+
+    try:
+        with open(output_path, "ab") as output:
+            # Keep a couple of files queued per worker without materializing the whole input list
+            for _ in range(workers * 2):
+                if not submit_next():
+                    break
+
+            last_progress = time.time()
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = pending.pop(future)
+                    pending_paths.discard(path)
+                    try:
+                        records, pages, reports = future.result()
+                    except BrokenProcessPool:
+                        # Not the file's fault (e.g. a worker was OOM-killed); leave it for the resume
+                        raise
+                    except Exception as e:
+                        logger.error(f"Failed to process {path}: {e}")
+                        stats.failed += 1
+                        checkpoint.record(path, "failed", output.tell(), error=str(e))
+                    else:
+                        if records:
+                            lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+                            output.write(lines.encode("utf-8"))
+                            output.flush()
+                        for report in reports:
+                            stats.record_stages(report)
+                        stats.files += 1
+                        stats.pages += pages
+                        stats.leads += len(records)
+                        # Leads are flushed before the checkpoint line that covers them
+                        checkpoint.record(path, "done", output.tell(), pages, len(records))
+                    submit_next()
+
+                if time.time() - last_progress >= progress_interval:
+                    last_progress = time.time()
+                    logger.info(f"{stats.files} file(s), {stats.pages} page(s), {stats.leads} lead(s) "
+                                f"({stats.per_minute(stats.files):.1f} files/min), {stats.failed} failed")
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; re-run the same command to resume")
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        checkpoint.close()
+        stats.print_summary(workers)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Extract leads from a directory tree or manifest of images and PDFs")
+    parser.add_argument("inputs", nargs="*", help="Image/PDF files or directories to walk")
+    parser.add_argument("--manifest", help="Text file with one input path per line")
+    parser.add_argument("--output", default="leads.ndjson", help="NDJSON file leads are appended to")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--api", action="store_true", help="Use the vision API, falling back to Tesseract")
+    parser.add_argument("--restart", action="store_true", help="Discard previous output instead of resuming")
+    parser.add_argument("--retry-failed", action="store_true", help="Process files that failed previously again")
+    parser.add_argument("--verbose", action="store_true", help="Show per-image worker output")
+    args = parser.parse_args(argv)
+
+    if not args.inputs and not args.manifest:
+        parser.error("give at least one input path or --manifest")
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        run_batch(
+            iter_input_files(args.inputs, args.manifest),
+            output_path=args.output,
+            checkpoint_path=args.checkpoint or args.output + ".checkpoint",
+            workers=max(1, args.workers),
+            use_api=args.api,
+            restart=args.restart,
+            retry_failed=args.retry_failed,
+            verbose=args.verbose,
+        )
+    except KeyboardInterrupt:
+        sys.exit(130)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import os
+import re
+import time
+import zipfile
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+from routers.ocr import Lead
+from routers.ocr_engine import OCRExecutionEngine
+from routers.rate_limiter import PRIORITY_BULK, api_scope
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+
+
+class BulkUploadError(Exception):
+    """Raised when a bulk upload cannot be read (e.g. a corrupt ZIP or too many entries)"""
+
+
+@dataclass
+class BulkEntry:
+    """One card in a bulk upload; its bytes are only read when the card is scheduled"""
+    name: str
+    kind: Optional[str]  # "pdf" or "image", None for skipped entries
+    read: Optional[Callable[[], bytes]] = None
+    error: Optional[str] = None  # why the entry is skipped
+
+
+def entry_kind(name: str, content_type: Optional[str] = None) -> Optional[str]:
+    """Classify an upload or archive member as "pdf", "image" or unsupported (None)"""
+    extension = os.path.splitext(name.lower())[1]
+    if content_type == "application/pdf" or extension == ".pdf":
+        return "pdf"
+    if (content_type or "").startswith("image/") or extension in IMAGE_EXTENSIONS:
+        return "image"
+    return None
+
+
+def is_zip_upload(name: str, content_type: Optional[str]) -> bool:
+    return content_type in ("application/zip", "application/x-zip-compressed") or name.lower().endswith(".zip")
+
+
+def _zip_reader(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> Callable[[], bytes]:
+    return lambda: archive.read(info)
+
+
+def _file_size(fileobj: BinaryIO) -> int:
+    fileobj.seek(0, os.SEEK_END)
+    return fileobj.tell()
+
+
+def _file_reader(fileobj: BinaryIO) -> Callable[[], bytes]:
+    def read() -> bytes:
+        fileobj.seek(0)
+        return fileobj.read()
+    return read
+
+
+def collect_entries(uploads: Iterable[Tuple[str, Optional[str], BinaryIO]], max_entry_bytes: int,
+                    max_entries: int) -> List[BulkEntry]:
+    """
+    List the cards in a batch of uploads without reading them
+
+    ZIP archives are expanded from their central directory only; member bytes
+    are decompressed one at a time when the card is processed, so nothing is
+    extracted to disk. Reading the central directory and sizing the uploads
+    blocks on file I/O, so async callers should run this in an executor.
+
+    Args:
+        uploads: (filename, content_type, file object) for each uploaded file
+        max_entry_bytes: Cards larger than this are skipped, whether archive members or uploaded files
+        max_entries: Maximum number of cards in one batch
+
+    Returns:
+        Entries in upload order
+
+    Raises:
+        BulkUploadError: If an archive is corrupt or the batch has too many entries
+    """
+    entries = []
+    for filename, content_type, fileobj in uploads:
+        if is_zip_upload(filename, content_type):
+            try:
+                archive = zipfile.ZipFile(fileobj)
+            except zipfile.BadZipFile as e:
+                raise BulkUploadError(f"{filename} is not a valid ZIP archive: {e}")
+
+            for info in archive.infolist():
+                basename = os.path.basename(info.filename)
+                if info.is_dir() or info.filename.startswith("__MACOSX/") or not basename or basename.startswith("."):
+                    continue
+                name = f"{filename}/{info.filename}"
+                kind = entry_kind(info.filename)
+                if kind is None:
+                    entries.append(BulkEntry(name, None, error="Unsupported file type"))
+                elif info.file_size > max_entry_bytes:
+                    entries.append(BulkEntry(name, None, error="File is too large"))
+                else:
+                    entries.append(BulkEntry(name, kind, read=_zip_reader(archive, info)))
+        else:
+            kind = entry_kind(filename, content_type)
+            if kind is None:
+                entries.append(BulkEntry(filename, None, error="Unsupported file type"))
+            elif _file_size(fileobj) > max_entry_bytes:
+                entries.append(BulkEntry(filename, None, error="File is too large"))
+            else:
+                entries.append(BulkEntry(filename, kind, read=_file_reader(fileobj)))
+
+        if len(entries) > max_entries:
+            raise BulkUploadError(f"Batch has more than {max_entries} entries")
+    return entries
+
+
+class LeadDeduplicator:
+    """
+    Drops leads already seen in a batch.
+
+    Leads are matched on email (case-insensitive) and phone digits; leads with
+    neither are matched on name and company, so two different people who only
+    share a common name are both kept when they have contact details.
+    """
+
+    def __init__(self):
+        self._seen = set()
+
+    @staticmethod
+    def _keys(lead: Lead) -> set:
+        keys = set()
+        if lead.email:
+            keys.add(("email", lead.email.strip().lower()))
+        if lead.phone:
+            digits = re.sub(r"\D", "", lead.phone)
+            if digits:
+                keys.add(("phone", digits[-10:]))
+        if not keys and lead.name:
+            keys.add(("name", lead.name.strip().lower(), (lead.company or "").strip().lower()))
+        return keys
+
+    def add(self, leads: List[Lead]) -> Tuple[List[Lead], int]:
+        """
+        Filter a card's leads down to those not seen before
+
+        Returns:
+            (new leads, number of duplicates dropped)
+        """
+        new_leads = []
+        duplicates = 0
+        for lead in leads:
+            keys = self._keys(lead)
+            if not keys:
+                continue
+            if keys & self._seen:
+                duplicates += 1
+            else:
+                new_leads.append(lead)
+            self._seen |= keys
+        return new_leads, duplicates
+
+
+class BulkIngestor:
+    """
+    Fans a batch of cards out across the OCR execution engine.
+
+    Up to concurrency cards are in flight at once. A card goes to the vision
+    API when one of api_concurrency API slots is free and to Tesseract
+    otherwise, so overflow keeps the CPU workers busy instead of queueing
+    behind OpenRouter. Results are yielded in completion order.
+    """
+
+    def __init__(self, engine: OCRExecutionEngine, concurrency: int = 8, api_concurrency: int = 4,
+                 max_entry_bytes: int = 10 * 1024 * 1024, max_entries: int = 5000):
+        """
+        Initialize the ingestor
+
+        Args:
+            engine: Engine that processes the pages of each card
+            concurrency: Cards processed at once
+            api_concurrency: Cards sent to the vision API at once (0 sends everything to Tesseract)
+            max_entry_bytes: Cards larger than this are skipped
+            max_entries: Maximum number of cards in one batch
+        """
+        self.engine = engine
+        self.concurrency = max(1, concurrency)
+        self.api_concurrency = max(0, api_concurrency)
+        self.max_entry_bytes = max_entry_bytes
+        self.max_entries = max_entries
+
+    @classmethod
+    def from_env(cls, engine: OCRExecutionEngine) -> "BulkIngestor":
+        """Build an ingestor from OCR_BULK_CONCURRENCY, OCR_BULK_API_CONCURRENCY and OCR_BULK_MAX_ENTRIES"""
+        return cls(
+            engine,
+            concurrency=int(os.getenv("OCR_BULK_CONCURRENCY", "8")),
+            api_concurrency=int(os.getenv("OCR_BULK_API_CONCURRENCY", "4")),
+            max_entries=int(os.getenv("OCR_BULK_MAX_ENTRIES", "5000")),
+        )
+
+    def collect(self, uploads: Iterable[Tuple[str, Optional[str], BinaryIO]]) -> List[BulkEntry]:
+        """List the cards in a batch using this ingestor's limits (see collect_entries)"""
+        return collect_entries(uploads, self.max_entry_bytes, self.max_entries)
+
+    async def _process_entry(self, entry: BulkEntry, api_slots: Optional[asyncio.Semaphore]) -> Dict[str, Any]:
+        start_time = time.time()
+        result = {"entry": entry.name, "backend": None, "pages": 0, "leads": [], "error": entry.error,
+                  "skipped": entry.error is not None, "processing_time": 0.0}
+        if entry.error:
+            return result
+
+        # Use the API only when a slot is free right now; otherwise Tesseract takes the card
+        use_api = api_slots is not None and not api_slots.locked()
+        if use_api:
+            await api_slots.acquire()
+        try:
+            content = await asyncio.get_running_loop().run_in_executor(None, entry.read)
+            sources = await self.engine.load_pages(content, entry.kind)
+            for source in sources:
+                result["leads"].extend(await self.engine.process_page(source, use_ocr=not use_api))
+            result["backend"] = "api" if use_api else "ocr"
+            result["pages"] = len(sources)
+        except Exception as e:
+            logger.warning(f"Bulk entry {entry.name} failed: {e}")
+            result["error"] = str(e)
+        finally:
+            if use_api:
+                api_slots.release()
+        result["processing_time"] = time.time() - start_time
+        return result
+
+    async def run(self, entries: List[BulkEntry]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a batch, yielding one "entry" event per card and a final "summary"
+
+        Entry events carry only leads not seen earlier in the batch (as Lead
+        objects) plus running throughput; closing the iterator cancels the
+        cards still in flight.
+
+        Args:
+            entries: Cards from collect()
+
+        Yields:
+            Event dicts
+        """
+        start_time = time.time()
+        results: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(self.concurrency)
+        api_slots = asyncio.Semaphore(self.api_concurrency) if self.api_concurrency else None
+        tasks = []
+
+        async def process(entry: BulkEntry):
+            try:
+                results.put_nowait(await self._process_entry(entry, api_slots))
+            finally:
+                slots.release()
+
+        async def feed():
+            for entry in entries:
+                await slots.acquire()
+                tasks.append(asyncio.ensure_future(process(entry)))
+
+        # Cards inherit the bulk priority class from the feeder task's context
+        with api_scope(PRIORITY_BULK):
+            feeder = asyncio.ensure_future(feed())
+        deduplicator = LeadDeduplicator()
+        totals = {"processed": 0, "failed": 0, "skipped": 0, "leads": 0, "duplicates": 0, "api": 0, "ocr": 0}
+
+        def cards_per_minute() -> float:
+            elapsed = time.time() - start_time
+            return totals["processed"] * 60 / elapsed if elapsed > 0 else 0.0
+
+        try:
+            for _ in range(len(entries)):
+                result = await results.get()
+                new_leads, duplicates = deduplicator.add(result["leads"])
+                if result["skipped"]:
+                    totals["skipped"] += 1
+                elif result["error"]:
+                    totals["failed"] += 1
+                else:
+                    totals["processed"] += 1
+                    totals[result["backend"]] += 1
+                totals["leads"] += len(new_leads)
+                totals["duplicates"] += duplicates
+
+                yield {
+                    "event": "entry",
+                    "entry": result["entry"],
+                    "backend": result["backend"],
+                    "pages": result["pages"],
+                    "processing_time": result["processing_time"],
+                    "error": result["error"],
+                    "leads": new_leads,
+                    "new_leads": len(new_leads),
+                    "duplicates": duplicates,
+                    "entries_done": totals["processed"] + totals["failed"] + totals["skipped"],
+                    "entries_total": len(entries),
+                    "cards_per_minute": cards_per_minute(),
+                }
+
+            processing_time = time.time() - start_time
+            yield {
+                "event": "summary",
+                "success": True,
+                "entries_total": len(entries),
+                "cards_processed": totals["processed"],
+                "cards_failed": totals["failed"],
+                "cards_skipped": totals["skipped"],
+                "leads_count": totals["leads"],
+                "duplicates": totals["duplicates"],
+                "backends": {"api": totals["api"], "ocr": totals["ocr"]},
+                "processing_time": processing_time,
+                "cards_per_minute": cards_per_minute(),
+            }
+        finally:
+            feeder.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(feeder, *tasks, return_exceptions=True)
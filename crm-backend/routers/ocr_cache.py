@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+from routers.ocr import Lead
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever rendering, prompts or extraction change in a way that alters results
+PIPELINE_VERSION = "3"
+
+
+class PageResultCache:
+    """
+    Content-addressed cache of per-page lead extraction results.
+
+    Entries live in a bounded in-memory LRU tier and, when db_path is given,
+    in a SQLite tier that survives restarts. Keys are built from the page's
+    content fingerprint, the model name and PIPELINE_VERSION, so a document
+    that differs by one page only misses on that page.
+    """
+
+    def __init__(self, max_entries: int = 1024, db_path: Optional[str] = None):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Size of the in-memory LRU tier
+            db_path: Optional SQLite file for the persistent tier
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path
+
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # The SQLite tier has its own lock, so memory hits and stats never wait on the disk
+        self._db_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "writes": 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS page_results (key TEXT PRIMARY KEY, leads TEXT NOT NULL)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["PageResultCache"]:
+        """Build a cache from OCR_CACHE_SIZE and OCR_CACHE_PATH (None when OCR_CACHE_SIZE=0)"""
+        max_entries = int(os.getenv("OCR_CACHE_SIZE", "1024"))
+        if max_entries <= 0:
+            return None
+        return cls(max_entries=max_entries, db_path=os.getenv("OCR_CACHE_PATH") or None)
+
+    @staticmethod
+    def make_key(fingerprint: str, model_name: str, variant: str = "") -> str:
+        """
+        Build a cache key for one page
+
+        Args:
+            fingerprint: Content hash of the page
+            model_name: Model whose output is cached
+            variant: Extra pipeline discriminator (e.g. which backend handled the page)
+
+        Returns:
+            Hex digest used as the cache key
+        """
+        parts = "\x1f".join([PIPELINE_VERSION, model_name, variant, fingerprint])
+        return hashlib.sha256(parts.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Lead]]:
+        """
+        Look up a page result, promoting disk hits into memory
+
+        Blocks on SQLite on a memory miss when the cache has a persistent tier; async callers use get_async.
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            Cached leads, or None on a miss
+        """
+        leads = self._get_memory(key)
+        if leads is None and self._db is not None:
+            leads = self._get_disk(key)
+        return leads
+
+    async def get_async(self, key: str) -> Optional[List[Lead]]:
+        """Like get, but a lookup that reaches the SQLite tier runs in the default executor"""
+        leads = self._get_memory(key)
+        if leads is None and self._db is not None:
+            leads = await asyncio.get_running_loop().run_in_executor(None, self._get_disk, key)
+        return leads
+
+    def _get_memory(self, key: str) -> Optional[List[Lead]]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return [Lead(**lead) for lead in self._entries[key]]
+            if self._db is None:
+                self._stats["misses"] += 1
+            return None
+
+    def _get_disk(self, key: str) -> Optional[List[Lead]]:
+        with self._db_lock:
+            row = self._db.execute("SELECT leads FROM page_results WHERE key = ?", (key,)).fetchone()
+        leads_data = json.loads(row[0]) if row is not None else None
+        with self._lock:
+            if leads_data is None:
+                self._stats["misses"] += 1
+                return None
+            self._remember(key, leads_data)
+            self._stats["disk_hits"] += 1
+        return [Lead(**lead) for lead in leads_data]
+
+    def put(self, key: str, leads: List[Lead]):
+        """
+        Store a page result in both tiers
+
+        Blocks on SQLite when the cache has a persistent tier; async callers use put_async.
+
+        Args:
+            key: Key from make_key
+            leads: Leads extracted from the page
+        """
+        leads_data = self._put_memory(key, leads)
+        if self._db is not None:
+            self._persist(key, leads_data)
+
+    async def put_async(self, key: str, leads: List[Lead]):
+        """Like put, but the SQLite write runs in the default executor"""
+        leads_data = self._put_memory(key, leads)
+        if self._db is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._persist, key, leads_data)
+
+    def _put_memory(self, key: str, leads: List[Lead]) -> List[Dict[str, Any]]:
+        leads_data = [asdict(lead) for lead in leads]
+        with self._lock:
+            self._remember(key, leads_data)
+            self._stats["writes"] += 1
+        return leads_data
+
+    def _persist(self, key: str, leads_data: List[Dict[str, Any]]):
+        try:
+            with self._db_lock:
+                self._db.execute("INSERT OR REPLACE INTO page_results (key, leads) VALUES (?, ?)",
+                                 (key, json.dumps(leads_data, ensure_ascii=False)))
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist OCR cache entry: {e}")
+
+    def _remember(self, key: str, leads_data: List[Dict[str, Any]]):
+        self._entries[key] = leads_data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and tier sizes for sizing the cache"""
+        with self._lock:
+            lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            hits = lookups - self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        """Close the SQLite tier"""
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
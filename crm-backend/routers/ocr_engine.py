@@ -0,0 +1,585 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from routers.api_batcher import APIBatcher
+from routers.ocr import DocumentImageProcessor, Lead, StructuredOutputError
+from routers.ocr_cache import PageResultCache
+from routers.ocr_stages import (
+    API_RENDER_PROFILE, OCR_RENDER_PROFILE, EncodedImage, PageSource, RenderProfile, StageReport,
+    encode_image, extract_text_layers, fingerprint_pages, load_imaging_libraries, optimize_image, render_page,
+    timed_stage
+)
+
+logger = logging.getLogger(__name__)
+
+# Processor owned by each CPU worker process (built once by _init_cpu_worker)
+_worker_processor: Optional[DocumentImageProcessor] = None
+# Why this worker's Tesseract warm-up failed, if it did
+_worker_warm_up_error: Optional[str] = None
+
+
+def _init_cpu_worker(processor_kwargs: Dict[str, Any]):
+    """Build the per-process DocumentImageProcessor used by CPU stages"""
+    global _worker_processor, _worker_warm_up_error
+    _worker_processor = DocumentImageProcessor(**processor_kwargs)
+    # Import the imaging libraries and load Tesseract's language data now rather than on the worker's first page
+    load_imaging_libraries()
+    try:
+        _worker_processor.tesseract_pool.warm_up()
+    except Exception as e:
+        _worker_warm_up_error = str(e)
+        logger.warning(f"Tesseract warm-up failed: {e}")
+
+
+def _report_cpu_worker(hold: float) -> Tuple[int, Optional[str]]:
+    """Return this worker's pid and warm-up error, holding it briefly so sibling tasks land on other workers"""
+    time.sleep(hold)
+    return os.getpid(), _worker_warm_up_error
+
+
+def _inspect_pages(content: bytes, kind: str,
+                   min_chars: int) -> Tuple[List[Optional[str]], List[str], StageReport]:
+    """Read every page's embedded text layer and content fingerprint inside a CPU worker"""
+    report: StageReport = {}
+    texts = timed_stage(report, "text_layer", extract_text_layers, content, kind, min_chars)
+    fingerprints = timed_stage(report, "fingerprint", fingerprint_pages, content, kind)
+    return texts, fingerprints, report
+
+
+def _extract_leads_from_text(text: str) -> Tuple[List[Lead], StageReport]:
+    """Run regex lead extraction on already available text inside a CPU worker"""
+    report: StageReport = {}
+    leads = timed_stage(report, "regex", _worker_processor.extract_leads_with_regex, text)
+    return leads, report
+
+
+def _prepare_api_payload(source: PageSource, profile: RenderProfile) -> Tuple[EncodedImage, StageReport]:
+    """Render, optimize and encode a page for the vision API inside a CPU worker"""
+    report: StageReport = {}
+    image = timed_stage(report, "render", render_page, source, profile)
+    image = timed_stage(report, "optimize", optimize_image, image, profile)
+    payload = timed_stage(report, "encode", encode_image, image, profile)
+    return payload, report
+
+
+def _process_page_with_ocr(source: PageSource, profile: RenderProfile) -> Tuple[List[Lead], StageReport]:
+    """Render, optimize and run Tesseract + regex on a page inside a CPU worker"""
+    report: StageReport = {}
+    image = timed_stage(report, "render", render_page, source, profile)
+    image = timed_stage(report, "optimize", optimize_image, image, profile)
+    leads = timed_stage(report, "tesseract", _worker_processor.process_image_with_ocr, image)
+    return leads, report
+
+
+def _merge_leads(primary: List[Lead], secondary: List[Lead]) -> List[Lead]:
+    """Append leads from secondary whose email, phone and name are not already in primary"""
+    seen = {value.lower() for lead in primary for value in (lead.email, lead.phone, lead.name) if value}
+    merged = list(primary)
+    for lead in secondary:
+        keys = {value.lower() for value in (lead.email, lead.phone, lead.name) if value}
+        if keys and not keys & seen:
+            merged.append(lead)
+            seen |= keys
+    return merged
+
+
+def render_profiles_from_env() -> Tuple[RenderProfile, RenderProfile]:
+    """
+    Build the (API, OCR) render profiles from OCR_CLIP_TO_CONTENT, OCR_TESSERACT_DPI, OCR_PREPROCESS,
+    OCR_TARGET_X_HEIGHT, OCR_API_IMAGE_BUDGET and OCR_API_IMAGE_FORMATS
+    """
+    clip_to_content = os.getenv("OCR_CLIP_TO_CONTENT", "false").lower() == "true"
+    preprocess = os.getenv("OCR_PREPROCESS", "true").lower() == "true"
+    byte_budget = int(os.getenv("OCR_API_IMAGE_BUDGET", "75000"))
+    image_formats = tuple(name.strip().upper() for name in os.getenv("OCR_API_IMAGE_FORMATS", "JPEG").split(",")
+                          if name.strip())
+    api_profile = replace(API_RENDER_PROFILE, clip_to_content=clip_to_content, byte_budget=byte_budget or None,
+                          image_formats=image_formats or API_RENDER_PROFILE.image_formats)
+    ocr_profile = replace(OCR_RENDER_PROFILE, dpi=int(os.getenv("OCR_TESSERACT_DPI", "300")),
+                          clip_to_content=clip_to_content, crop_borders=preprocess, deskew=preprocess,
+                          binarize=preprocess,
+                          target_x_height=int(os.getenv("OCR_TARGET_X_HEIGHT", "20")) if preprocess else None)
+    return api_profile, ocr_profile
+
+
+class LatencyTracker:
+    """Rolling window of API latencies used to pick the hedge delay"""
+
+    def __init__(self, window: int = 100, percentile: float = 0.9, min_samples: int = 10):
+        self.samples = deque(maxlen=window)
+        self.percentile = percentile
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, default: float) -> float:
+        """Return the configured percentile, or default until enough samples exist"""
+        if len(self.samples) < self.min_samples:
+            return default
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+
+
+class EngineSaturatedError(Exception):
+    """Raised when the OCR engine already holds max_pending jobs"""
+
+
+@dataclass
+class PageResult:
+    """Leads and timing for one page of an uploaded document"""
+    page_number: int
+    leads: List[Lead] = field(default_factory=list)
+    processing_time: float = 0.0
+
+
+class OCRExecutionEngine:
+    """
+    Runs the DocumentImageProcessor pipeline off the event loop.
+
+    CPU stages (rasterize, optimize, compress, Tesseract) go to a process pool,
+    network stages (OpenRouter calls) are awaited on the processor's pooled
+    async HTTP client, and the number of OCR jobs admitted at once is bounded
+    by max_pending.
+    """
+
+    def __init__(self, processor: DocumentImageProcessor, cpu_workers: Optional[int] = None,
+                 max_pending: int = 16, page_concurrency: int = 4,
+                 api_profile: RenderProfile = API_RENDER_PROFILE,
+                 ocr_profile: RenderProfile = OCR_RENDER_PROFILE,
+                 text_layer_backend: str = "regex", text_layer_min_chars: int = 32,
+                 cache: Optional[PageResultCache] = None, hedge_mode: str = "delay",
+                 hedge_delay: Optional[float] = None, hedge_merge_budget: float = 0.0,
+                 api_batch_size: int = 1, api_batch_max_bytes: int = 4 * 1024 * 1024,
+                 api_batch_linger: float = 0.05):
+        """
+        Initialize the engine around an existing processor
+
+        Args:
+            processor: Processor used for network stages in this process
+            cpu_workers: Size of the process pool (defaults to the CPU count)
+            max_pending: Maximum number of OCR jobs queued or running at once
+            page_concurrency: Default number of pages of one document processed at once
+            api_profile: How PDF pages are rasterized for the vision API
+            ocr_profile: How PDF pages are rasterized for Tesseract
+            text_layer_backend: "regex" or "api" for pages with an embedded text layer
+            text_layer_min_chars: Minimum text layer size for a page to skip rasterization
+            cache: Optional page result cache consulted before any page is processed
+            hedge_mode: "off" (OCR only after the API fails), "delay" (start OCR once the API
+                has taken hedge_delay) or "parallel" (start API and OCR together)
+            hedge_delay: Fixed hedge delay in seconds; None uses the rolling p90 API latency
+            hedge_merge_budget: Seconds to wait for the API after OCR wins so both results can be merged
+            api_batch_size: Pages packed into one vision request (1 disables batching; structured mode only)
+            api_batch_max_bytes: Base64 payload budget of one batched request
+            api_batch_linger: Seconds a page waits for others to join its batch
+        """
+        self.processor = processor
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.page_concurrency = page_concurrency
+        self.api_profile = api_profile
+        self.ocr_profile = ocr_profile
+        self.text_layer_backend = text_layer_backend
+        self.text_layer_min_chars = text_layer_min_chars
+        self.cache = cache
+        self.hedge_mode = hedge_mode
+        self.hedge_delay = hedge_delay
+        self.hedge_merge_budget = hedge_merge_budget
+        self.api_latency = LatencyTracker()
+        self.api_batcher: Optional[APIBatcher] = None
+        if api_batch_size > 1 and processor.extraction_mode == "structured":
+            self.api_batcher = APIBatcher(processor.extract_leads_from_base64_batch_async,
+                                          self._extract_leads_from_payload, max_images=api_batch_size,
+                                          max_bytes=api_batch_max_bytes, linger=api_batch_linger)
+
+        self._pending = 0
+        self._finished = 0
+        self._rejected = 0
+        self._stage_stats: Dict[str, Dict[str, float]] = {}
+        self._hedge_stats = {"hedged": 0, "api_wins": 0, "ocr_wins": 0, "merged": 0}
+        self._cpu_pool = self._create_cpu_pool()
+
+    @classmethod
+    def from_env(cls, processor: DocumentImageProcessor) -> "OCRExecutionEngine":
+        """Build an engine configured from the OCR_* environment variables"""
+        cpu_workers = os.getenv("OCR_CPU_WORKERS")
+        api_profile, ocr_profile = render_profiles_from_env()
+        return cls(
+            processor,
+            cpu_workers=int(cpu_workers) if cpu_workers else None,
+            max_pending=int(os.getenv("OCR_MAX_PENDING", "16")),
+            page_concurrency=int(os.getenv("OCR_PAGE_CONCURRENCY", "4")),
+            api_profile=api_profile,
+            ocr_profile=ocr_profile,
+            text_layer_backend=os.getenv("OCR_TEXT_LAYER_BACKEND", "regex"),
+            text_layer_min_chars=int(os.getenv("OCR_TEXT_LAYER_MIN_CHARS", "32")),
+            cache=PageResultCache.from_env(),
+            hedge_mode=os.getenv("OCR_HEDGE_MODE", "delay"),
+            hedge_delay=float(os.environ["OCR_HEDGE_DELAY"]) if os.getenv("OCR_HEDGE_DELAY") else None,
+            hedge_merge_budget=float(os.getenv("OCR_HEDGE_MERGE_BUDGET", "0")),
+            api_batch_size=int(os.getenv("OCR_API_BATCH_SIZE", "1")),
+            api_batch_max_bytes=int(os.getenv("OCR_API_BATCH_MAX_BYTES", str(4 * 1024 * 1024))),
+            api_batch_linger=float(os.getenv("OCR_API_BATCH_LINGER", "0.05")),
+        )
+
+    def _create_cpu_pool(self) -> ProcessPoolExecutor:
+        processor_kwargs = {
+            "openrouter_api_key": self.processor.api_key,
+            "model_name": self.processor.model_name,
+            "api_timeout": self.processor.api_timeout,
+            "max_documents_for_api": self.processor.max_documents_for_api,
+            # Pickles as its settings, so each worker process builds its own engines
+            "tesseract_pool": self.processor.tesseract_pool,
+        }
+        # spawn keeps worker processes independent of the server's event loop and threads
+        return ProcessPoolExecutor(
+            max_workers=self.cpu_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_cpu_worker,
+            initargs=(processor_kwargs,),
+        )
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Reserve a slot for one OCR job, failing fast when the queue is full
+
+        Raises:
+            EngineSaturatedError: If max_pending jobs are already in flight
+        """
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise EngineSaturatedError(f"OCR queue is full ({self.max_pending} jobs in flight)")
+
+        self._pending += 1
+        try:
+            yield
+        finally:
+            self._pending -= 1
+            self._finished += 1
+
+    async def run_cpu(self, func: Callable, *args):
+        """
+        Run a picklable module-level function in the process pool
+
+        Args:
+            func: Function to execute
+            *args: Positional arguments for func
+
+        Returns:
+            The function's return value
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._cpu_pool
+        try:
+            return await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge page); replace the pool once so later jobs still run
+            if self._cpu_pool is pool:
+                logger.error("OCR process pool broke, recreating it")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._cpu_pool = self._create_cpu_pool()
+            raise
+
+    async def warm_up(self) -> Dict[str, Any]:
+        """
+        Start every CPU worker ahead of the first job
+
+        The pool spawns workers on demand, so without this the first uploads
+        after a restart pay for process start-up, imports and Tesseract's
+        language data. One short task per worker makes the pool start all of
+        them; each runs the warm-up in _init_cpu_worker as it starts.
+
+        Returns:
+            {"workers": distinct workers that answered, "errors": Tesseract warm-up errors}
+        """
+        reports = await asyncio.gather(*(self.run_cpu(_report_cpu_worker, 0.05) for _ in range(self.cpu_workers)))
+        errors = sorted({error for _, error in reports if error})
+        for error in errors:
+            logger.warning(f"OCR worker Tesseract warm-up failed: {error}")
+        return {"workers": len({pid for pid, _ in reports}), "errors": errors}
+
+    def _record_stages(self, report: StageReport):
+        """Fold one page's stage measurements into the running counters"""
+        for stage, (seconds, size) in report.items():
+            counters = self._stage_stats.setdefault(stage, {"calls": 0, "seconds": 0.0, "bytes": 0})
+            counters["calls"] += 1
+            counters["seconds"] += seconds
+            counters["bytes"] += size
+
+    async def load_pages(self, content: bytes, kind: str) -> List[PageSource]:
+        """
+        Split an upload into page sources, attaching each page's usable text layer
+
+        Args:
+            content: Raw bytes of the upload
+            kind: "pdf" or "image"
+
+        Returns:
+            Page sources in page order
+        """
+        texts, fingerprints, report = await self.run_cpu(_inspect_pages, content, kind, self.text_layer_min_chars)
+        self._record_stages(report)
+        return [
+            PageSource(content, kind, page_number, text, fingerprint)
+            for page_number, (text, fingerprint) in enumerate(zip(texts, fingerprints), 1)
+        ]
+
+    async def process_page_text(self, text: str) -> List[Lead]:
+        """
+        Extract leads from a page's embedded text, skipping rasterization and OCR
+
+        Args:
+            text: Embedded text layer of the page
+
+        Returns:
+            List of Lead objects
+        """
+        if self.text_layer_backend == "api":
+            try:
+                return await self.processor.generate_leads_from_text_async(text)
+            except Exception as e:
+                logger.warning(f"API lead generation failed for text layer: {e}. Falling back to regex")
+
+        leads, report = await self.run_cpu(_extract_leads_from_text, text)
+        self._record_stages(report)
+        return leads
+
+    async def process_page_with_api(self, source: PageSource) -> List[Lead]:
+        """Async counterpart of DocumentImageProcessor.process_image_with_api for one page"""
+        start_time = time.perf_counter()
+        leads = await self._process_page_with_api(source)
+        self.api_latency.record(time.perf_counter() - start_time)
+        return leads
+
+    async def _process_page_with_api(self, source: PageSource) -> List[Lead]:
+        base64_image, report = await self.run_cpu(_prepare_api_payload, source, self.api_profile)
+        self._record_stages(report)
+        if self.api_batcher is not None:
+            return await self.api_batcher.extract(base64_image)
+        return await self._extract_leads_from_payload(base64_image)
+
+    async def _extract_leads_from_payload(self, base64_image: EncodedImage) -> List[Lead]:
+        # Single round trip when the model cooperates; malformed output falls back to two calls
+        if self.processor.extraction_mode == "structured":
+            try:
+                return await self.processor.extract_leads_from_base64_async(base64_image)
+            except StructuredOutputError as e:
+                logger.warning(f"Structured extraction failed: {e}. Falling back to two-step extraction")
+
+        extracted_text = await self.processor.extract_text_from_base64_async(base64_image)
+        return await self.processor.generate_leads_from_text_async(extracted_text)
+
+    async def process_page_with_ocr(self, source: PageSource) -> List[Lead]:
+        """Async counterpart of DocumentImageProcessor.process_image_with_ocr for one page"""
+        leads, report = await self.run_cpu(_process_page_with_ocr, source, self.ocr_profile)
+        self._record_stages(report)
+        return leads
+
+    async def process_page(self, source: PageSource, use_ocr: bool = False) -> List[Lead]:
+        """
+        Async counterpart of DocumentImageProcessor.process_image for one page
+
+        Args:
+            source: Page to process
+            use_ocr: Force use of OCR instead of API
+
+        Returns:
+            List of Lead objects
+        """
+        cache_key = None
+        if self.cache is not None and source.fingerprint:
+            if source.text is not None:
+                variant = f"text:{self.text_layer_backend}"
+            else:
+                variant = "image:ocr" if use_ocr else f"image:api:{self.processor.extraction_mode}"
+            cache_key = self.cache.make_key(source.fingerprint, self.processor.model_name, variant)
+            cached_leads = await self.cache.get_async(cache_key)
+            if cached_leads is not None:
+                return cached_leads
+
+        # Only results from the intended backend are cached, never the degraded fallback
+        cacheable = True
+
+        # Pages with an embedded text layer never need the vision model or Tesseract
+        if source.text is not None:
+            leads = await self.process_page_text(source.text)
+        elif use_ocr:
+            leads = await self.process_page_with_ocr(source)
+        elif self.processor.circuit_breaker.is_open():
+            # OpenRouter is failing; degrade to Tesseract speed instead of waiting out timeouts
+            leads = await self.process_page_with_ocr(source)
+            cacheable = False
+        elif self.hedge_mode != "off":
+            leads, cacheable = await self.process_page_hedged(source)
+        else:
+            # Try API first, fallback to OCR on failure or timeout
+            try:
+                leads = await self.process_page_with_api(source)
+            except Exception as e:
+                logger.warning(f"API processing failed for page {source.page_number}: {e}. Falling back to OCR processing")
+                leads = await self.process_page_with_ocr(source)
+                cacheable = False
+
+        if cache_key is not None and cacheable:
+            await self.cache.put_async(cache_key, leads)
+        return leads
+
+    async def process_page_hedged(self, source: PageSource) -> Tuple[List[Lead], bool]:
+        """
+        Race the API path against Tesseract instead of waiting for the API to fail
+
+        Tesseract starts after the hedge delay (immediately in "parallel" mode).
+        A successful API result always wins; a non-empty OCR result wins if it
+        arrives first, optionally merged with an API result that lands within
+        hedge_merge_budget. The losing task is cancelled.
+
+        Args:
+            source: Page to process
+
+        Returns:
+            Tuple of (leads, whether they came from the API and may be cached)
+        """
+        if self.hedge_mode == "parallel":
+            delay = 0.0
+        else:
+            delay = self.hedge_delay if self.hedge_delay is not None else self.api_latency.quantile(default=10.0)
+
+        api_task = asyncio.ensure_future(self.process_page_with_api(source))
+        ocr_task = None
+        try:
+            done, _ = await asyncio.wait({api_task}, timeout=delay)
+            if api_task in done and api_task.exception() is None:
+                self._hedge_stats["api_wins"] += 1
+                return api_task.result(), True
+
+            self._hedge_stats["hedged"] += 1
+            ocr_task = asyncio.ensure_future(self.process_page_with_ocr(source))
+            pending = {task for task in (api_task, ocr_task) if not task.done()}
+            ocr_leads: Optional[List[Lead]] = None
+
+            while True:
+                if api_task.done() and api_task.exception() is None:
+                    self._hedge_stats["api_wins"] += 1
+                    return api_task.result(), True
+
+                if ocr_task.done() and ocr_task.exception() is None:
+                    ocr_leads = ocr_task.result()
+                    # An empty OCR result is only accepted once the API has failed too
+                    if ocr_leads or api_task.done():
+                        break
+
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            if ocr_leads is None:
+                # Both paths failed; surface the OCR error like the sequential fallback would
+                logger.warning(f"API and OCR both failed for page {source.page_number}")
+                raise ocr_task.exception()
+
+            if not api_task.done() and self.hedge_merge_budget > 0:
+                done, _ = await asyncio.wait({api_task}, timeout=self.hedge_merge_budget)
+                if api_task in done and api_task.exception() is None:
+                    self._hedge_stats["merged"] += 1
+                    return _merge_leads(api_task.result(), ocr_leads), True
+
+            self._hedge_stats["ocr_wins"] += 1
+            return ocr_leads, False
+        finally:
+            # Cancel whichever path lost (a Tesseract run already inside a worker process still finishes there)
+            for task in (api_task, ocr_task):
+                if task is not None and not task.done():
+                    task.cancel()
+                elif task is not None and not task.cancelled():
+                    task.exception()  # mark retrieved so asyncio does not log it
+
+    async def process_pages(self, sources: List[PageSource],
+                            max_concurrency: Optional[int] = None) -> List[PageResult]:
+        """
+        Process the pages of one document concurrently
+
+        Each page runs the full API-with-OCR-fallback pipeline on its own, so a
+        slow API call on one page does not hold back the others.
+
+        Args:
+            sources: Pages in page order
+            max_concurrency: Pages of this document in flight at once (defaults to page_concurrency)
+
+        Returns:
+            One PageResult per page, in page order
+        """
+        limit = asyncio.Semaphore(max_concurrency or self.page_concurrency)
+
+        # Let every page finish before surfacing a failure so no work is left running behind the response
+        results = await asyncio.gather(*(self._run_page(source, limit) for source in sources),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    async def iter_pages(self, sources: List[PageSource],
+                         max_concurrency: Optional[int] = None) -> AsyncIterator[PageResult]:
+        """
+        Process the pages of one document concurrently, yielding each result as soon as its page finishes
+
+        Pages start in page order, so the first result arrives after roughly one
+        page's latency however long the document is. Closing the iterator early
+        (e.g. when a streaming client disconnects) cancels the remaining pages.
+
+        Args:
+            sources: Pages in page order
+            max_concurrency: Pages of this document in flight at once (defaults to page_concurrency)
+
+        Yields:
+            One PageResult per page, in completion order
+        """
+        limit = asyncio.Semaphore(max_concurrency or self.page_concurrency)
+        tasks = [asyncio.ensure_future(self._run_page(source, limit)) for source in sources]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_page(self, source: PageSource, limit: asyncio.Semaphore) -> PageResult:
+        async with limit:
+            start_time = time.time()
+            leads = await self.process_page(source)
+            return PageResult(source.page_number, leads, time.time() - start_time)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue and pool statistics for health reporting"""
+        return {
+            "cpu_workers": self.cpu_workers,
+            "max_pending": self.max_pending,
+            "page_concurrency": self.page_concurrency,
+            "pending": self._pending,
+            "finished": self._finished,
+            "rejected": self._rejected,
+            "stages": self._stage_stats,
+            "hedging": {
+                **self._hedge_stats,
+                "mode": self.hedge_mode,
+                "api_latency_p90": self.api_latency.quantile(default=0.0),
+            },
+            "api_batching": self.api_batcher.stats() if self.api_batcher is not None else None,
+        }
+
+    def shutdown(self):
+        """Stop the process pool, cancelling work that has not started yet"""
+        self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,406 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+from routers.ocr_engine import OCRExecutionEngine
+from routers.rate_limiter import PRIORITY_BULK, api_scope
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds between sweeps of finished jobs older than the retention period
+PURGE_INTERVAL = 600.0
+
+
+class JobNotFoundError(Exception):
+    """Raised when a job id is unknown"""
+
+
+class QueueFullError(Exception):
+    """Raised when max_queued jobs are already waiting"""
+
+
+class OCRJobQueue:
+    """
+    Persistent queue of OCR jobs processed in the background.
+
+    Uploads are stored in a SQLite table together with their status, priority
+    and page progress, so queued work survives a restart. Several processes
+    may share the file: each running job records the process that owns it,
+    which refreshes a heartbeat every heartbeat_interval seconds. A job whose
+    heartbeat is older than stale_after (its process died or hung) is queued
+    again by whichever process notices first, while jobs of live processes are
+    left alone. Up to max_concurrency jobs run at once on the shared
+    OCRExecutionEngine, highest priority first and oldest first within a
+    priority, each limited to page_concurrency pages so bulk imports leave
+    room for interactive uploads. At most max_queued jobs wait at once, and
+    finished jobs are deleted retention seconds after they finish. SQLite
+    work of the workers and the heartbeat runs in the default executor so
+    uploads of up to the size limit never block the event loop.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, engine: OCRExecutionEngine, db_path: str = "ocr_jobs.sqlite3", max_concurrency: int = 2,
+                 page_concurrency: int = 2, poll_interval: float = 5.0, max_queued: int = 100,
+                 heartbeat_interval: float = 10.0, stale_after: Optional[float] = None,
+                 retention: float = 7 * 24 * 3600):
+        """
+        Initialize the queue
+
+        Args:
+            engine: Engine that processes the pages of each job
+            db_path: SQLite file holding jobs and their results
+            max_concurrency: Jobs processed at once
+            page_concurrency: Pages of one job processed at once
+            poll_interval: Seconds idle workers wait before checking for jobs submitted by other processes
+            max_queued: Jobs allowed to wait at once (across every process sharing the file)
+            heartbeat_interval: Seconds between heartbeats of this process's running jobs
+            stale_after: Heartbeat age after which a running job is requeued (defaults to 3 heartbeats)
+            retention: Seconds finished jobs and their results are kept (0 keeps them forever)
+        """
+        self.engine = engine
+        self.db_path = db_path
+        self.max_concurrency = max(1, max_concurrency)
+        self.page_concurrency = max(1, page_concurrency)
+        self.poll_interval = poll_interval
+        self.max_queued = max(1, max_queued)
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after if stale_after is not None else 3 * heartbeat_interval
+        self.retention = retention
+        # Identifies this process's claims in a file shared with other workers
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL,"
+            " filename TEXT, content_type TEXT NOT NULL, content BLOB,"
+            " pages_total INTEGER, pages_done INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(ocr_jobs)")}
+        # Files created before jobs had owners gain the columns in place
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE ocr_jobs ADD COLUMN owner TEXT")
+        if "heartbeat_at" not in columns:
+            self._db.execute("ALTER TABLE ocr_jobs ADD COLUMN heartbeat_at REAL")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ocr_jobs_pending ON ocr_jobs (status, priority, created_at)")
+        self._db.commit()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._workers = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancel_requested = set()
+        self._purged_at = 0.0
+        # Job counts by status as of the last heartbeat, so health checks never wait on SQLite
+        self._counts: Dict[str, int] = {}
+        self._counted_at: Optional[float] = None
+
+    @classmethod
+    def from_env(cls, engine: OCRExecutionEngine) -> "OCRJobQueue":
+        """Build a queue from OCR_JOBS_PATH, OCR_JOBS_CONCURRENCY, OCR_JOBS_PAGE_CONCURRENCY, OCR_JOBS_MAX_QUEUED,
+        OCR_JOBS_HEARTBEAT and OCR_JOBS_RETENTION"""
+        return cls(
+            engine,
+            db_path=os.getenv("OCR_JOBS_PATH", "ocr_jobs.sqlite3"),
+            max_concurrency=int(os.getenv("OCR_JOBS_CONCURRENCY", "2")),
+            page_concurrency=int(os.getenv("OCR_JOBS_PAGE_CONCURRENCY", "2")),
+            max_queued=int(os.getenv("OCR_JOBS_MAX_QUEUED", "100")),
+            heartbeat_interval=float(os.getenv("OCR_JOBS_HEARTBEAT", "10")),
+            retention=float(os.getenv("OCR_JOBS_RETENTION", str(7 * 24 * 3600))),
+        )
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            self._db.commit()
+            return cursor
+
+    def _fetch(self, sql: str, params: tuple = ()) -> Optional[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchone()
+
+    async def _in_executor(self, function, *args):
+        # SQLite calls block on the lock and the disk, and rows carry uploads and results of megabytes
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    def _wake(self):
+        """Wake idle workers; safe to call from executor threads"""
+        if self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self):
+        """Requeue jobs whose process died and start the background workers and heartbeat"""
+        self._requeue_stale()
+        self._count_jobs()
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._heartbeat = asyncio.create_task(self._beat())
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+
+    async def stop(self):
+        """Stop the workers and hand this process's running jobs back to the queue"""
+        tasks = self._workers + ([self._heartbeat] if self._heartbeat is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+        requeued = (await self._in_executor(
+            self._execute,
+            "UPDATE ocr_jobs SET status = ?, pages_done = 0, owner = NULL, heartbeat_at = NULL"
+            " WHERE status = ? AND owner = ?", (self.QUEUED, self.RUNNING, self.owner)
+        )).rowcount
+        if requeued:
+            logger.info(f"Returned {requeued} running OCR job(s) to the queue")
+        self._db.close()
+
+    def _requeue_stale(self):
+        """Queue again running jobs whose owner stopped sending heartbeats"""
+        requeued = self._execute(
+            "UPDATE ocr_jobs SET status = ?, pages_done = 0, owner = NULL, heartbeat_at = NULL"
+            " WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (self.QUEUED, self.RUNNING, time.time() - self.stale_after)
+        ).rowcount
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted OCR job(s)")
+            self._wake()
+
+    def _purge_finished(self):
+        """Delete finished jobs, with their results, once they are older than the retention period"""
+        self._purged_at = time.time()
+        purged = self._execute(
+            "DELETE FROM ocr_jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+            (self.COMPLETED, self.FAILED, self.CANCELLED, self._purged_at - self.retention)
+        ).rowcount
+        if purged:
+            logger.info(f"Purged {purged} finished OCR job(s) older than {self.retention:.0f}s")
+
+    def _count_jobs(self):
+        with self._lock:
+            self._counts = dict(self._db.execute("SELECT status, COUNT(*) FROM ocr_jobs GROUP BY status").fetchall())
+        self._counted_at = time.time()
+
+    def _heartbeat_once(self):
+        self._execute("UPDATE ocr_jobs SET heartbeat_at = ? WHERE status = ? AND owner = ?",
+                      (time.time(), self.RUNNING, self.owner))
+        self._requeue_stale()
+        if self.retention and time.time() - self._purged_at >= PURGE_INTERVAL:
+            self._purge_finished()
+        self._count_jobs()
+
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._in_executor(self._heartbeat_once)
+            except sqlite3.Error as e:
+                logger.warning(f"OCR job heartbeat failed: {e}")
+
+    def submit(self, content: bytes, content_type: str, filename: Optional[str] = None, priority: int = 0) -> str:
+        """
+        Queue an upload for processing
+
+        Blocks on the SQLite write of the whole upload, so async callers should run it in an executor.
+
+        Args:
+            content: Raw bytes of the image or PDF
+            content_type: MIME type of the upload
+            filename: Original file name
+            priority: Higher values run first
+
+        Returns:
+            The new job id
+
+        Raises:
+            QueueFullError: If max_queued jobs are already waiting
+        """
+        job_id = uuid.uuid4().hex
+        # One statement, so the depth check and insert are atomic even with other processes on the file
+        inserted = self._execute(
+            "INSERT INTO ocr_jobs (id, status, priority, filename, content_type, content, created_at)"
+            " SELECT ?, ?, ?, ?, ?, ?, ? WHERE (SELECT COUNT(*) FROM ocr_jobs WHERE status = ?) < ?",
+            (job_id, self.QUEUED, priority, filename, content_type, content, time.time(), self.QUEUED,
+             self.max_queued)
+        ).rowcount
+        if not inserted:
+            raise QueueFullError(f"OCR job queue is full ({self.max_queued} jobs waiting)")
+        # submit() usually runs in an executor thread, and asyncio.Event is not thread-safe
+        self._wake()
+        return job_id
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        """
+        Describe a job and its page progress
+
+        Blocks on SQLite, so async callers should run it in an executor.
+
+        Raises:
+            JobNotFoundError: If the job id is unknown
+        """
+        row = self._fetch(
+            "SELECT id, status, priority, filename, content_type, pages_total, pages_done, error,"
+            " created_at, started_at, finished_at FROM ocr_jobs WHERE id = ?", (job_id,)
+        )
+        if row is None:
+            raise JobNotFoundError(job_id)
+        keys = ("job_id", "status", "priority", "filename", "content_type", "pages_total", "pages_done", "error",
+                "created_at", "started_at", "finished_at")
+        return dict(zip(keys, row))
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a completed job's pages as {"pages": [{"page_number", "leads", "processing_time"}]}
+
+        Blocks on SQLite and decodes the whole result, so async callers should run it in an executor.
+
+        Returns:
+            The stored result, or None while the job has not completed
+
+        Raises:
+            JobNotFoundError: If the job id is unknown
+        """
+        row = self._fetch("SELECT status, result FROM ocr_jobs WHERE id = ?", (job_id,))
+        if row is None:
+            raise JobNotFoundError(job_id)
+        status, result = row
+        return json.loads(result) if status == self.COMPLETED else None
+
+    async def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job
+
+        Returns:
+            True if the job was cancelled, False if it had already finished
+
+        Raises:
+            JobNotFoundError: If the job id is unknown
+        """
+        cursor = await self._in_executor(
+            self._execute,
+            "UPDATE ocr_jobs SET status = ?, content = NULL, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+            (self.CANCELLED, time.time(), job_id, self.QUEUED, self.RUNNING)
+        )
+        if cursor.rowcount == 0:
+            await self._in_executor(self.status, job_id)
+            return False
+
+        task = self._running.get(job_id)
+        if task is not None:
+            self._cancel_requested.add(job_id)
+            task.cancel()
+        return True
+
+    def _claim_next(self) -> Optional[str]:
+        while True:
+            row = self._fetch("SELECT id FROM ocr_jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1",
+                              (self.QUEUED,))
+            if row is None:
+                return None
+            # Another worker (or process sharing the file) may have claimed it first
+            now = time.time()
+            claimed = self._execute("UPDATE ocr_jobs SET status = ?, started_at = ?, owner = ?, heartbeat_at = ?"
+                                    " WHERE id = ? AND status = ?",
+                                    (self.RUNNING, now, self.owner, now, row[0], self.QUEUED)).rowcount
+            if claimed:
+                return row[0]
+
+    async def _worker(self):
+        while True:
+            job_id = await self._in_executor(self._claim_next)
+            if job_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._run_job(job_id))
+            self._running[job_id] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                # Only swallow cancellations of this job; otherwise the worker itself is stopping
+                if job_id not in self._cancel_requested:
+                    task.cancel()
+                    raise
+                logger.info(f"OCR job {job_id} cancelled")
+            except Exception as e:
+                logger.error(f"OCR job {job_id} failed: {e}")
+                await self._in_executor(
+                    self._execute,
+                    "UPDATE ocr_jobs SET status = ?, error = ?, content = NULL, finished_at = ?"
+                    " WHERE id = ? AND status = ? AND owner = ?",
+                    (self.FAILED, str(e), time.time(), job_id, self.RUNNING, self.owner)
+                )
+            finally:
+                self._running.pop(job_id, None)
+                self._cancel_requested.discard(job_id)
+
+    async def _run_job(self, job_id: str):
+        # Background jobs yield the API to interactive uploads and share it round-robin among themselves
+        with api_scope(PRIORITY_BULK, group=job_id):
+            await self._process_job(job_id)
+
+    async def _process_job(self, job_id: str):
+        content, content_type = await self._in_executor(
+            self._fetch, "SELECT content, content_type FROM ocr_jobs WHERE id = ?", (job_id,)
+        )
+        kind = "pdf" if content_type == "application/pdf" else "image"
+        sources = await self.engine.load_pages(content, kind)
+        await self._in_executor(self._execute, "UPDATE ocr_jobs SET pages_total = ?, pages_done = 0"
+                                " WHERE id = ? AND owner = ?", (len(sources), job_id, self.owner))
+
+        pages = []
+        async for page in self.engine.iter_pages(sources, max_concurrency=self.page_concurrency):
+            pages.append({
+                "page_number": page.page_number,
+                "leads": [asdict(lead) for lead in page.leads],
+                "processing_time": page.processing_time,
+            })
+            await self._in_executor(self._execute, "UPDATE ocr_jobs SET pages_done = ? WHERE id = ? AND owner = ?",
+                                    (len(pages), job_id, self.owner))
+
+        pages.sort(key=lambda page: page["page_number"])
+        await self._in_executor(self._complete, job_id, pages)
+        logger.info(f"OCR job {job_id} completed: {len(pages)} page(s)")
+
+    def _complete(self, job_id: str, pages: List[Dict[str, Any]]):
+        # Drop the upload once the result is stored; it is no longer needed. The owner check keeps a
+        # job that was requeued as stale (and may be running elsewhere) from being completed twice
+        self._execute(
+            "UPDATE ocr_jobs SET status = ?, result = ?, content = NULL, finished_at = ?"
+            " WHERE id = ? AND status = ? AND owner = ?",
+            (self.COMPLETED, json.dumps({"pages": pages}, ensure_ascii=False), time.time(), job_id, self.RUNNING,
+             self.owner)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return job counts by status (as of the last heartbeat) and the concurrency settings for health reporting"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "page_concurrency": self.page_concurrency,
+            "max_queued": self.max_queued,
+            "owner": self.owner,
+            "retention": self.retention,
+            "running": len(self._running),
+            "jobs": self._counts,
+            "jobs_counted_at": self._counted_at,
+        }
@@ -0,0 +1,576 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import io
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from routers.lazy_imports import is_loaded, lazy_import, load_modules
+
+# Imaging libraries load on first use, so processes that never handle a page never import them
+fitz = lazy_import("fitz")  # PyMuPDF
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# Per-stage (seconds, output bytes) measurements collected while preparing one page
+StageReport = Dict[str, Tuple[float, int]]
+
+
+@dataclass
+class PageSource:
+    """
+    One page of an uploaded document.
+
+    Pages carry the raw upload rather than pixels so each stage can render the
+    page in memory inside the worker process that needs it.
+    """
+    content: bytes
+    kind: str  # "pdf" or "image"
+    page_number: int  # 1-based
+    text: Optional[str] = None  # embedded text layer, when the page has a usable one
+    fingerprint: Optional[str] = None  # content hash used as the result cache key
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """How a page should be rasterized and preprocessed for the backend that consumes it"""
+    max_dimension: Optional[int] = None  # fit the longest side to this many pixels
+    dpi: int = 300  # used when max_dimension is not set
+    grayscale: bool = False
+    clip_to_content: bool = False  # crop empty page margins before rendering
+    margin: float = 12.0  # points kept around the content box when clipping
+    crop_borders: bool = False  # trim blank margins and dark scanner edges from the pixels
+    deskew: bool = False  # straighten text lines tilted by up to MAX_SKEW_DEGREES
+    target_x_height: Optional[int] = None  # downscale so lowercase letters are about this many pixels tall
+    binarize: bool = False  # emit a 1-bit image using a locally adaptive threshold
+    byte_budget: Optional[int] = None  # encoded size an API payload should fit in (None: plain JPEG q85)
+    image_formats: Tuple[str, ...] = ("JPEG",)  # PIL formats tried for API payloads, e.g. ("WEBP", "JPEG")
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    """A page image encoded for the vision API, kept as base64 bytes until the request body is built"""
+    base64_data: bytes
+    mime_type: str = "image/jpeg"
+
+
+# Vision API payloads are downscaled to 1024px anyway, so render at that size directly
+API_RENDER_PROFILE = RenderProfile(max_dimension=1024, crop_borders=True, byte_budget=75_000)
+
+# Tesseract works best around 300 DPI on clean, straight, black-on-white text
+# with an x-height of roughly 20 pixels
+OCR_RENDER_PROFILE = RenderProfile(dpi=300, grayscale=True, crop_borders=True, deskew=True,
+                                   target_x_height=20, binarize=True)
+
+# Page analysis (thresholds, borders, skew, line height) runs on a strided sample of about this many pixels
+ANALYSIS_PIXELS = 1_000_000
+MAX_SKEW_DEGREES = 5.0
+MIN_SKEW_DEGREES = 0.3  # smaller tilts are left alone rather than paying for a rotation
+
+# Quality range and smallest longest side the budgeted API encoder will go down to
+MAX_ENCODE_QUALITY = 85
+MIN_ENCODE_QUALITY = 40
+MIN_ENCODE_DIMENSION = 640
+# Pages where fewer than this fraction of pixels carry visible color are sent as grayscale
+COLOR_PIXEL_FRACTION = 0.01
+
+
+def count_pages(content: bytes, kind: str) -> int:
+    """
+    Count the pages in an upload without rendering them
+
+    Args:
+        content: Raw bytes of the upload
+        kind: "pdf" or "image"
+
+    Returns:
+        Number of pages (always 1 for images)
+    """
+    if kind != "pdf":
+        return 1
+    with fitz.open(stream=content, filetype="pdf") as pdf_document:
+        return len(pdf_document)
+
+
+def extract_text_layers(content: bytes, kind: str, min_chars: int = 32) -> List[Optional[str]]:
+    """
+    Read the embedded text layer of every page of an upload
+
+    Exported contact lists and signature PDFs already carry their text, so
+    those pages never need to be rasterized or OCR'd.
+
+    Args:
+        content: Raw bytes of the upload
+        kind: "pdf" or "image"
+        min_chars: Minimum non-whitespace characters for a text layer to count as usable
+
+    Returns:
+        One entry per page: the page text, or None for image-only pages
+    """
+    if kind != "pdf":
+        return [None]
+
+    texts = []
+    with fitz.open(stream=content, filetype="pdf") as pdf_document:
+        for page in pdf_document:
+            text = page.get_text("text", sort=True)
+            usable = sum(1 for char in text if not char.isspace()) >= min_chars
+            texts.append(text if usable else None)
+    return texts
+
+
+def fingerprint_pages(content: bytes, kind: str) -> List[str]:
+    """
+    Hash the content of every page of an upload without rendering it
+
+    A PDF page's fingerprint covers its geometry, content stream and the raw
+    streams of the images, fonts and form objects it draws, which together
+    determine the rendered page. Image uploads hash the whole file.
+
+    Args:
+        content: Raw bytes of the upload
+        kind: "pdf" or "image"
+
+    Returns:
+        One hex digest per page
+    """
+    if kind != "pdf":
+        return [hashlib.sha256(content).hexdigest()]
+
+    fingerprints = []
+    with fitz.open(stream=content, filetype="pdf") as pdf_document:
+        for page in pdf_document:
+            digest = hashlib.sha256(f"{page.rect}|{page.rotation}".encode("utf-8"))
+            digest.update(page.read_contents())
+
+            xrefs = {image[0] for image in page.get_images(full=True)}
+            xrefs |= {font[0] for font in page.get_fonts(full=True)}
+            xrefs |= {xobject[0] for xobject in page.get_xobjects()}
+            for xref in sorted(xrefs):
+                if xref > 0 and pdf_document.xref_is_stream(xref):
+                    digest.update(pdf_document.xref_stream_raw(xref))
+            fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+
+def content_rect(page: "fitz.Page", margin: float) -> "fitz.Rect":
+    """
+    Bounding box of everything drawn on a page, padded by margin points
+
+    Args:
+        page: PyMuPDF page
+        margin: Padding around the content in points
+
+    Returns:
+        Clip rectangle, or the full page if it has no content
+    """
+    rect = fitz.Rect()
+    for _, bbox in page.get_bboxlog():
+        rect |= bbox
+    if rect.is_empty:
+        return page.rect
+    return (rect + (-margin, -margin, margin, margin)) & page.rect
+
+
+def render_page(source: PageSource, profile: RenderProfile = OCR_RENDER_PROFILE) -> Image.Image:
+    """
+    Materialize a page as a PIL image without touching the disk
+
+    PDF pages are rasterized at the resolution the consuming backend needs and
+    go straight from the pixmap's sample buffer into PIL, skipping the PNG
+    encode/decode round trip. Image uploads are decoded as-is.
+
+    Args:
+        source: Page to render
+        profile: Target resolution and colorspace for PDF pages
+
+    Returns:
+        PIL image of the page
+    """
+    if source.kind == "pdf":
+        with fitz.open(stream=source.content, filetype="pdf") as pdf_document:
+            page = pdf_document[source.page_number - 1]
+            clip = content_rect(page, profile.margin) if profile.clip_to_content else page.rect
+
+            if profile.max_dimension:
+                # Stay just under the limit so rounding never produces an oversized pixmap
+                zoom = (profile.max_dimension - 0.5) / max(clip.width, clip.height)
+            else:
+                zoom = profile.dpi / 72
+
+            colorspace = fitz.csGRAY if profile.grayscale else fitz.csRGB
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, clip=clip, alpha=False)
+            mode = "L" if profile.grayscale else "RGB"
+            return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+    image = Image.open(io.BytesIO(source.content))
+    image.load()
+    return image
+
+
+def otsu_threshold(pixels: np.ndarray) -> int:
+    """
+    Global threshold separating ink from background in a grayscale array
+
+    Args:
+        pixels: 8-bit grayscale pixels
+
+    Returns:
+        Threshold level; values below it are ink
+    """
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weight_dark = np.cumsum(histogram)
+    weight_light = weight_dark[-1] - weight_dark
+    cumulative = np.cumsum(histogram * levels)
+    mean_dark = cumulative / np.maximum(weight_dark, 1)
+    mean_light = (cumulative[-1] - cumulative) / np.maximum(weight_light, 1)
+    between_variance = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.argmax(between_variance)) + 1
+
+
+def _analysis_sample(image: Image.Image) -> Tuple[np.ndarray, int]:
+    """Box-averaged grayscale sample of about ANALYSIS_PIXELS and the reduction factor used"""
+    gray = image if image.mode == "L" else image.convert("L")
+    step = max(1, math.ceil(math.sqrt(gray.width * gray.height / ANALYSIS_PIXELS)))
+    if step > 1:
+        gray = gray.reduce(step)
+    return np.asarray(gray), step
+
+
+def _ink_span(fraction: np.ndarray, min_ink: float = 0.002, edge_dark: float = 0.3) -> Optional[Tuple[int, int]]:
+    """First and last index holding ink, ignoring dark scanner edges touching the border and specks"""
+    light = np.flatnonzero(fraction <= edge_dark)
+    if light.size == 0:
+        return None
+    start, end = int(light[0]), int(light[-1]) + 1
+    indices = np.flatnonzero(fraction[start:end] > min_ink)
+    if indices.size == 0:
+        return None
+    return start + int(indices[0]), start + int(indices[-1]) + 1
+
+
+def border_box(ink: np.ndarray, step: int, size: Tuple[int, int], margin: int = 16) -> Tuple[int, int, int, int]:
+    """
+    Bounding box of the ink on a page, in full-resolution pixels
+
+    Args:
+        ink: Boolean ink mask of the analysis sample
+        step: Stride between the sample and the full image
+        size: Full image (width, height)
+        margin: Pixels of background kept around the ink
+
+    Returns:
+        (left, top, right, bottom) crop box; the whole image if it holds no ink
+    """
+    width, height = size
+    # Columns first so dark vertical scanner edges don't mark every row as inked, then
+    # rows within those columns, then columns again within the rows
+    columns = _ink_span(ink.mean(axis=0))
+    if columns is None:
+        return 0, 0, width, height
+    rows = _ink_span(ink[:, columns[0]:columns[1]].mean(axis=1))
+    if rows is None:
+        return 0, 0, width, height
+    columns = _ink_span(ink[rows[0]:rows[1]].mean(axis=0)) or columns
+    return (max(0, columns[0] * step - margin), max(0, rows[0] * step - margin),
+            min(width, columns[1] * step + margin), min(height, rows[1] * step + margin))
+
+
+def estimate_skew(ink: np.ndarray, max_points: int = 20_000) -> float:
+    """
+    Estimate the tilt of text lines by maximizing the sharpness of the row profile
+
+    Ink pixels are sheared by each candidate angle and binned by row; the angle
+    whose bins are most concentrated lines the text up horizontally. All
+    candidate angles are scored with a single bincount.
+
+    Args:
+        ink: Boolean ink mask
+        max_points: Ink pixels sampled for the estimate
+
+    Returns:
+        Skew in degrees (positive when lines descend to the right)
+    """
+    ys, xs = np.nonzero(ink)
+    if ys.size < 200:
+        return 0.0
+    stride = max(1, ys.size // max_points)
+    ys = ys[::stride].astype(np.float32)
+    xs = xs[::stride].astype(np.float32)
+    xs -= xs.mean()
+
+    def best_angle(angles: np.ndarray) -> float:
+        slopes = np.tan(np.radians(angles)).astype(np.float32)[:, None]
+        rows = np.rint(ys[None, :] - xs[None, :] * slopes).astype(np.int64)
+        rows -= rows.min()
+        span = int(rows.max()) + 1
+        offsets = np.arange(len(angles), dtype=np.int64)[:, None] * span
+        counts = np.bincount((rows + offsets).ravel(), minlength=span * len(angles)).reshape(len(angles), span)
+        scores = (counts.astype(np.float64) ** 2).sum(axis=1)
+        return float(angles[int(np.argmax(scores))])
+
+    coarse = best_angle(np.arange(-MAX_SKEW_DEGREES, MAX_SKEW_DEGREES + 0.25, 0.5))
+    return best_angle(np.arange(coarse - 0.5, coarse + 0.55, 0.1))
+
+
+def estimate_x_height(ink: np.ndarray) -> Optional[float]:
+    """
+    Estimate the x-height of the text from the heights of inked row bands
+
+    Args:
+        ink: Boolean ink mask of a deskewed page
+
+    Returns:
+        Approximate x-height in sample pixels, or None if no text lines were found
+    """
+    profile = ink.sum(axis=1)
+    if not profile.any():
+        return None
+    inked = np.concatenate(([False], profile > profile.max() * 0.02, [False]))
+    edges = np.flatnonzero(np.diff(inked.astype(np.int8)))
+    heights = edges[1::2] - edges[0::2]
+    # Bands taller than an eighth of the page are merged lines or graphics, not text
+    heights = heights[(heights >= 2) & (heights < ink.shape[0] / 8)]
+    if heights.size < 3:
+        return None
+    # A text line band spans ascenders to descenders, roughly twice the x-height
+    return float(np.median(heights)) / 2
+
+
+def adaptive_binarize(image: Image.Image, block: int = 8, window_blocks: int = 5,
+                      sensitivity: float = 0.15) -> Image.Image:
+    """
+    Convert a grayscale page to 1-bit with a locally adaptive (Bradley) threshold
+
+    Local means are computed on a block-averaged copy of the page with an
+    integral image and each pixel is compared with its block's threshold by
+    broadcasting, so uneven lighting and shadows don't swallow text.
+
+    Args:
+        image: Grayscale page
+        block: Block size in pixels used for the local means
+        window_blocks: Neighbourhood width in blocks
+        sensitivity: How much darker than the local mean a pixel must be to count as ink
+
+    Returns:
+        Mode "1" image with black text on white
+    """
+    small = np.asarray(image.reduce(block)).astype(np.int64)
+    height, width = small.shape
+
+    integral = np.zeros((height + 1, width + 1), dtype=np.int64)
+    integral[1:, 1:] = small.cumsum(axis=0).cumsum(axis=1)
+    radius = window_blocks // 2
+    y0 = np.clip(np.arange(height) - radius, 0, height)
+    y1 = np.clip(np.arange(height) + radius + 1, 0, height)
+    x0 = np.clip(np.arange(width) - radius, 0, width)
+    x1 = np.clip(np.arange(width) + radius + 1, 0, width)
+    sums = (integral[y1][:, x1] - integral[y0][:, x1] - integral[y1][:, x0] + integral[y0][:, x0])
+    counts = (y1 - y0)[:, None] * (x1 - x0)[None, :]
+
+    local_threshold = (sums / counts * (1 - sensitivity)).astype(np.uint8)
+
+    # Pad the page to whole blocks so it can be viewed as (rows, block, columns, block)
+    pixels = np.asarray(image)
+    if pixels.shape != (height * block, width * block):
+        padded = np.full((height * block, width * block), 255, dtype=np.uint8)
+        padded[:image.height, :image.width] = pixels
+        pixels = padded
+    blocks = pixels.reshape(height, block, width, block)
+    light = (blocks >= local_threshold[:, None, :, None]).reshape(height * block, width * block)
+    return Image.fromarray(np.ascontiguousarray(light[:image.height, :image.width]))
+
+
+def optimize_image(image: Image.Image, profile: RenderProfile = OCR_RENDER_PROFILE) -> Image.Image:
+    """
+    Optimize image for better OCR results
+
+    Grayscale conversion, border cropping, deskewing, downscaling to the target
+    x-height and adaptive binarization run as enabled by the profile. Page
+    analysis uses a box-averaged sample of about ANALYSIS_PIXELS, and
+    full-resolution work is limited to PIL's crop, resize and rotate plus one
+    vectorized threshold pass.
+
+    Args:
+        image: Page image
+        profile: Preprocessing steps to apply
+
+    Returns:
+        Optimized image (RGB, 8-bit grayscale or 1-bit)
+    """
+    # Convert to RGB if necessary (grayscale renders are kept single-channel)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if profile.grayscale or profile.binarize:
+        image = image.convert('L')
+    if not (profile.crop_borders or profile.deskew or profile.target_x_height or profile.binarize):
+        return image
+
+    sample, step = _analysis_sample(image)
+    ink = sample < otsu_threshold(sample)
+
+    if profile.crop_borders:
+        box = border_box(ink, step, image.size)
+        if box != (0, 0) + image.size:
+            image = image.crop(box)
+            ink = ink[box[1] // step:-(-box[3] // step), box[0] // step:-(-box[2] // step)]
+
+    # The rotation itself is applied last, to the smallest version of the page
+    angle = 0.0
+    if profile.deskew:
+        angle = estimate_skew(ink)
+        if abs(angle) < MIN_SKEW_DEGREES:
+            angle = 0.0
+        elif profile.target_x_height:
+            ink = np.asarray(Image.fromarray(ink).rotate(angle, resample=Image.NEAREST, expand=True))
+
+    if profile.target_x_height:
+        x_height = estimate_x_height(ink)
+        if x_height is not None and x_height * step > profile.target_x_height * 1.25:
+            scale = profile.target_x_height / (x_height * step)
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, Image.BOX)
+
+    if profile.binarize:
+        image = adaptive_binarize(image)
+
+    if angle:
+        # Nearest-neighbour keeps 1-bit pages 1-bit and is plenty for tilts of a few degrees
+        resample = Image.NEAREST if image.mode == '1' else Image.BILINEAR
+        white = {'1': 1, 'L': 255}.get(image.mode, (255, 255, 255))
+        image = image.rotate(angle, resample=resample, expand=True, fillcolor=white)
+
+    return image
+
+
+def is_effectively_grayscale(image: Image.Image) -> bool:
+    """True when almost no pixels of an RGB page carry visible color"""
+    if image.mode != "RGB":
+        return True
+    sample = image.reduce(max(1, round(math.sqrt(image.width * image.height / 250_000))))
+    # Per-channel planes are far faster to reduce than an axis of the interleaved array
+    red, green, blue = (np.asarray(channel) for channel in sample.split())
+    spread = np.maximum(np.maximum(red, green), blue) - np.minimum(np.minimum(red, green), blue)
+    return np.count_nonzero(spread > 32) < spread.size * COLOR_PIXEL_FRACTION
+
+
+def _encode_bytes(image: Image.Image, image_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
+
+
+def _fit_quality(image: Image.Image, image_format: str, budget: int) -> Tuple[Optional[bytes], bytes]:
+    """
+    Binary-search the highest quality whose encoding fits the budget
+
+    Returns:
+        (best fitting encoding or None, lowest-quality encoding tried)
+    """
+    lowest = _encode_bytes(image, image_format, MIN_ENCODE_QUALITY)
+    if len(lowest) > budget:
+        return None, lowest
+    best, low, high = lowest, MIN_ENCODE_QUALITY + 1, MAX_ENCODE_QUALITY - 1
+    # Four probes get within ~3 quality steps of the best fit, which is all the precision that matters
+    for _ in range(4):
+        if low > high:
+            break
+        quality = (low + high) // 2
+        data = _encode_bytes(image, image_format, quality)
+        if len(data) <= budget:
+            best, low = data, quality + 1
+        else:
+            high = quality - 1
+    return best, lowest
+
+
+def encode_image(image: Image.Image, profile: RenderProfile = API_RENDER_PROFILE) -> EncodedImage:
+    """
+    Encode a page for the vision API within the profile's byte budget
+
+    Nearly colorless pages are encoded as grayscale. Each allowed format is
+    tried at the top quality and the smallest kept; if it exceeds the budget,
+    the quality is binary-searched, and if even the lowest quality is too big
+    the page is downscaled by the estimated factor (never below
+    MIN_ENCODE_DIMENSION) and searched again. Without a budget the page is a
+    plain JPEG at quality 85.
+
+    Args:
+        image: Page image
+        profile: Supplies max_dimension, byte_budget and image_formats
+
+    Returns:
+        Base64 payload and MIME type
+    """
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if profile.max_dimension and max(image.size) > profile.max_dimension:
+        scale = profile.max_dimension / max(image.size)
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.Resampling.LANCZOS)
+
+    if profile.byte_budget is None:
+        return EncodedImage(base64.b64encode(_encode_bytes(image, "JPEG", MAX_ENCODE_QUALITY)))
+
+    if is_effectively_grayscale(image):
+        image = image.convert('L')
+    image_format, data = min(((image_format, _encode_bytes(image, image_format, MAX_ENCODE_QUALITY))
+                              for image_format in profile.image_formats), key=lambda candidate: len(candidate[1]))
+
+    while len(data) > profile.byte_budget:
+        fitted, lowest = _fit_quality(image, image_format, profile.byte_budget)
+        if fitted is not None:
+            data = fitted
+            break
+        data = lowest
+        if max(image.size) <= MIN_ENCODE_DIMENSION:
+            break  # the smallest legible version is over budget; send it anyway
+        # Encoded size scales roughly with pixel count
+        scale = max(math.sqrt(profile.byte_budget / len(lowest)) * 0.95, MIN_ENCODE_DIMENSION / max(image.size))
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.Resampling.LANCZOS)
+        data = _encode_bytes(image, image_format, MAX_ENCODE_QUALITY)
+
+    return EncodedImage(base64.b64encode(data), f"image/{image_format.lower()}")
+
+
+def payload_size(value: Any) -> int:
+    """Approximate in-memory size of a stage output in bytes"""
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, EncodedImage):
+        return len(value.base64_data)
+    # Without Pillow loaded there can be no image to size, and checking must not load it
+    if is_loaded("PIL.Image") and isinstance(value, Image.Image):
+        if value.mode == "1":
+            return (value.width + 7) // 8 * value.height
+        return value.width * value.height * len(value.getbands())
+    return 0
+
+
+def timed_stage(report: StageReport, stage: str, func: Callable, *args):
+    """
+    Run one pipeline stage and record its duration and output size
+
+    Args:
+        report: Report to add the measurement to
+        stage: Stage name
+        func: Stage function
+        *args: Positional arguments for func
+
+    Returns:
+        The stage's return value
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    report[stage] = (time.perf_counter() - start, payload_size(result))
+    return result
+
+
+def load_imaging_libraries():
+    """Import PyMuPDF, numpy and Pillow now rather than on the first page (called by warm-up)"""
+    load_modules(fitz, np, Image)
@@ -0,0 +1,348 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+# Priority classes, lowest value served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# Rough token cost of one image in a vision request, used until the response reports real usage
+IMAGE_TOKEN_ESTIMATE = 1000
+
+_api_priority: ContextVar[int] = ContextVar("api_priority", default=PRIORITY_INTERACTIVE)
+_api_group: ContextVar[str] = ContextVar("api_group", default="default")
+
+
+@contextmanager
+def api_scope(priority: int = PRIORITY_INTERACTIVE, group: Optional[str] = None) -> Iterator[None]:
+    """
+    Tag API calls made in this block, and in tasks started from it, with a priority class and fairness group
+
+    Args:
+        priority: PRIORITY_INTERACTIVE or PRIORITY_BULK
+        group: Calls in the same group share one round-robin turn (a fresh group if omitted)
+    """
+    priority_token = _api_priority.set(priority)
+    group_token = _api_group.set(group or uuid.uuid4().hex)
+    try:
+        yield
+    finally:
+        _api_group.reset(group_token)
+        _api_priority.reset(priority_token)
+
+
+class RateLimitedError(Exception):
+    """Raised instead of queueing an API call whose projected wait exceeds its deadline"""
+
+
+def estimate_tokens(data: Dict[str, Any]) -> int:
+    """Estimate the token cost of a chat completion request: ~4 characters per text token plus images and max_tokens"""
+    tokens = 0
+    for message in data.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                tokens += IMAGE_TOKEN_ESTIMATE
+            else:
+                tokens += len(part.get("text") or "") // 4
+    if "response_format" in data:
+        tokens += len(json.dumps(data["response_format"])) // 4
+    return tokens + data.get("max_tokens", 1000)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds from now"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Continuously refilling bucket; the level may go negative when actual usage exceeds an estimate"""
+
+    def __init__(self, per_minute: float, capacity: float):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until amount is available (after refill), assuming nothing else is taken"""
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class _Waiter:
+    __slots__ = ("cost", "priority", "group", "granted", "notify")
+
+    def __init__(self, cost: int, priority: int, group: str, notify: Callable[[], None]):
+        self.cost = cost
+        self.priority = priority
+        self.group = group
+        self.granted = False
+        self.notify = notify
+
+
+class APIRateLimiter:
+    """
+    Process-wide scheduler for calls to a rate-limited API.
+
+    Calls are admitted by two token buckets, one in requests per minute and
+    one in tokens per minute, refilled continuously so the sustained rate
+    stays under the provider's limits without bursting into 429s. Waiting
+    calls are served by priority class and round-robin across fairness groups
+    (one group per upload), so a large import cannot starve other uploads. A
+    429's Retry-After pauses every grant. A call whose projected queue wait
+    exceeds max_wait is rejected up front with RateLimitedError, letting the
+    caller route the page to Tesseract instead of waiting.
+    """
+
+    def __init__(self, requests_per_minute: float = 20, tokens_per_minute: float = 0, burst: Optional[int] = None,
+                 max_wait: float = 10.0, default_retry_after: float = 5.0):
+        """
+        Initialize the limiter
+
+        Args:
+            requests_per_minute: Sustained request rate (0 disables rate limiting)
+            tokens_per_minute: Sustained token rate (0 disables the token bucket)
+            burst: Requests that may start back to back (defaults to a tenth of a minute's worth)
+            max_wait: Longest projected queue wait accepted before a call is rejected, in seconds
+            default_retry_after: Pause after a 429 that carries no Retry-After header, in seconds
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.burst = burst if burst is not None else max(1, int(requests_per_minute // 10))
+        self.max_wait = max_wait
+        self.default_retry_after = default_retry_after
+
+        self._requests = TokenBucket(requests_per_minute, self.burst) if requests_per_minute > 0 else None
+        self._tokens = (TokenBucket(tokens_per_minute, max(tokens_per_minute / 10, IMAGE_TOKEN_ESTIMATE * 2))
+                        if tokens_per_minute > 0 else None)
+        self._cond = threading.Condition()
+        self._queues: Dict[int, "OrderedDict[str, Deque[_Waiter]]"] = {}
+        self._waiting = 0
+        self._paused_until = 0.0
+        self._dispatcher: Optional[threading.Thread] = None
+        self._stats = {"granted": 0, "queued": 0, "rejected": 0, "expired": 0, "rate_limited": 0}
+
+    @classmethod
+    def from_env(cls) -> "APIRateLimiter":
+        """Build a limiter from the OPENROUTER_REQUESTS_PER_MINUTE/TOKENS_PER_MINUTE/BURST/QUEUE_DEADLINE variables"""
+        burst = os.getenv("OPENROUTER_BURST")
+        return cls(
+            requests_per_minute=float(os.getenv("OPENROUTER_REQUESTS_PER_MINUTE", "20")),
+            tokens_per_minute=float(os.getenv("OPENROUTER_TOKENS_PER_MINUTE", "0")),
+            burst=int(burst) if burst else None,
+            max_wait=float(os.getenv("OPENROUTER_QUEUE_DEADLINE", "10")),
+        )
+
+    def __reduce__(self):
+        # Worker processes get a limiter with the same settings and their own buckets
+        return (self.__class__, (self.requests_per_minute, self.tokens_per_minute, self.burst, self.max_wait,
+                                 self.default_retry_after))
+
+    @property
+    def enabled(self) -> bool:
+        return self._requests is not None
+
+    def _wait_for(self, requests: float, tokens: float, now: float) -> float:
+        """Seconds until the buckets can cover requests and tokens (callers hold the lock)"""
+        self._requests.refill(now)
+        wait = max(self._paused_until - now, self._requests.time_until(requests))
+        if self._tokens is not None:
+            self._tokens.refill(now)
+            wait = max(wait, self._tokens.time_until(tokens))
+        return wait
+
+    def _take(self, waiter: _Waiter):
+        self._requests.level -= 1
+        if self._tokens is not None:
+            self._tokens.level -= waiter.cost
+        waiter.granted = True
+        self._stats["granted"] += 1
+
+    def _projected_wait(self, cost: int, priority: int, now: float) -> float:
+        """Estimate the queue wait of a new call: everything at its priority or higher goes first"""
+        requests_ahead = tokens_ahead = 0
+        for queue_priority, groups in self._queues.items():
+            if queue_priority <= priority:
+                for waiters in groups.values():
+                    requests_ahead += len(waiters)
+                    tokens_ahead += sum(waiter.cost for waiter in waiters)
+        return self._wait_for(requests_ahead + 1, tokens_ahead + min(cost, self._token_capacity()), now)
+
+    def _token_capacity(self) -> float:
+        return self._tokens.capacity if self._tokens is not None else float("inf")
+
+    def _head(self) -> Optional[_Waiter]:
+        for priority in sorted(self._queues):
+            groups = self._queues[priority]
+            if groups:
+                return groups[next(iter(groups))][0]
+        return None
+
+    def _remove(self, waiter: _Waiter):
+        groups = self._queues.get(waiter.priority, {})
+        waiters = groups.get(waiter.group)
+        if waiters is None or waiter not in waiters:
+            return
+        is_turn = waiters[0] is waiter and next(iter(groups)) == waiter.group
+        waiters.remove(waiter)
+        self._waiting -= 1
+        if not waiters:
+            del groups[waiter.group]
+        elif is_turn:
+            # The group used its turn; the next group in the round goes first
+            groups.move_to_end(waiter.group)
+        if not groups:
+            self._queues.pop(waiter.priority, None)
+
+    def _dispatch(self):
+        """Grant queued calls in priority and round-robin order as the buckets refill"""
+        with self._cond:
+            while True:
+                waiter = self._head()
+                if waiter is None:
+                    self._cond.wait()
+                    continue
+                wait = self._wait_for(1, min(waiter.cost, self._token_capacity()), time.monotonic())
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                self._remove(waiter)
+                self._take(waiter)
+                waiter.notify()
+
+    def _enqueue(self, cost: int, notify: Callable[[], None]) -> _Waiter:
+        """Grant a call immediately, queue it, or reject it when its projected wait exceeds max_wait"""
+        priority, group = _api_priority.get(), _api_group.get()
+        waiter = _Waiter(cost, priority, group, notify)
+        now = time.monotonic()
+
+        wait = self._projected_wait(cost, priority, now)
+        if wait <= 0 and self._head() is None:
+            self._take(waiter)
+            return waiter
+        if wait > self.max_wait:
+            self._stats["rejected"] += 1
+            raise RateLimitedError(f"API queue wait of {wait:.1f}s exceeds the {self.max_wait:.0f}s deadline")
+
+        self._queues.setdefault(priority, OrderedDict()).setdefault(group, deque()).append(waiter)
+        self._waiting += 1
+        self._stats["queued"] += 1
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch, name="api-rate-limiter", daemon=True)
+            self._dispatcher.start()
+        self._cond.notify()
+        return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Drop a call that stopped waiting; returns True if it had been granted in the meantime"""
+        with self._cond:
+            if waiter.granted:
+                return True
+            self._remove(waiter)
+            self._stats["expired"] += 1
+            self._cond.notify()
+            return False
+
+    def acquire(self, cost: int = 0):
+        """
+        Block until a call costing cost tokens may start
+
+        Raises:
+            RateLimitedError: If the call would wait longer than max_wait
+        """
+        if not self.enabled:
+            return
+        granted = threading.Event()
+        with self._cond:
+            waiter = self._enqueue(cost, granted.set)
+        if waiter.granted or granted.wait(self.max_wait):
+            return
+        if not self._abandon(waiter):
+            raise RateLimitedError(f"API call waited longer than the {self.max_wait:.0f}s deadline")
+
+    async def acquire_async(self, cost: int = 0):
+        """Async variant of acquire; cancelling the caller removes it from the queue"""
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def notify():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        with self._cond:
+            waiter = self._enqueue(cost, notify)
+        if waiter.granted:
+            return
+        try:
+            await asyncio.wait_for(granted, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                raise RateLimitedError(f"API call waited longer than the {self.max_wait:.0f}s deadline")
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """Correct the token bucket once a response reports its real usage"""
+        if self._tokens is None or actual is None:
+            return
+        with self._cond:
+            self._tokens.level -= actual - estimated
+
+    def penalize(self, retry_after: Optional[float]) -> float:
+        """
+        Pause all grants after a 429
+
+        Args:
+            retry_after: Seconds from the Retry-After header, or None to use default_retry_after
+
+        Returns:
+            The pause applied, in seconds
+        """
+        pause = retry_after if retry_after is not None else self.default_retry_after
+        with self._cond:
+            self._stats["rate_limited"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            if self._requests is not None:
+                # Whatever burst was left evidently exceeds the provider's window
+                self._requests.level = min(self._requests.level, 0)
+            self._cond.notify()
+        return pause
+
+    def stats(self) -> Dict[str, Any]:
+        """Return limits, queue depth and counters for health reporting"""
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "max_wait": self.max_wait,
+                "waiting": self._waiting,
+                "paused_for": max(0.0, self._paused_until - now),
+                **self._stats,
+            }
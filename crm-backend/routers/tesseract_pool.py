@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from routers.lazy_imports import lazy_import
+
+# Loaded on first recognition, so only processes that run OCR pay for importing them
+pytesseract = lazy_import("pytesseract")
+Image = lazy_import("PIL.Image")
+
+# In-process Tesseract binding; without it every page falls back to a pytesseract subprocess
+try:
+    tesserocr = lazy_import("tesserocr")
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    tesserocr = None
+    TESSEROCR_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# The pytesseract fallback is logged once per process, not once per pool
+_fallback_warned = False
+
+
+def _warn_fallback():
+    global _fallback_warned
+    if not _fallback_warned:
+        _fallback_warned = True
+        logger.warning("tesserocr is not installed: OCR falls back to one tesseract subprocess per page "
+                       "(pip install -r requirements-ocr-fast.txt)")
+
+
+class TesseractPool:
+    """
+    Pool of long-lived Tesseract engines shared by OCR callers.
+
+    With tesserocr installed each engine is an in-process TessBaseAPI that
+    loads its language data once and recognizes PIL images straight from
+    memory, so a page costs only its recognition time. Engines are created
+    lazily up to size and each is used by one thread at a time. Without
+    tesserocr, pages go through pytesseract with the same languages and
+    page segmentation mode, and size bounds the concurrent subprocesses.
+    """
+
+    def __init__(self, size: int = 4, languages: str = "eng", psm: int = 3, tessdata_path: Optional[str] = None):
+        """
+        Initialize the pool
+
+        Args:
+            size: Maximum number of engines (or concurrent subprocesses)
+            languages: Tesseract language codes joined with "+", e.g. "eng+deu"
+            psm: Tesseract page segmentation mode
+            tessdata_path: Directory holding the traineddata files (Tesseract's default if omitted)
+        """
+        self.size = max(1, size)
+        self.languages = languages
+        self.psm = psm
+        self.tessdata_path = tessdata_path
+        self.backend = "tesserocr" if TESSEROCR_AVAILABLE else "pytesseract"
+        if not TESSEROCR_AVAILABLE:
+            _warn_fallback()
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._engines = []
+        self._stats = {"pages": 0, "recognition_seconds": 0.0, "errors": 0}
+
+    @classmethod
+    def from_env(cls) -> "TesseractPool":
+        """Build a pool from OCR_TESSERACT_POOL_SIZE, OCR_TESSERACT_LANG, OCR_TESSERACT_PSM and TESSDATA_PREFIX"""
+        return cls(
+            size=int(os.getenv("OCR_TESSERACT_POOL_SIZE", "4")),
+            languages=os.getenv("OCR_TESSERACT_LANG", "eng"),
+            psm=int(os.getenv("OCR_TESSERACT_PSM", "3")),
+            tessdata_path=os.getenv("TESSDATA_PREFIX") or None,
+        )
+
+    def __reduce__(self):
+        # Worker processes get a pool with the same settings and their own engines
+        return (self.__class__, (self.size, self.languages, self.psm, self.tessdata_path))
+
+    def _create_engine(self):
+        kwargs = {"lang": self.languages, "psm": self.psm}
+        if self.tessdata_path:
+            kwargs["path"] = self.tessdata_path
+        engine = tesserocr.PyTessBaseAPI(**kwargs)
+        with self._lock:
+            self._engines.append(engine)
+        return engine
+
+    @contextmanager
+    def _engine(self):
+        self._slots.acquire()
+        try:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                engine = self._create_engine()
+            try:
+                yield engine
+            finally:
+                engine.Clear()
+                self._idle.put(engine)
+        finally:
+            self._slots.release()
+
+    def warm_up(self):
+        """Recognize a tiny blank image so language data and engine state are loaded ahead of the first page"""
+        blank = Image.new("L", (64, 32), 255)
+        if self.backend == "tesserocr":
+            with self._engine() as engine:
+                engine.SetImage(blank)
+                engine.GetUTF8Text()
+        else:
+            # Each pytesseract call is a new process; this still pulls the binary and traineddata into the page cache
+            with self._slots:
+                pytesseract.image_to_string(blank, lang=self.languages, config=f"--psm {self.psm}")
+
+    def image_to_string(self, image: Image.Image) -> str:
+        """
+        Recognize the text in an in-memory image
+
+        Args:
+            image: PIL image of the page
+
+        Returns:
+            Extracted text
+        """
+        start = time.perf_counter()
+        try:
+            if self.backend == "tesserocr":
+                with self._engine() as engine:
+                    engine.SetImage(image)
+                    text = engine.GetUTF8Text()
+            else:
+                with self._slots:
+                    text = pytesseract.image_to_string(image, lang=self.languages, config=f"--psm {self.psm}")
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+
+        with self._lock:
+            self._stats["pages"] += 1
+            self._stats["recognition_seconds"] += time.perf_counter() - start
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the backend, engine count and recognition counters"""
+        with self._lock:
+            pages = self._stats["pages"]
+            return {
+                **self._stats,
+                "backend": self.backend,
+                "size": self.size,
+                "engines": len(self._engines),
+                "languages": self.languages,
+                "psm": self.psm,
+                "avg_recognition_seconds": self._stats["recognition_seconds"] / pages if pages else 0.0,
+            }
+
+    def close(self):
+        """Release every engine's language data"""
+        with self._lock:
+            engines, self._engines = self._engines, []
+        for engine in engines:
+            engine.End()
+        self._idle = queue.LifoQueue()
@@ -10,6 +10,13 @@ import { useAI } from '@/providers/AIProvider';
 import { useCRMStore } from '@/store/crmStore';
 import InlineCalendar from '@/components/Calendar';
 import { toast } from 'sonner';
+import { endLLMSession } from '@/lib/api';
+
+function newSessionId() {
+  return typeof crypto !== 'undefined' && crypto.randomUUID
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
 
 interface Message {
   id: string;
@@ -30,6 +37,16 @@ export default function AIChat() {
   const { processQuery } = useAI();
   const { selectedLead,addMeeting  } = useCRMStore();
   const [showCalendar, setShowCalendar] = useState<string | null>(null);
+  // The backend keeps the conversation for this id, so each request carries only the new message
+  const sessionIdRef = useRef(newSessionId());
+
+  useEffect(() => {
+    const sessionId = sessionIdRef.current;
+    return () => {
+      endLLMSession(sessionId);
+      sessionIdRef.current = newSessionId();
+    };
+  }, [selectedLead?.id]);
 
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -146,15 +163,10 @@ export default function AIChat() {
 
 
 
-      const conversationHistory = messages.map(msg => ({
-        role: msg.role,
-        content: msg.content
-      }));
-
       // Simulate AI thinking delay for better UX
       await new Promise(resolve => setTimeout(resolve, 1000));
 
-      const aiResponse = await processQuery(action, leadData, conversationHistory);
+      const aiResponse = await processQuery(action, leadData, sessionIdRef.current);
 
       setIsTyping(false);
 
@@ -218,15 +230,10 @@ export default function AIChat() {
         }
         : null;
 
-      const conversationHistory = messages.map(msg => ({
-        role: msg.role,
-        content: msg.content
-      }));
-
       // Simulate AI thinking delay for better UX
       await new Promise(resolve => setTimeout(resolve, 1000));
 
-      const aiResponse = await processQuery(inputValue, leadData, conversationHistory);
+      const aiResponse = await processQuery(inputValue, leadData, sessionIdRef.current);
 
       setIsTyping(false);
 
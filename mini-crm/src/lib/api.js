@@ -375,14 +375,33 @@ export async function testOCRAPI() {
   return await response.json();
 }
 
-export async function interactWithLLM(query, lead) {
-  const res = await fetch(`${PYTHON_API_BASE}/llm`, {
-    method: "POST",
-    headers: {
-      "Content-Type": "application/json",
-    },
-    body: JSON.stringify({ query, lead }),
-  });
+// Lead last sent for each LLM session; the backend keeps it, so it is only re-sent when it changes
+const sessionLeads = new Map();
+
+export async function interactWithLLM(query, lead, sessionId) {
+  const leadJson = JSON.stringify(lead);
+  const send = (includeLead) =>
+    fetch(`${PYTHON_API_BASE}/llm`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ query, sessionId, lead: includeLead ? lead : undefined }),
+    });
+
+  let res = await send(!sessionId || sessionLeads.get(sessionId) !== leadJson);
+  if (res.status === 409) {
+    // The session expired on the server: start it again with the lead
+    res = await send(true);
+  }
   if (!res.ok) throw new Error("LLM interaction failed");
+  if (sessionId) sessionLeads.set(sessionId, leadJson);
   return await res.json();
+}
+
+export async function endLLMSession(sessionId) {
+  sessionLeads.delete(sessionId);
+  await fetch(`${PYTHON_API_BASE}/llm/sessions/${encodeURIComponent(sessionId)}`, {
+    method: "DELETE",
+  }).catch(() => {});
 }
\ No newline at end of file
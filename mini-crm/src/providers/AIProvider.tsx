@@ -4,8 +4,8 @@ import { createContext, useContext } from 'react';
 import { interactWithLLM } from '@/lib/api';
 
 const AIContext = createContext({
-  processQuery: async (query: string, lead: any, history: any[] = []) => {
-    return await interactWithLLM(query, lead); // 🧠 Send to Python backend
+  processQuery: async (query: string, lead: any, sessionId?: string) => {
+    return await interactWithLLM(query, lead, sessionId); // 🧠 Send to Python backend
   },
 });
 